@@ -0,0 +1,163 @@
+"""
+Per-user cache of /ask answers.
+
+An answer is reused while the user's corpus is unchanged: keys include the
+corpus_version from user_stats, which every document insert, status change
+and delete bumps, so stale answers are simply never looked up again and age
+out by TTL or LRU eviction.
+
+Exact mode matches the normalised query text. Semantic mode (opt-in) also
+reuses an answer when the new query's embedding is within a cosine
+threshold of a cached query with the same scope.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .embedding_cache import normalize_text
+
+load_dotenv()
+
+# Configuration
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "false").lower() == "true"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the question"""
+    return normalize_text(query).casefold().rstrip("?!. ")
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    chunks: List[Dict[str, Any]]
+    created_at: float = field(default_factory=time.monotonic)
+    bucket: Tuple = ()
+    embedding: Optional[np.ndarray] = None
+
+
+class AnswerCache:
+    """Thread-safe TTL + LRU cache, with per-(user, version, scope) embedding buckets"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._buckets: Dict[Tuple, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def bucket(user_id, corpus_version: int, scope: Sequence) -> Tuple:
+        """Entries are only comparable within one user, corpus version and retrieval scope"""
+        return (str(user_id), corpus_version, tuple(scope))
+
+    @staticmethod
+    def key(bucket: Tuple, normalized_query: str) -> str:
+        return hashlib.sha256(repr((bucket, normalized_query)).encode("utf-8")).hexdigest()
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            members = self._buckets.get(entry.bucket)
+            if members is not None:
+                members.pop(key, None)
+                if not members:
+                    del self._buckets[entry.bucket]
+
+    def _fresh(self, key: str) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at > self.ttl_seconds:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, bucket: Tuple, normalized_query: str) -> Optional[CachedAnswer]:
+        with self._lock:
+            entry = self._fresh(self.key(bucket, normalized_query))
+            if entry is not None:
+                self.hits += 1
+            return entry
+
+    def find_similar(self, bucket: Tuple, embedding: Sequence[float], threshold: float) -> Optional[CachedAnswer]:
+        """Most similar cached query in the bucket, if its cosine similarity reaches threshold"""
+        with self._lock:
+            members = self._buckets.get(bucket)
+            if not members:
+                return None
+            keys = list(members)
+            matrix = np.stack([members[k] for k in keys])
+            query = np.asarray(embedding, dtype=np.float32)
+            similarities = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                return None
+            entry = self._fresh(keys[best])
+            if entry is not None:
+                self.semantic_hits += 1
+            return entry
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(
+        self,
+        bucket: Tuple,
+        normalized_query: str,
+        answer: str,
+        chunks: List[Dict[str, Any]],
+        embedding: Optional[Sequence[float]] = None,
+    ):
+        key = self.key(bucket, normalized_query)
+        vector = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = CachedAnswer(answer=answer, chunks=chunks, bucket=bucket, embedding=vector)
+            if vector is not None:
+                self._buckets.setdefault(bucket, {})[key] = vector
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        """Drop every entry of a user (a version bump makes this optional)"""
+        user = str(user_id)
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.bucket[0] == user]:
+                self._drop(key)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS)
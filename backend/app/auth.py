@@ -1,18 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import event
+import asyncio
+import hashlib
 import os
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 
+from .models import User
+
 load_dotenv()
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# bcrypt gets its own small pool so a login storm cannot starve the shared one
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by request handlers"""
+    user_id: uuid.UUID
+    username: str
+    email: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user_id=user.user_id, username=user.username, email=user.email)
+
+
+class PrincipalCache:
+    """TTL + LRU cache of verified token -> Principal"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._by_user: Dict[uuid.UUID, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Principal]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, token: str, principal: Principal, token_exp: Optional[float] = None):
+        """Cache a verified token; never beyond the token's own expiry"""
+        expires_at = time.time() + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        key = self._key(token)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires_at, principal)
+            self._by_user.setdefault(principal.user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[1].user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[1].user_id]
+
+
+principal_cache = PrincipalCache(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_principal(mapper, connection, target):
+    """Drop cached tokens whenever a user row changes"""
+    principal_cache.invalidate_user(target.user_id)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
@@ -40,4 +133,14 @@ def get_password_hash(password: str):
 
 def verify_password(plain_password: str, hashed_password: str):
     """Verify password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str):
+    """bcrypt hash on the dedicated pool, off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    """bcrypt verify on the dedicated pool, off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
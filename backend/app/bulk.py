@@ -0,0 +1,101 @@
+"""Bulk write paths for chunks"""
+from typing import Any, Dict, Iterable, Sequence
+import io
+import json
+import os
+import struct
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from .models import Chunk
+
+load_dotenv()
+
+# Configuration
+CHUNK_INSERT_METHOD = os.getenv("CHUNK_INSERT_METHOD", "values")  # "values" or "copy"
+COPY_BATCH_ROWS = 2000
+
+_COPY_COLUMNS = ["chunk_id", "doc_id", "user_id", "text_chunk", "embedding", "metadata", "created_at"]
+
+
+def insert_chunks(db: Session, rows: Sequence[Dict[str, Any]], method: str = None):
+    """
+    Insert chunk rows (Chunk attribute dicts) without per-object unit-of-work
+    overhead. Does not commit, so callers keep it in their own transaction.
+    """
+    if not rows:
+        return
+    method = method or CHUNK_INSERT_METHOD
+    if method == "copy":
+        _copy_chunks(db, rows)
+    else:
+        # Executemany via insertmanyvalues: one multi-row INSERT per page of rows
+        db.execute(insert(Chunk), list(rows))
+
+
+def replace_document_chunks(db: Session, doc_ids: Iterable, rows: Sequence[Dict[str, Any]], method: str = None):
+    """Swap the chunks of several documents in one transaction (re-ingestion)"""
+    doc_ids = list(doc_ids)
+    db.query(Chunk).filter(Chunk.doc_id.in_(doc_ids)).delete(synchronize_session=False)
+    insert_chunks(db, rows, method)
+
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PG_EPOCH = datetime(2000, 1, 1)
+
+
+def _field(value: bytes) -> bytes:
+    return struct.pack("!i", len(value)) + value
+
+
+_NULL = struct.pack("!i", -1)
+
+
+def _encode_row(row: Dict[str, Any], now: datetime) -> bytes:
+    """One tuple in PostgreSQL's binary COPY format"""
+    embedding = row.get("embedding")
+    metadata = row.get("chunk_metadata")
+    created_at = row.get("created_at") or now
+    micros = (created_at - _PG_EPOCH) // timedelta(microseconds=1)
+
+    parts = [
+        struct.pack("!h", len(_COPY_COLUMNS)),
+        _field(uuid.UUID(str(row["chunk_id"])).bytes),
+        _field(uuid.UUID(str(row["doc_id"])).bytes),
+        _field(uuid.UUID(str(row["user_id"])).bytes),
+        _field(row["text_chunk"].encode("utf-8")),
+    ]
+    if embedding is None:
+        parts.append(_NULL)
+    else:
+        # pgvector binary layout: int16 dim, int16 unused, float4[dim], big-endian
+        vector = np.asarray(embedding, dtype=">f4")
+        parts.append(_field(struct.pack("!hh", len(vector), 0) + vector.tobytes()))
+    parts.append(_NULL if metadata is None else _field(json.dumps(metadata).encode("utf-8")))
+    parts.append(_field(struct.pack("!q", micros)))
+    return b"".join(parts)
+
+
+def _copy_chunks(db: Session, rows: Sequence[Dict[str, Any]]):
+    """Stream rows through binary COPY ... FROM STDIN on the session's connection"""
+    cursor = db.connection().connection.cursor()
+    now = datetime.utcnow()
+    try:
+        for start in range(0, len(rows), COPY_BATCH_ROWS):
+            buffer = io.BytesIO()
+            buffer.write(_PGCOPY_HEADER)
+            for row in rows[start:start + COPY_BATCH_ROWS]:
+                buffer.write(_encode_row(row, now))
+            buffer.write(struct.pack("!h", -1))
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY chunks ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT binary)", buffer
+            )
+    finally:
+        cursor.close()
@@ -0,0 +1,156 @@
+"""
+Clause classification: keyword rules compiled into one regex.
+
+Every keyword of every clause type is an alternative of a single pattern,
+each anchored at word boundaries, so a text is scanned once instead of once
+per rule, and "ip" no longer matches inside "recipient" or "shipping".
+When several types match, the earliest rule in CLAUSE_RULES wins, as in the
+old if/elif chain, and the scan stops early once the top rule has matched.
+
+    python -m app.clauses reclassify [--user USER_ID] [--batch-size 5000] [--dry-run]
+
+re-labels existing chunks' metadata.clause_type with the current rules, and
+drops the cached risk scores of the documents it changes.
+"""
+from typing import Dict, List, Optional, Sequence
+import argparse
+import re
+
+# (clause type, keywords) in priority order; a trailing * matches any word ending
+CLAUSE_RULES = [
+    ("Termination", ["terminat*"]),
+    ("Liability", ["liable", "liability", "liabilities"]),
+    ("Payment", ["payment*", "invoice*"]),
+    ("Intellectual Property", ["intellectual property", "ip"]),
+    ("Confidentiality", ["confidential*"]),
+    ("Licensing", ["licens*"]),
+    ("Force Majeure", ["force majeure"]),
+    ("Amendment", ["amendment*"]),
+    ("Governing Law", ["governing", "jurisdiction*"]),
+    ("Dispute Resolution", ["dispute*", "arbitration*"]),
+]
+DEFAULT_CLAUSE_TYPE = "General"
+CLAUSE_TYPES = [clause_type for clause_type, _ in CLAUSE_RULES] + [DEFAULT_CLAUSE_TYPE]
+
+
+def _keyword_pattern(keyword: str) -> str:
+    if keyword.endswith("*"):
+        return re.escape(keyword[:-1]) + r"\w*"
+    return re.escape(keyword).replace(r"\ ", r"\s+") + r"\b"
+
+
+def compile_rules(rules=CLAUSE_RULES) -> re.Pattern:
+    """One group per rule; match.lastindex is the rule's priority (1 = highest)"""
+    groups = [
+        "(" + "|".join(_keyword_pattern(k) for k in sorted(keywords, key=len, reverse=True)) + ")"
+        for _, keywords in rules
+    ]
+    # A lookbehind rather than a leading \b keeps sre's first-character scan fast
+    return re.compile(r"(?<!\w)(?:" + "|".join(groups) + ")")
+
+
+_MATCHER = compile_rules()
+_TYPES_BY_GROUP = [DEFAULT_CLAUSE_TYPE] + [clause_type for clause_type, _ in CLAUSE_RULES]
+
+
+def classify(texts: Sequence[str]) -> List[str]:
+    """Clause type for each text, in input order"""
+    finditer = _MATCHER.finditer
+    types = []
+    for text in texts:
+        best = 0
+        for match in finditer(text.lower()):
+            if not best or match.lastindex < best:
+                best = match.lastindex
+                if best == 1:
+                    break  # nothing outranks the first rule
+        types.append(_TYPES_BY_GROUP[best])
+    return types
+
+
+def classify_one(text: str) -> str:
+    return classify([text])[0]
+
+
+# -------------------- RECLASSIFY --------------------
+
+def reclassify(db, user_id: Optional[str] = None, batch_size: int = 5000, dry_run: bool = False) -> Dict[str, int]:
+    """Re-label stored chunks in keyset batches; returns {"scanned", "changed"}"""
+    from sqlalchemy import bindparam, update
+
+    from . import risk, stats
+    from .models import Chunk, Document
+
+    table = Chunk.__table__
+    write = (
+        update(table)
+        .where(table.c.chunk_id == bindparam("b_chunk_id"))
+        .values(metadata=bindparam("b_metadata"))
+    )
+    scanned = changed = 0
+    touched_users, touched_docs = set(), set()
+    last_id = None
+    while True:
+        query = db.query(Chunk.chunk_id, Chunk.user_id, Chunk.doc_id, Chunk.text_chunk, Chunk.chunk_metadata)
+        if user_id:
+            query = query.filter(Chunk.user_id == user_id)
+        if last_id is not None:
+            query = query.filter(Chunk.chunk_id > last_id)
+        rows = query.order_by(Chunk.chunk_id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].chunk_id
+        scanned += len(rows)
+
+        updates = []
+        for row, clause_type in zip(rows, classify([r.text_chunk for r in rows])):
+            metadata = dict(row.chunk_metadata or {})
+            if metadata.get("clause_type") != clause_type:
+                metadata["clause_type"] = clause_type
+                updates.append({"b_chunk_id": row.chunk_id, "b_metadata": metadata})
+                touched_users.add(row.user_id)
+                touched_docs.add(row.doc_id)
+        changed += len(updates)
+        if updates and not dry_run:
+            db.execute(write, updates)
+            db.commit()
+
+    if not dry_run:
+        # Cached answers scoped by clause type, and risk scores of the changed documents, are now stale
+        for uid in touched_users:
+            stats.bump_corpus_version(db, uid)
+        if touched_docs:
+            hashes = db.query(Document.content_hash).filter(Document.doc_id.in_(list(touched_docs)))
+            risk.forget(db, [content_hash for (content_hash,) in hashes])
+        db.commit()
+        _refresh_local_indexes(db, touched_users)
+    return {"scanned": scanned, "changed": changed, "users": len(touched_users)}
+
+
+def _refresh_local_indexes(db, user_ids):
+    from .models import EMBEDDING_DIMENSIONS
+    from .retrieval import RETRIEVAL_BACKEND
+    from .vector_index import rebuild_user_index
+
+    if RETRIEVAL_BACKEND == "numpy":
+        for uid in user_ids:
+            rebuild_user_index(db, uid, EMBEDDING_DIMENSIONS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-label chunk clause types")
+    parser.add_argument("command", choices=["reclassify"])
+    parser.add_argument("--user", default=None)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result = reclassify(db, args.user, args.batch_size, args.dry_run)
+        verb = "would change" if args.dry_run else "changed"
+        print(f"scanned {result['scanned']} chunks, {verb} {result['changed']} ({result['users']} users)")
+    finally:
+        db.close()
@@ -0,0 +1,157 @@
+"""
+Content-addressed embedding cache.
+
+Keys are sha256(model, normalised text), so the same boilerplate clause is
+embedded once no matter which document or user it comes from. Lookups go
+through an in-process LRU bounded by bytes, then the embedding_cache table.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import os
+import threading
+import unicodedata
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from .models import EmbeddingCacheEntry
+
+load_dotenv()
+
+# Configuration
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+EMBED_CACHE_PERSIST = os.getenv("EMBED_CACHE_PERSIST", "true").lower() == "true"
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for hashing: NFC, whitespace collapsed"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class LRUEmbeddingCache:
+    """Thread-safe LRU of float32 vectors, evicting by total size in bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old.nbytes
+            self._entries[key] = vector
+            self.size_bytes += vector.nbytes
+            while self.size_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= evicted.nbytes
+
+
+class CacheStats:
+    """Hit/miss counters plus an estimate of the API work avoided"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.chars_saved = 0
+        self.api_calls = 0
+        self.api_seconds = 0.0
+        self.api_texts = 0
+
+    def record_hits(self, tier: str, texts: Sequence[str]):
+        with self._lock:
+            if tier == "memory":
+                self.memory_hits += len(texts)
+            else:
+                self.db_hits += len(texts)
+            self.chars_saved += sum(len(t) for t in texts)
+
+    def record_api_call(self, n_texts: int, seconds: float):
+        with self._lock:
+            self.misses += n_texts
+            self.api_calls += 1
+            self.api_seconds += seconds
+            self.api_texts += n_texts
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            seconds_per_text = self.api_seconds / self.api_texts if self.api_texts else 0.0
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "api_calls": self.api_calls,
+                "api_seconds": round(self.api_seconds, 3),
+                # ~4 chars per token for English text
+                "estimated_tokens_saved": self.chars_saved // 4,
+                "estimated_api_seconds_saved": round(hits * seconds_per_text, 3),
+            }
+
+
+memory_cache = LRUEmbeddingCache(EMBED_CACHE_MAX_BYTES)
+stats = CacheStats()
+
+
+def lookup(db: Optional[Session], model: str, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Return cached vectors by cache key; memory first, then the table"""
+    keys = {cache_key(model, t): t for t in texts}
+    found: Dict[str, np.ndarray] = {}
+
+    memory_hits = []
+    for key, text in keys.items():
+        vector = memory_cache.get(key)
+        if vector is not None:
+            found[key] = vector
+            memory_hits.append(text)
+    stats.record_hits("memory", memory_hits)
+
+    missing = [k for k in keys if k not in found]
+    if missing and db is not None and EMBED_CACHE_PERSIST:
+        rows = (
+            db.query(EmbeddingCacheEntry.cache_key, EmbeddingCacheEntry.embedding)
+            .filter(EmbeddingCacheEntry.cache_key.in_(missing))
+            .all()
+        )
+        for key, blob in rows:
+            vector = np.frombuffer(blob, dtype=np.float32)
+            memory_cache.put(key, vector)
+            found[key] = vector
+        stats.record_hits("db", [keys[key] for key, _ in rows])
+    return found
+
+
+def store(db: Optional[Session], model: str, entries: Dict[str, List[float]]):
+    """Write freshly computed vectors (keyed by cache key) to both tiers. Does not commit."""
+    rows = []
+    for key, embedding in entries.items():
+        vector = np.asarray(embedding, dtype=np.float32)
+        memory_cache.put(key, vector)
+        rows.append({"cache_key": key, "model": model, "embedding": vector.tobytes()})
+
+    if rows and db is not None and EMBED_CACHE_PERSIST:
+        # Part of the caller's transaction: ingestion commits it with the document
+        db.execute(insert(EmbeddingCacheEntry).values(rows).on_conflict_do_nothing())
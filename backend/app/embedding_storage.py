@@ -0,0 +1,322 @@
+"""
+Bring stored chunk embeddings in line with EMBEDDING_DIMENSIONS / EMBEDDING_STORAGE.
+
+    python -m app.embedding_storage revision
+    python -m app.embedding_storage backfill [--batch-size 1000] [--reembed]
+
+Schema changes go through Alembic like any other: `revision` compares the
+live database with the settings and writes migrations with the new values
+hard-coded into them.
+
+- Dimensions changed: two revisions. The first adds an embedding_resized
+  column; `backfill` then fills it in keyset batches while the old column
+  keeps serving searches. text-embedding-3 vectors are truncated and
+  re-normalised (they are trained so prefixes stay meaningful), so no API
+  calls are made; other embedders, or --reembed, embed the chunk text again
+  through the embedding cache. The second revision refuses to run until
+  every row is filled, then swaps the column in (one short transaction) and
+  builds the ANN index concurrently.
+- Only EMBEDDING_STORAGE or the index settings changed: one revision that
+  builds the new ANN index concurrently next to the old one and swaps the
+  names (float16 indexes a halfvec cast of the full-precision column).
+
+So a resize is `revision`, `alembic upgrade head` (stops at the swap until
+filled), `backfill`, `alembic upgrade head`, then deploy the new settings:
+until the swap the API keeps serving the old column. With
+RETRIEVAL_BACKEND=numpy, run `backfill` once more after the last upgrade to
+rebuild every user's local index.
+"""
+from datetime import date
+from typing import List, Optional, Sequence
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from .models import Chunk, EMBEDDING_DIMENSIONS
+
+
+def current_dimensions(conn, column: str = "embedding") -> Optional[int]:
+    """Declared dimensions of a chunks vector column (its typmod); None if there is no such column"""
+    return conn.execute(
+        text(
+            "SELECT atttypmod FROM pg_attribute "
+            "WHERE attrelid = 'chunks'::regclass AND attname = :column AND NOT attisdropped"
+        ),
+        {"column": column},
+    ).scalar()
+
+
+def truncate_embeddings(vectors: Sequence[Sequence[float]], dimensions: int) -> List[List[float]]:
+    """Matryoshka shortening: keep the first `dimensions` components, re-normalise"""
+    matrix = np.asarray(vectors, dtype=np.float32)[:, :dimensions]
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix.tolist()
+
+
+# -------------------- REVISIONS --------------------
+
+def _wanted_index() -> str:
+    """`chunks USING ...` clause of the ANN index the settings describe"""
+    index = next(i for i in Chunk.__table__.indexes if i.name == "idx_chunks_embedding")
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    return ddl.split(" ON ", 1)[1]
+
+
+def _live_index(conn) -> Optional[str]:
+    definition = conn.execute(
+        text(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND indexname = 'idx_chunks_embedding'"
+        )
+    ).scalar()
+    return definition.split(" ON ", 1)[1] if definition else None
+
+
+def _same_index(live: Optional[str], wanted: str) -> bool:
+    # pg_indexes adds the schema, quotes WITH values and parenthesises casts
+    def normal(definition):
+        return re.sub(r"[\s()'\"]|public\.", "", definition.lower())
+
+    return live is not None and normal(live) == normal(wanted)
+
+
+_HEADER = '''"""{title}
+
+Written by `python -m app.embedding_storage revision`.{notes}
+
+Revision ID: {revision_id}
+Revises: {down_revision_id}
+Create Date: {today}
+"""
+{imports}
+
+revision = {revision}
+down_revision = {down_revision}
+branch_labels = None
+depends_on = None
+'''
+
+_ADD_COLUMN = '''
+
+def upgrade():
+    op.execute("ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding_resized vector({dimensions})")
+
+
+def downgrade():
+    op.execute("ALTER TABLE chunks DROP COLUMN IF EXISTS embedding_resized")
+'''
+
+_SWAP_COLUMN = '''
+
+INDEX = {index}
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        pending = op.get_bind().execute(
+            sa.text("SELECT count(*) FROM chunks WHERE embedding IS NOT NULL AND embedding_resized IS NULL")
+        ).scalar()
+        if pending:
+            raise RuntimeError(
+                f"{{pending}} chunks have no {dimensions}-dimension embedding yet: "
+                "run `python -m app.embedding_storage backfill` first"
+            )
+    op.execute("ALTER TABLE chunks DROP COLUMN embedding")  # drops idx_chunks_embedding too
+    op.execute("ALTER TABLE chunks RENAME COLUMN embedding_resized TO embedding")
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_embedding ON {{INDEX}}")
+
+
+def downgrade():
+    raise RuntimeError("the {previous}-dimension embeddings were dropped; restore them from a backup")
+'''
+
+_REPLACE_INDEX = '''
+
+INDEX = {index}
+PREVIOUS_INDEX = {previous}
+
+
+def _replace(definition):
+    # Build next to the live index so searches keep an index throughout, then swap names
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_chunks_embedding_new")
+        op.execute(f"CREATE INDEX CONCURRENTLY idx_chunks_embedding_new ON {{definition}}")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_chunks_embedding")
+        op.execute("ALTER INDEX idx_chunks_embedding_new RENAME TO idx_chunks_embedding")
+
+
+def upgrade():
+    _replace(INDEX)
+
+
+def downgrade():
+    _replace(PREVIOUS_INDEX)
+'''
+
+
+def _next_revision(revision: Optional[str]) -> str:
+    from alembic.util import rev_id
+
+    return f"{int(revision) + 1:04d}" if revision and revision.isdigit() else rev_id()
+
+
+def _write_revision(
+    directory: str, revision: str, down_revision: str, slug: str, title: str, notes: str, body: str,
+    imports: str = "from alembic import op",
+):
+    path = os.path.join(directory, f"{revision}_{slug}.py")
+    header = _HEADER.format(
+        title=title, notes=notes, imports=imports, today=date.today().isoformat(),
+        revision_id=revision, revision=json.dumps(revision),
+        down_revision_id=down_revision, down_revision=json.dumps(down_revision),
+    )
+    with open(path, "w") as f:
+        f.write(header + body)
+    print(f"wrote {path}")
+
+
+def write_revisions() -> List[str]:
+    """Migrations taking the live schema to the configured embedding settings"""
+    from alembic.script import ScriptDirectory
+
+    from .database import _alembic_config, engine, schema_revisions
+    from .models import EMBEDDING_STORAGE, VECTOR_INDEX_TYPE
+
+    current, head = schema_revisions()
+    if current != head:
+        raise SystemExit(f"Database is at {current or 'no revision'}, not {head}: run `alembic upgrade head` first")
+    with engine.connect() as conn:
+        stored = current_dimensions(conn)
+        live = _live_index(conn)
+    wanted = _wanted_index()
+    directory = ScriptDirectory.from_config(_alembic_config()).versions
+    written = []
+
+    if stored != EMBEDDING_DIMENSIONS:
+        add = _next_revision(head)
+        swap = _next_revision(add)
+        _write_revision(
+            directory, add, head, f"embedding_{EMBEDDING_DIMENSIONS}d_column",
+            f"Add chunks.embedding_resized vector({EMBEDDING_DIMENSIONS})",
+            f"\nFill it with `python -m app.embedding_storage backfill`; {swap} swaps it in.",
+            _ADD_COLUMN.format(dimensions=EMBEDDING_DIMENSIONS),
+        )
+        _write_revision(
+            directory, swap, add, f"embedding_{EMBEDDING_DIMENSIONS}d_swap",
+            f"Swap in {EMBEDDING_DIMENSIONS}-dimension embeddings ({EMBEDDING_STORAGE}, {VECTOR_INDEX_TYPE})",
+            f"\nReplaces the {stored}-dimension column; refuses to run until backfill has filled every row.",
+            _SWAP_COLUMN.format(index=json.dumps(wanted), dimensions=EMBEDDING_DIMENSIONS, previous=stored),
+            imports="from alembic import context, op\nimport sqlalchemy as sa",
+        )
+        written = [add, swap]
+    elif not _same_index(live, wanted):
+        revision = _next_revision(head)
+        _write_revision(
+            directory, revision, head, f"embedding_index_{EMBEDDING_STORAGE}_{VECTOR_INDEX_TYPE}",
+            f"Rebuild idx_chunks_embedding ({EMBEDDING_STORAGE}, {VECTOR_INDEX_TYPE})",
+            "",
+            _REPLACE_INDEX.format(index=json.dumps(wanted), previous=json.dumps(live or wanted)),
+        )
+        written = [revision]
+    else:
+        print("chunks.embedding already matches the settings; no revision needed")
+    return written
+
+
+# -------------------- BACKFILL --------------------
+
+def _fill_resized_column(engine, dimensions: int, batch_size: int, reembed: bool):
+    from .database import SessionLocal
+    from .embeddings import embed_texts
+
+    done, last_id = 0, None
+    while True:
+        with engine.begin() as conn:
+            # Resumable: rows already written are skipped
+            query = (
+                "SELECT chunk_id, embedding, text_chunk FROM chunks "
+                "WHERE embedding IS NOT NULL AND embedding_resized IS NULL"
+                + (" AND chunk_id > :last_id" if last_id else "")
+                + " ORDER BY chunk_id LIMIT :limit"
+            )
+            params = {"limit": batch_size, **({"last_id": last_id} if last_id else {})}
+            rows = conn.execute(text(query), params).all()
+            if not rows:
+                break
+            if reembed:
+                db = SessionLocal()
+                try:
+                    vectors = embed_texts([r.text_chunk for r in rows], db)
+                    db.commit()
+                finally:
+                    db.close()
+            else:
+                vectors = truncate_embeddings([json.loads(r.embedding) for r in rows], dimensions)
+            conn.execute(
+                text("UPDATE chunks SET embedding_resized = CAST(:embedding AS vector) WHERE chunk_id = :chunk_id"),
+                [
+                    {"chunk_id": r.chunk_id, "embedding": "[" + ",".join(map(str, v)) + "]"}
+                    for r, v in zip(rows, vectors)
+                ],
+            )
+        done += len(rows)
+        last_id = rows[-1].chunk_id
+        print(f"  {done} chunks")
+
+
+def backfill(batch_size: int = 1000, reembed: bool = False):
+    """Data only: fill embedding_resized, or rebuild the numpy indexes once the schema matches"""
+    from .database import SessionLocal, engine
+    from .providers import get_embedder
+    from .retrieval import RETRIEVAL_BACKEND
+
+    with engine.connect() as conn:
+        stored = current_dimensions(conn)
+        resized = current_dimensions(conn, "embedding_resized")
+    if resized is not None:
+        model = getattr(get_embedder(), "model", "")
+        if resized > stored or not model.startswith("text-embedding-3"):
+            reembed = True
+        how = "re-embedding" if reembed else "truncating"
+        print(f"filling embedding_resized {stored} -> {resized} ({how})")
+        _fill_resized_column(engine, resized, batch_size, reembed)
+        print("done: run `alembic upgrade head` to swap the column in")
+        return
+    if stored != EMBEDDING_DIMENSIONS:
+        raise SystemExit(
+            f"chunks.embedding has {stored} dimensions, EMBEDDING_DIMENSIONS is {EMBEDDING_DIMENSIONS}: "
+            "run `python -m app.embedding_storage revision` and `alembic upgrade head` first"
+        )
+
+    if RETRIEVAL_BACKEND == "numpy":
+        from .models import User
+        from .vector_index import rebuild_user_index
+
+        db = SessionLocal()
+        try:
+            for (user_id,) in db.query(User.user_id).all():
+                index = rebuild_user_index(db, user_id, EMBEDDING_DIMENSIONS)
+                print(f"{user_id}: {len(index)} chunks, {index.storage}")
+        finally:
+            db.close()
+    else:
+        print("nothing to backfill; idx_chunks_embedding is maintained by the migrations")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["revision", "backfill"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--reembed", action="store_true", help="embed chunk text again instead of truncating")
+    args = parser.parse_args()
+    if args.command == "revision":
+        write_revisions()
+    else:
+        backfill(args.batch_size, args.reembed)
@@ -0,0 +1,135 @@
+"""Batched, concurrent embedding generation"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+import asyncio
+import os
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from . import embedding_cache, metrics
+from .providers import Embedder, get_embedder
+
+load_dotenv()
+
+# Configuration
+# Provider limits are 2048 inputs and ~300k tokens per request; stay below both
+EMBED_BATCH_SIZE = min(int(os.getenv("EMBED_BATCH_SIZE", "256")), 2048)
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "200000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+# Shared so concurrency stays bounded across simultaneous uploads
+_executor = ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed")
+_semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate; assumes ~3 chars per token, which overshoots English"""
+    return len(text) // 3 + 1
+
+
+def make_batches(texts: Sequence[str]) -> List[List[int]]:
+    """Group text positions into requests that respect the provider limits"""
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = approx_tokens(text)
+        if current and (len(current) >= EMBED_BATCH_SIZE or current_tokens + tokens > EMBED_BATCH_MAX_TOKENS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_texts(
+    texts: Sequence[str], db: Optional[Session] = None, embedder: Optional[Embedder] = None
+) -> List[List[float]]:
+    """Embed texts in input order, calling the provider only for cache misses"""
+    embedder = embedder or get_embedder()
+    model = embedder.cache_id
+    keys = [embedding_cache.cache_key(model, t) for t in texts]
+    vectors = embedding_cache.lookup(db, model, texts)
+
+    # Each distinct missing text is sent once, even if it repeats in this call
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in pending:
+            pending[key] = text
+    if pending:
+        pending_keys = list(pending)
+        fresh = _embed_uncached(embedder, [pending[k] for k in pending_keys])
+        embedding_cache.store(db, model, dict(zip(pending_keys, fresh)))
+        vectors.update(zip(pending_keys, fresh))
+
+    return [list(map(float, vectors[key])) for key in keys]
+
+
+def _embed_uncached(embedder: Embedder, texts: Sequence[str]) -> List[List[float]]:
+    """Embed texts in batched requests, returning vectors in input order"""
+    batches = make_batches(texts)
+    embeddings: List[List[float]] = [None] * len(texts)
+
+    def run(batch: List[int]):
+        started = time.perf_counter()
+        vectors = embedder.embed([texts[i] for i in batch])
+        elapsed = time.perf_counter() - started
+        embedding_cache.stats.record_api_call(len(batch), elapsed)
+        metrics.observe_stage("embed", elapsed)
+        return batch, vectors
+
+    for batch, vectors in _executor.map(run, batches):
+        for i, vector in zip(batch, vectors):
+            embeddings[i] = vector
+    return embeddings
+
+
+async def aembed_texts(
+    texts: Sequence[str], db: Optional[AsyncSession] = None, embedder: Optional[Embedder] = None
+) -> List[List[float]]:
+    """Async embed_texts for request handlers"""
+    embedder = embedder or get_embedder()
+    model = embedder.cache_id
+    keys = [embedding_cache.cache_key(model, t) for t in texts]
+    if db is not None:
+        vectors = await db.run_sync(lambda s: embedding_cache.lookup(s, model, texts))
+    else:
+        vectors = embedding_cache.lookup(None, model, texts)
+
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in pending:
+            pending[key] = text
+    if pending:
+        pending_keys = list(pending)
+        fresh = await _aembed_uncached(embedder, [pending[k] for k in pending_keys])
+        entries = dict(zip(pending_keys, fresh))
+        if db is not None:
+            await db.run_sync(lambda s: embedding_cache.store(s, model, entries))
+        else:
+            embedding_cache.store(None, model, entries)
+        vectors.update(entries)
+
+    return [list(map(float, vectors[key])) for key in keys]
+
+
+async def _aembed_uncached(embedder: Embedder, texts: Sequence[str]) -> List[List[float]]:
+    batches = make_batches(texts)
+
+    async def run(batch: List[int]):
+        async with _semaphore:
+            started = time.perf_counter()
+            vectors = await embedder.aembed([texts[i] for i in batch])
+            elapsed = time.perf_counter() - started
+            embedding_cache.stats.record_api_call(len(batch), elapsed)
+            metrics.observe_stage("embed", elapsed)
+            return batch, vectors
+
+    embeddings: List[List[float]] = [None] * len(texts)
+    for batch, vectors in await asyncio.gather(*(run(b) for b in batches)):
+        for i, vector in zip(batch, vectors):
+            embeddings[i] = vector
+    return embeddings
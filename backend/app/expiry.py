@@ -0,0 +1,236 @@
+"""
+Contract expiry dates from chunk text.
+
+Compiled patterns pick out statements about the agreement's own term, whose
+subject is "this Agreement" (or contract, lease), "the Term" or "the
+initial term":
+
+1. an explicit end: "this Agreement expires on March 31, 2027", "the Term
+   ends on 2027-03-31", "this Agreement remains in force until 31 March
+   2027", "Expiration Date: 03/31/2027"
+2. a term length, "the initial term of 24 months", "the term of this
+   Agreement is two years", "this Agreement shall remain in effect for
+   three years", "a five-year term", added to the effective date ("effective
+   as of January 1, 2025", "commencing on ...") or, when the contract states
+   none, to the upload date
+
+Periods with any other subject (cure, warranty and retention periods,
+prices fixed "until" a date) are not the contract's term, and sentences
+about survival, notice or payment are skipped outright. Every match is a
+candidate; the best one wins: from a Termination chunk before a General
+one before any other clause type, then an explicit end before a term
+length, then the earliest. Renewal terms do not extend the date: an
+auto-renewing contract still comes up for renewal when its current term
+ends.
+
+    python -m app.expiry backfill [--user USER_ID] [--batch-size 500]
+
+fills expiry_date for documents ingested before extraction ran.
+"""
+from calendar import monthrange
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+import argparse
+import re
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",),
+         ("jun", "june"), ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"),
+         ("oct", "october"), ("nov", "november"), ("dec", "december")],
+        start=1,
+    )
+    for name in names
+}
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "eighteen": 18,
+    "twenty": 20, "twenty-four": 24, "thirty": 30, "thirty-six": 36, "forty-eight": 48,
+    "sixty": 60, "ninety": 90,
+}
+
+_MONTH = r"(?:" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+_DATE = (
+    r"(?:" + _MONTH + r"\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}"   # March 31, 2027
+    r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?" + _MONTH + r",?\s+\d{4}"  # 31st (day of) March 2027
+    r"|\d{4}-\d{2}-\d{2}"                                        # 2027-03-31
+    r"|\d{1,2}/\d{1,2}/\d{4})"                                   # 03/31/2027 (US order)
+)
+_NUMBER = r"(?:\d{1,3}|" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r")"
+
+# The agreement itself, or its term, as the subject of a sentence
+_AGREEMENT = r"\b(?:this|the)\s+(?:[\w-]+\s+){0,3}?(?:agreement|contract|lease)\b(?!['’]s)"
+_THE_TERM = r"\b(?:(?:the|this|its)\s+(?:initial\s+)?|initial\s+)term\b"
+_SUBJECT = r"(?:" + _AGREEMENT + "|" + _THE_TERM + r")[^.;]{0,80}?"
+_UNIT = r"(" + _NUMBER + r")\s*(?:\((\d{1,3})\)\s*)?[-\s]?(year|month|week|day)s?"
+
+_END_RE = re.compile(
+    _SUBJECT + r"(?:expir\w*|terminat\w*|end\w*)\s+(?:on|at\s+the\s+close\s+of\s+business\s+on)\s+(" + _DATE + ")"
+    r"|" + _SUBJECT + r"(?:until|through|thru)\s+(" + _DATE + ")"
+    r"|(?:^\W*|\bthe\s+)(?:expiration|expiry|termination|end)\s+date(?:\s+of\s+" + _AGREEMENT + r")?\W{0,3}"
+    r"(?:(?:is|shall\s+be|of)\s+)?(" + _DATE + ")",
+    re.IGNORECASE,
+)
+_START_RE = re.compile(
+    r"(?:effective\s+(?:as\s+of|from|on)?|commenc\w*\s+(?:on|as\s+of)|dated(?:\s+as\s+of)?|effective\s+date\W{0,3}"
+    r"(?:(?:is|shall\s+be|of)\s+)?)\s*(" + _DATE + ")",
+    re.IGNORECASE,
+)
+_TERM_RE = re.compile(
+    r"(?:" + _THE_TERM + r"(?:\s+of\s+" + _AGREEMENT + r")?|\b(?:period|duration)\s+of\s+" + _AGREEMENT + r")"
+    r"\s+(?:of|is|shall\s+be|will\s+be)\s+(?:for\s+)?(?:a\s+period\s+of\s+)?(?:approximately\s+)?" + _UNIT
+    + r"|" + _AGREEMENT + r"[^.;]{0,80}?(?:in\s+(?:full\s+)?(?:force|effect)(?:\s+and\s+effect)?|continue)\s+for\s+"
+    r"(?:a\s+(?:period|term)\s+of\s+)?" + _UNIT
+    + r"|\b(" + _NUMBER + r")[-\s](year|month)\s+(?:initial\s+)?term\b",
+    re.IGNORECASE,
+)
+_SKIP_RE = re.compile(r"surviv\w*|notice|payment|invoice", re.IGNORECASE)
+_SENTENCE_RE = re.compile(r"(?<=[.;])\s+")
+
+
+def parse_date(text: str) -> Optional[date]:
+    """A date matched by the _DATE pattern, or None if it is not a real day"""
+    text = text.strip().lower().replace(",", "")
+    try:
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
+            return date.fromisoformat(text)
+        if "/" in text:
+            month, day, year = (int(p) for p in text.split("/"))
+            return date(year, month, day)
+        words = re.sub(r"(\d)(?:st|nd|rd|th)\b", r"\1", text).replace(".", "").replace("day of ", "").split()
+        if words[0].isdigit():
+            day, month, year = int(words[0]), _MONTHS[words[1]], int(words[2])
+        else:
+            month, day, year = _MONTHS[words[0]], int(words[1]), int(words[2])
+        return date(year, month, day)
+    except (KeyError, ValueError, IndexError):
+        return None
+
+
+def _number(word: str) -> Optional[int]:
+    word = word.lower()
+    return int(word) if word.isdigit() else _NUMBER_WORDS.get(word)
+
+
+def add_term(start: date, count: int, unit: str) -> date:
+    """start + count units; month ends clamp (Jan 31 + 1 month = Feb 28/29)"""
+    unit = unit.lower()
+    if unit in ("day", "week"):
+        return date.fromordinal(start.toordinal() + count * (7 if unit == "week" else 1))
+    months = start.month - 1 + count * (12 if unit == "year" else 1)
+    year, month = start.year + months // 12, months % 12 + 1
+    return date(year, month, min(start.day, monthrange(year, month)[1]))
+
+
+def _term(match: re.Match) -> Optional[tuple]:
+    groups = match.groups()
+    for word, digits, unit in (groups[0:3], groups[3:6], (groups[6], None, groups[7])):
+        if unit:
+            # "five (5) years": the figure in brackets is authoritative
+            count = int(digits) if digits else _number(word)
+            return (count, unit) if count else None
+    return None
+
+
+# Where an expiry statement is most likely to be the contract's own
+_CLAUSE_TYPE_RANK = {"Termination": 0, "General": 1, None: 1}
+
+
+def extract_expiry(
+    clauses: Iterable[Tuple[str, Optional[str]]], uploaded_on: Optional[date] = None
+) -> Optional[date]:
+    """Expiry date stated or implied by (text, clause_type) chunks, or None"""
+    start = best = None  # best: (rank, end date or (count, unit))
+    position = 0
+    for text, clause_type in clauses:
+        clause_rank = _CLAUSE_TYPE_RANK.get(clause_type, 2)
+        for sentence in _SENTENCE_RE.split(text):
+            position += 1
+            if start is None:
+                match = _START_RE.search(sentence)
+                if match:
+                    start = parse_date(match.group(1))
+            if best is not None and best[0][0] < clause_rank or _SKIP_RE.search(sentence):
+                continue  # nothing here can outrank a better clause type
+            match = _END_RE.search(sentence)
+            end = parse_date(next(g for g in match.groups() if g)) if match else None
+            if end is not None:
+                candidate = ((clause_rank, 0, position), end)
+            else:
+                match = _TERM_RE.search(sentence)
+                term = _term(match) if match else None
+                if term is None:
+                    continue
+                candidate = ((clause_rank, 1, position), term)
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+    if best is None:
+        return None
+    if isinstance(best[1], date):
+        return best[1]
+    start = start or uploaded_on
+    return add_term(start, *best[1]) if start is not None else None
+
+
+# -------------------- BACKFILL --------------------
+
+def backfill(db, user_id=None, batch_size: int = 500, overwrite: bool = False) -> Dict[str, int]:
+    """Extract expiry_date for stored documents, in keyset batches; returns {"scanned", "changed"}"""
+    from . import stats
+    from .models import Chunk, Document
+
+    scanned = changed = 0
+    last_id = None
+    while True:
+        query = db.query(Document).filter(Document.status == "Active")
+        if user_id:
+            query = query.filter(Document.user_id == user_id)
+        if not overwrite:
+            query = query.filter(Document.expiry_date.is_(None))
+        if last_id is not None:
+            query = query.filter(Document.doc_id > last_id)
+        documents = query.order_by(Document.doc_id).limit(batch_size).all()
+        if not documents:
+            break
+        last_id = documents[-1].doc_id
+        scanned += len(documents)
+
+        clauses = {d.doc_id: [] for d in documents}
+        chunk_rows = (
+            db.query(Chunk.doc_id, Chunk.text_chunk, Chunk.chunk_metadata)
+            .filter(Chunk.doc_id.in_(list(clauses)))
+            .order_by(Chunk.created_at)
+        )
+        for doc_id, text, metadata in chunk_rows:
+            clauses[doc_id].append((text, (metadata or {}).get("clause_type")))
+
+        for document in documents:
+            uploaded_on = document.uploaded_on.date() if document.uploaded_on else None
+            expiry = extract_expiry(clauses[document.doc_id], uploaded_on)
+            if expiry != document.expiry_date:
+                before = stats.snapshot(document)
+                document.expiry_date = expiry
+                stats.record_change(db, document.user_id, before, stats.snapshot(document))
+                changed += 1
+        db.commit()
+        db.expunge_all()
+    return {"scanned": scanned, "changed": changed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract contract expiry dates from stored chunks")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--user", default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--overwrite", action="store_true", help="re-extract documents that already have a date")
+    args = parser.parse_args()
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result = backfill(db, args.user, args.batch_size, args.overwrite)
+        print(f"scanned {result['scanned']} documents, set {result['changed']} expiry dates")
+    finally:
+        db.close()
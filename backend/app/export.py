@@ -0,0 +1,210 @@
+"""
+Streaming bulk export of a user's contracts and clauses.
+
+Rows come from a server-side cursor (AsyncSession.stream with yield_per),
+EXPORT_BATCH_SIZE at a time, and each batch is encoded and sent before the
+next is fetched, so memory stays flat however many contracts there are and
+the first bytes leave as soon as the first batch is read. Only columns are
+selected, never ORM objects, so nothing builds up in the session.
+
+Formats: CSV (with a header row), NDJSON, and Parquet (one row group per
+batch; needs pyarrow).
+"""
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence
+import csv
+import io
+import json
+import os
+import uuid
+
+from dotenv import load_dotenv
+from sqlalchemy import Select, select
+
+from .database import AsyncSessionLocal
+from .models import Chunk, Document
+
+load_dotenv()
+
+# Configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+# (column name, parquet type name)
+CONTRACT_COLUMNS = [
+    ("doc_id", "string"), ("filename", "string"), ("uploaded_on", "timestamp"), ("expiry_date", "date"),
+    ("status", "string"), ("risk_score", "string"), ("file_size", "int64"), ("page_count", "int64"),
+]
+CLAUSE_COLUMNS = [
+    ("doc_id", "string"), ("filename", "string"), ("chunk_id", "string"), ("clause_type", "string"),
+    ("page", "int64"), ("page_end", "int64"), ("text", "string"),
+]
+
+
+def contracts_query(user_id) -> Select:
+    return (
+        select(
+            Document.doc_id, Document.filename, Document.uploaded_on, Document.expiry_date,
+            Document.status, Document.risk_score, Document.file_size, Document.page_count,
+        )
+        .where(Document.user_id == user_id)
+        # Same order as /contracts, served by idx_documents_user_uploaded
+        .order_by(Document.uploaded_on.desc(), Document.doc_id.desc())
+    )
+
+
+def clauses_query(user_id) -> Select:
+    return (
+        select(Chunk.doc_id, Document.filename, Chunk.chunk_id, Chunk.chunk_metadata, Chunk.text_chunk)
+        .join(Document, Document.doc_id == Chunk.doc_id)
+        .where(Chunk.user_id == user_id, Document.user_id == user_id)
+        # Read in idx_chunks_user_doc_created order, so rows stream without a sort
+        .order_by(Chunk.doc_id, Chunk.created_at)
+    )
+
+
+def _contract_row(row) -> Dict[str, Any]:
+    return dict(row._mapping)
+
+
+def _clause_row(row) -> Dict[str, Any]:
+    metadata = row.chunk_metadata or {}
+    return {
+        "doc_id": row.doc_id,
+        "filename": row.filename,
+        "chunk_id": row.chunk_id,
+        "clause_type": metadata.get("clause_type"),
+        "page": metadata.get("page"),
+        "page_end": metadata.get("page_end"),
+        "text": row.text_chunk,
+    }
+
+
+async def _batches(query: Select, to_row: Callable) -> AsyncIterator[List[Dict[str, Any]]]:
+    # A session of its own: it lives exactly as long as the response body
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield [to_row(row) for row in partition]
+
+
+# -------------------- ENCODERS --------------------
+
+def _plain(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class CsvEncoder:
+    def __init__(self, columns: Sequence[str]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(columns)
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        for row in rows:
+            self._writer.writerow([_plain(row[c]) for c in self.columns])
+        return self._drain()
+
+    def close(self) -> bytes:
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+class NdjsonEncoder:
+    def __init__(self, columns: Sequence[str]):
+        self.columns = columns
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps({c: _plain(row[c]) for c in self.columns}, ensure_ascii=False) + "\n" for row in rows
+        ).encode("utf-8")
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+class ParquetEncoder:
+    def __init__(self, columns: Sequence[tuple]):
+        import pyarrow as pa  # only needed for Parquet exports
+        import pyarrow.parquet as pq
+
+        types = {"string": pa.string(), "int64": pa.int64(), "timestamp": pa.timestamp("us"), "date": pa.date32()}
+        self._pa = pa
+        self.columns = [name for name, _ in columns]
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self._sink = _Sink()
+        self._writer = pq.ParquetWriter(self._sink, self.schema, compression="zstd")
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        data = {
+            name: [str(row[name]) if isinstance(row[name], uuid.UUID) else row[name] for row in rows]
+            for name in self.columns
+        }
+        self._writer.write_table(self._pa.Table.from_pydict(data, schema=self.schema))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()  # writes the footer
+        return self._sink.drain()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _encoder(fmt: str, columns: Sequence[tuple]):
+    if fmt == "parquet":
+        return ParquetEncoder(columns)
+    names = [name for name, _ in columns]
+    return CsvEncoder(names) if fmt == "csv" else NdjsonEncoder(names)
+
+
+async def stream(fmt: str, query: Select, clauses: bool = False) -> AsyncIterator[bytes]:
+    """Encoded export body, batch by batch"""
+    encoder = _encoder(fmt, CLAUSE_COLUMNS if clauses else CONTRACT_COLUMNS)
+    async for rows in _batches(query, _clause_row if clauses else _contract_row):
+        data = encoder.encode(rows)
+        if data:
+            yield data
+    data = encoder.close()
+    if data:
+        yield data
@@ -0,0 +1,308 @@
+"""
+Local text extraction and chunking for PDF, DOCX and TXT uploads.
+
+Each format has a generator that yields one page of text at a time, and the
+chunker consumes it as it goes, so a page is dropped once it is chunked and
+the parser never holds the whole file:
+
+- PDF: pypdf, page by page
+- DOCX: word/document.xml streamed with iterparse; page breaks and Word's
+  last-rendered-page markers start a new page
+- TXT: read line by line; form feeds start a new page
+
+Text without page markers is paged every EXTRACT_PAGE_LINES lines. Chunks
+are packed from paragraphs (a clause, in most contracts) up to CHUNK_SIZE
+characters, repeat the last CHUNK_OVERLAP characters of the previous chunk,
+and record the pages they span.
+
+Chunks are not collected either: extract_document() writes each one to a
+ChunkSpool (a JSON-lines temp file) as it is built, and only the spool's
+path goes back from the worker process. The ingest thread then makes one
+pass over the spool per stage, reading a chunk (or an embedding batch) at a
+time, so memory on both sides stays flat as documents grow: a page, a
+chunk, and at most one batch. Images, fonts and other non-text content are
+never kept.
+
+Extraction is CPU-bound, so extract() runs it in a process pool rather than
+on the ingest worker threads.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from xml.etree import ElementTree
+
+from dotenv import load_dotenv
+
+from .clauses import classify_one
+from .llama_mock import contract_type_from_filename
+
+load_dotenv()
+
+# Configuration
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1200"))  # characters
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+EXTRACT_PAGE_LINES = int(os.getenv("EXTRACT_PAGE_LINES", "60"))
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))  # 0 extracts on the calling thread
+EXTRACT_SPOOL_DIR = os.getenv("EXTRACT_SPOOL_DIR") or None  # chunk spools; default is the system temp dir
+
+Page = Tuple[int, str]  # (page number, text)
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END_RE = re.compile(r"(?<=[.;:])\s+")
+
+
+# -------------------- PAGES --------------------
+
+def detect_format(path: str) -> str:
+    """"pdf", "docx" or "txt" from the magic bytes; stored uploads have no extension"""
+    with open(path, "rb") as f:
+        head = f.read(4)
+    if head == b"%PDF":
+        return "pdf"
+    if head == b"PK\x03\x04":
+        return "docx"
+    return "txt"
+
+
+def paginate_lines(lines: Iterable[str], page_lines: int = EXTRACT_PAGE_LINES) -> Iterator[Page]:
+    """Group lines into pages at form feeds, or every page_lines lines"""
+    number, buffer = 1, []
+    for line in lines:
+        for i, part in enumerate(line.split("\f")):
+            # A form feed ends the page; repeated markers do not make empty pages
+            if i and buffer:
+                yield number, "".join(buffer)
+                number, buffer = number + 1, []
+            if part:
+                buffer.append(part)
+        if len(buffer) >= page_lines:
+            yield number, "".join(buffer)
+            number, buffer = number + 1, []
+    if buffer:
+        yield number, "".join(buffer)
+
+
+def iter_txt_pages(path: str) -> Iterator[Page]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        yield from paginate_lines(f)
+
+
+def _docx_lines(xml) -> Iterator[str]:
+    """Paragraph texts, one per line; page breaks come through as form feeds"""
+    body, parts = None, []
+    for event, elem in ElementTree.iterparse(xml, events=("start", "end")):
+        if event == "start":
+            if elem.tag == _W + "body":
+                body = elem
+            continue
+        if elem.tag == _W + "t" and elem.text:
+            parts.append(elem.text)
+        elif elem.tag == _W + "tab":
+            parts.append("\t")
+        elif (elem.tag == _W + "br" and elem.get(_W + "type") == "page") or elem.tag == _W + "lastRenderedPageBreak":
+            parts.append("\f")
+        elif elem.tag == _W + "p":
+            yield "".join(parts) + "\n"
+            parts = []
+        # Finished top-level paragraphs and tables are dropped so the tree never grows
+        if body is not None and len(body) and body[-1] is elem:
+            body.remove(elem)
+
+
+def iter_docx_pages(path: str) -> Iterator[Page]:
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        yield from paginate_lines(_docx_lines(xml))
+
+
+def iter_pdf_pages(path: str) -> Iterator[Page]:
+    from pypdf import PdfReader  # only needed for PDFs
+
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        for number, page in enumerate(reader.pages, start=1):
+            yield number, page.extract_text() or ""
+
+
+PAGE_READERS = {"pdf": iter_pdf_pages, "docx": iter_docx_pages, "txt": iter_txt_pages}
+
+
+# -------------------- CHUNKS --------------------
+
+def _segments(text: str, limit: int) -> Iterator[Tuple[str, str]]:
+    """(separator, text) pieces no longer than limit: paragraphs, else sentences, else words"""
+    for paragraph in _PARAGRAPH_BREAK_RE.split(text):
+        paragraph = " ".join(paragraph.split())  # unwrap hard line breaks
+        if not paragraph:
+            continue
+        pieces = [paragraph] if len(paragraph) <= limit else _SENTENCE_END_RE.split(paragraph)
+        separator = "\n\n"
+        for piece in pieces:
+            while len(piece) > limit:
+                cut = piece.rfind(" ", 0, limit)
+                cut = cut if cut > 0 else limit
+                yield separator, piece[:cut]
+                piece, separator = piece[cut:].lstrip(), " "
+            if piece:
+                yield separator, piece
+                separator = " "
+
+
+def _overlap_tail(text: str, overlap: int) -> str:
+    """The last `overlap` characters, starting at a word boundary"""
+    if overlap <= 0 or len(text) <= overlap:
+        return ""
+    tail = text[-overlap:]
+    space = tail.find(" ")
+    return tail[space + 1:] if space >= 0 else tail
+
+
+def chunk_pages(
+    pages: Iterable[Page], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP
+) -> Iterator[Dict[str, Any]]:
+    """Chunks of at most chunk_size characters: {"text", "page", "page_end"}"""
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("CHUNK_OVERLAP must be smaller than CHUNK_SIZE")
+    parts: List[str] = []
+    length, fresh = 0, False
+    first_page = last_page = None
+
+    for number, text in pages:
+        for separator, segment in _segments(text, chunk_size - overlap):
+            if fresh and length + len(separator) + len(segment) > chunk_size:
+                chunk = "".join(parts)
+                yield {"text": chunk, "page": first_page, "page_end": last_page}
+                # Only as much overlap as still leaves room for this segment
+                tail = _overlap_tail(chunk, min(overlap, chunk_size - len(separator) - len(segment)))
+                parts, length, fresh = ([tail], len(tail), False) if tail else ([], 0, False)
+                first_page = last_page
+            if not parts:
+                separator, first_page = "", number
+            parts.append(separator + segment)
+            length += len(separator) + len(segment)
+            last_page, fresh = number, True
+
+    if fresh:
+        yield {"text": "".join(parts), "page": first_page, "page_end": last_page}
+
+
+# -------------------- DOCUMENTS --------------------
+
+class ChunkSpool:
+    """
+    A document's chunks in a JSON-lines temp file. Only the path is pickled,
+    so it crosses the process boundary for free, and every iteration reads
+    the file again one chunk at a time. close() deletes the file.
+    """
+
+    def __init__(self, directory: Optional[str] = EXTRACT_SPOOL_DIR):
+        fd, self.path = tempfile.mkstemp(prefix="chunks-", suffix=".jsonl", dir=directory)
+        os.close(fd)
+        self.count = 0
+
+    def write(self, chunks: Iterable[Dict[str, Any]]):
+        with open(self.path, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk) + "\n")
+                self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def extract_document(
+    filename: str, path: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP
+) -> Dict[str, Any]:
+    """
+    Parse result in the shape mock_llama_parse returns, plus format and
+    pages_per_second; "chunks" is a ChunkSpool the caller closes.
+    """
+    started = time.perf_counter()
+    file_format = detect_format(path)
+    contract_type = contract_type_from_filename(filename)
+    pages_seen = [0]
+
+    def counted(pages):
+        for page in pages:
+            pages_seen[0] = page[0]
+            yield page
+
+    def document_chunks():
+        pages = counted(PAGE_READERS[file_format](path))
+        for i, chunk in enumerate(chunk_pages(pages, chunk_size, overlap)):
+            yield {
+                "chunk_id": f"c{i + 1}",
+                "text": chunk["text"],
+                "metadata": {
+                    "page": chunk["page"],
+                    "page_end": chunk["page_end"],
+                    "contract_name": filename,
+                    "contract_type": contract_type,
+                    "clause_type": classify_one(chunk["text"]),
+                },
+            }
+
+    chunks = ChunkSpool()
+    try:
+        chunks.write(document_chunks())
+    except BaseException:
+        chunks.close()
+        raise
+
+    elapsed = time.perf_counter() - started
+    page_count = max(pages_seen[0], 1)
+    return {
+        "filename": filename,
+        "format": file_format,
+        "contract_type": contract_type,
+        "page_count": page_count,
+        "chunks": chunks,
+        "processing_time": round(elapsed, 3),
+        "pages_per_second": round(page_count / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: children must not inherit the API's DB connections and threads
+            _pool = ProcessPoolExecutor(EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def extract(filename: str, path: str) -> Dict[str, Any]:
+    """extract_document in the process pool; only the calling ingest thread waits"""
+    if EXTRACT_WORKERS <= 0:
+        return extract_document(filename, path)
+    return _get_pool().submit(extract_document, filename, path, CHUNK_SIZE, CHUNK_OVERLAP).result()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,427 @@
+"""
+Contract ingestion pipeline: parse -> risk -> dates -> embed and store.
+
+/upload persists the file, creates the Document ("Processing") and an
+IngestionJob, then either runs the pipeline inline or hands the job to a
+bounded worker pool and returns 202. Workers use their own DB sessions and
+record stage/progress on the job row so any API process can report it.
+While a job runs, a heartbeat thread in its process keeps touching the
+row. At startup, queued jobs are resubmitted and running jobs whose
+heartbeat has stopped (their process died) are failed.
+When the same user has already ingested a file with the same SHA-256, its
+chunk text and embeddings are copied instead of running the pipeline again.
+
+The stages after parse each make one pass over the parsed chunks, which
+DOCUMENT_PARSER=local leaves on disk (extraction.ChunkSpool): risk and
+dates read them one at a time, and the last stage embeds and inserts them
+EMBED_BATCH_SIZE * EMBED_CONCURRENCY at a time, all in the job's one
+transaction. Memory does not grow with the document.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+import os
+import threading
+import traceback
+import uuid
+
+from dotenv import load_dotenv
+
+from . import expiry, extraction, metrics, risk, stats
+from .bulk import insert_chunks
+from .database import SessionLocal
+from .embeddings import EMBED_BATCH_SIZE, EMBED_CONCURRENCY, embed_texts
+from .llama_mock import contract_type_from_filename
+from .models import Chunk, Document, IngestionJob
+from .providers import get_parser
+from .retrieval import retriever
+
+load_dotenv()
+
+# Configuration
+INGEST_MODE = os.getenv("INGEST_MODE", "inline")  # "inline" or "async"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+# Running jobs are touched this often, however long their current stage takes
+INGEST_HEARTBEAT_SECONDS = float(os.getenv("INGEST_HEARTBEAT_SECONDS", "60"))
+# A running job not touched for this long was left by a process that died
+INGEST_STALE_MINUTES = int(os.getenv("INGEST_STALE_MINUTES", "30"))
+
+RISK_LEVELS = risk.RISK_LEVELS
+
+# (stage, progress when the stage starts); "embed" also inserts the chunks, batch by batch
+STAGES = [("parse", 10), ("risk", 30), ("dates", 40), ("embed", 50)]
+# Chunks embedded and inserted per step of the embed stage: enough for every concurrent request
+STORE_BATCH_SIZE = EMBED_BATCH_SIZE * EMBED_CONCURRENCY
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+# -------------------- STAGES --------------------
+
+def parse_stage(filename: str, path: str) -> Dict[str, Any]:
+    with metrics.stage("parse"):
+        return get_parser().parse_file(filename, path)
+
+
+def risk_stage(db, document: Document, chunks: Iterable[Dict[str, Any]]) -> str:
+    clauses = ((c["text"], c.get("metadata", {}).get("clause_type")) for c in chunks)
+    with metrics.stage("risk"):
+        return risk.assess(db, document.content_hash, clauses, document.filename).level
+
+
+def dates_stage(document: Document, chunks: Iterable[Dict[str, Any]]):
+    uploaded_on = (document.uploaded_on or datetime.utcnow()).date()
+    with metrics.stage("dates"):
+        clauses = ((c["text"], c.get("metadata", {}).get("clause_type")) for c in chunks)
+        return expiry.extract_expiry(clauses, uploaded_on)
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embed_stage(db, document: Document, chunks: Iterable[Dict[str, Any]]):
+    """Embed and insert the chunks a batch at a time"""
+    for batch in _batches(chunks, STORE_BATCH_SIZE):
+        embeddings = embed_texts([c["text"] for c in batch], db=db)
+        store_stage(db, document, batch, embeddings)
+
+
+# Chunk metadata that depends only on the file's content; everything else is per document
+_CONTENT_METADATA = ("page", "page_end", "clause_type", "confidence")
+
+
+def find_ingested_copy(db, document: Document):
+    """
+    An Active document of the same user with the same content that already
+    has chunks. Scoped to the user on purpose: copied rows carry the source's
+    text, and reuse must never reach across tenants.
+    """
+    if not document.content_hash:
+        return None
+    return (
+        db.query(Document)
+        .filter(
+            Document.user_id == document.user_id,
+            Document.content_hash == document.content_hash,
+            Document.doc_id != document.doc_id,
+            Document.status == "Active",
+            Document.chunks.any(),
+        )
+        .order_by(Document.uploaded_on)
+        .first()
+    )
+
+
+def copy_stage(db, document: Document, source: Document):
+    """
+    Reuse a previously ingested document's chunk text and embeddings. Only
+    content-derived metadata is copied; the contract name and type come from
+    the new document's own filename.
+    """
+    document_metadata = {
+        "contract_name": document.filename,
+        "contract_type": contract_type_from_filename(document.filename),
+    }
+    source_chunks = (
+        db.query(Chunk.text_chunk, Chunk.embedding, Chunk.chunk_metadata)
+        .filter(Chunk.doc_id == source.doc_id)
+        .all()
+    )
+    chunk_rows = [
+        {
+            "chunk_id": uuid.uuid4(),
+            "doc_id": document.doc_id,
+            "user_id": document.user_id,
+            "text_chunk": text,
+            "embedding": embedding,
+            "chunk_metadata": {
+                **{k: v for k, v in (metadata or {}).items() if k in _CONTENT_METADATA},
+                **document_metadata,
+            },
+        }
+        for text, embedding, metadata in source_chunks
+    ]
+    with metrics.stage("copy"):
+        insert_chunks(db, chunk_rows)
+
+
+def store_stage(db, document: Document, chunks, embeddings):
+    chunk_rows = [
+        {
+            "chunk_id": uuid.uuid4(),
+            "doc_id": document.doc_id,
+            "user_id": document.user_id,
+            "text_chunk": chunk_data["text"],
+            "embedding": embedding,
+            "chunk_metadata": chunk_data["metadata"],
+        }
+        for chunk_data, embedding in zip(chunks, embeddings)
+    ]
+    with metrics.stage("store"):
+        insert_chunks(db, chunk_rows)
+
+
+# -------------------- JOBS --------------------
+
+def _set_stage(db, job: IngestionJob, stage: str, progress: int):
+    job.stage = stage
+    job.progress = progress
+    job.updated_at = datetime.utcnow()
+    db.commit()
+
+
+class JobHeartbeat:
+    """Bumps updated_at on this process's running jobs from one daemon thread"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._jobs: Set[uuid.UUID] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def beating(self, job_id):
+        self._ensure_started()
+        with self._lock:
+            self._jobs.add(job_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._jobs.discard(job_id)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ingest-heartbeat", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                job_ids = list(self._jobs)
+            if job_ids:
+                self._touch(job_ids)
+
+    def _touch(self, job_ids: List[uuid.UUID]):
+        db = SessionLocal()
+        try:
+            db.query(IngestionJob).filter(
+                IngestionJob.job_id.in_(job_ids), IngestionJob.status == "running"
+            ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            traceback.print_exc()
+        finally:
+            db.close()
+
+    def shutdown(self):
+        self._stop.set()
+
+
+_heartbeat = JobHeartbeat(INGEST_HEARTBEAT_SECONDS)
+
+
+def _still_running(db, job_id) -> bool:
+    """Lock the job row; False if it was failed from elsewhere while the pipeline ran"""
+    status = (
+        db.query(IngestionJob.status).filter(IngestionJob.job_id == job_id).with_for_update().scalar()
+    )
+    return status == "running"
+
+
+def _claim(db, job_id) -> bool:
+    """Move a queued job to running; False if another worker got it first"""
+    claimed = (
+        db.query(IngestionJob)
+        .filter(IngestionJob.job_id == job_id, IngestionJob.status == "queued")
+        .update({"status": "running", "updated_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+
+def run_stages(db, job: IngestionJob, document: Document):
+    """Parse a new file and run it through every stage: (page_count, risk_score, expiry_date)"""
+    _set_stage(db, job, *STAGES[0])
+    parsed_result = parse_stage(document.filename, job.file_path)
+    chunks = parsed_result["chunks"]
+    try:
+        _set_stage(db, job, *STAGES[1])
+        risk_score = risk_stage(db, document, chunks)
+
+        _set_stage(db, job, *STAGES[2])
+        expiry_date = dates_stage(document, chunks)
+
+        _set_stage(db, job, *STAGES[3])
+        embed_stage(db, document, chunks)
+    finally:
+        if isinstance(chunks, extraction.ChunkSpool):
+            chunks.close()
+    return parsed_result.get("page_count", 1), risk_score, expiry_date
+
+
+def process_job(job_id):
+    """Run every pipeline stage for a job; safe to call from any thread"""
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        with _heartbeat.beating(job_id):
+            job = db.query(IngestionJob).filter(IngestionJob.job_id == job_id).first()
+            document = db.query(Document).filter(Document.doc_id == job.doc_id).first()
+            user_id = document.user_id
+            before = stats.snapshot(document)
+
+            try:
+                source = find_ingested_copy(db, document)
+                if source is not None:
+                    _set_stage(db, job, "copy", 50)
+                    copy_stage(db, document, source)
+                    document.page_count = source.page_count
+                    document.risk_score = source.risk_score
+                    document.expiry_date = source.expiry_date
+                else:
+                    page_count, risk_score, expiry_date = run_stages(db, job, document)
+                    document.page_count = page_count
+                    document.risk_score = risk_score
+                    document.expiry_date = expiry_date
+                if not _still_running(db, job_id):
+                    db.rollback()
+                    return
+                document.status = "Active"
+                job.status = "completed"
+                job.stage = "done"
+                job.progress = 100
+                job.updated_at = datetime.utcnow()
+                stats.record_change(db, user_id, before, stats.snapshot(document))
+                db.commit()
+            except Exception:
+                db.rollback()
+                traceback.print_exc()
+                if not _still_running(db, job_id):
+                    db.rollback()
+                    return
+                document = db.query(Document).filter(Document.doc_id == job.doc_id).first()
+                before = stats.snapshot(document)
+                document.status = "Failed"
+                stats.record_change(db, user_id, before, stats.snapshot(document))
+                db.query(IngestionJob).filter(IngestionJob.job_id == job_id).update(
+                    # Shown to the client; the exception itself only goes to the log
+                    {"status": "failed", "error": f"{job.stage} stage failed", "updated_at": datetime.utcnow()}
+                )
+                db.commit()
+                return
+
+            retriever.index_document(db, user_id, document.doc_id)
+    finally:
+        db.close()
+
+
+def create_job(db, user_id, filename: str, path: str, size: int, content_hash: str):
+    """Create the Processing document and its queued job for a stored upload"""
+    document = Document(
+        user_id=user_id,
+        filename=filename,
+        file_size=size,
+        content_hash=content_hash,
+        status="Processing",
+    )
+    db.add(document)
+    db.flush()
+    stats.record_change(db, user_id, None, stats.snapshot(document))
+
+    job = IngestionJob(
+        user_id=user_id,
+        doc_id=document.doc_id,
+        file_path=path,
+        status="queued",
+        stage="queued",
+        progress=0,
+    )
+    db.add(job)
+    db.commit()
+    return document, job
+
+
+def submit(job_id):
+    """Queue a job on the worker pool"""
+    return _executor.submit(process_job, job_id)
+
+
+def fail_stale_jobs(stale_minutes: int = INGEST_STALE_MINUTES) -> int:
+    """
+    Fail jobs left running by a process that died mid-pipeline, and their
+    Processing documents, so they do not stay in progress forever. A live
+    worker's heartbeat keeps its jobs out of this, however long a stage
+    runs. They are not retried: a file that crashed its worker would crash
+    the next one.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=stale_minutes)
+    db = SessionLocal()
+    failed = 0
+    try:
+        stale = (
+            db.query(IngestionJob)
+            .filter(IngestionJob.status == "running", IngestionJob.updated_at < cutoff)
+            .all()
+        )
+        for job in stale:
+            # Conditional, so a job another process is still advancing is left alone
+            updated = (
+                db.query(IngestionJob)
+                .filter(
+                    IngestionJob.job_id == job.job_id,
+                    IngestionJob.status == "running",
+                    IngestionJob.updated_at < cutoff,
+                )
+                .update(
+                    {
+                        "status": "failed",
+                        "error": f"interrupted in stage {job.stage}; upload the file again",
+                        "updated_at": datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            document = db.query(Document).filter(Document.doc_id == job.doc_id).first()
+            if updated and document is not None and document.status == "Processing":
+                before = stats.snapshot(document)
+                document.status = "Failed"
+                stats.record_change(db, document.user_id, before, stats.snapshot(document))
+            db.commit()
+            failed += updated
+    finally:
+        db.close()
+    return failed
+
+
+def resume_queued_jobs():
+    """Re-submit jobs left queued by a previous process"""
+    db = SessionLocal()
+    try:
+        job_ids = [j for (j,) in db.query(IngestionJob.job_id).filter(IngestionJob.status == "queued")]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        submit(job_id)
+
+
+def shutdown():
+    """Stop taking work; jobs not yet started stay queued for the next boot"""
+    _executor.shutdown(wait=True, cancel_futures=True)
+    _heartbeat.shutdown()
+    extraction.shutdown()
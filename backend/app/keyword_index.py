@@ -0,0 +1,145 @@
+"""
+In-process BM25 keyword index, the full-text counterpart of vector_index.
+
+Used by the numpy retrieval backend, where there is no Postgres tsvector to
+query. Each user's index lives in memory and is built on first use from the
+payloads already kept by their UserVectorIndex, then maintained on add and
+remove alongside it.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import heapq
+import math
+import re
+import threading
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what when "
+    "where which who will with shall any all may must our your their".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index over chunk text, scored with Okapi BM25"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, int]] = {}  # term -> {entry: term frequency}
+        self._lengths: Dict[int, int] = {}
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._doc_entries: Dict[str, List[int]] = {}
+        self._clause_entries: Dict[str, Set[int]] = {}
+        self._total_length = 0
+        self._next = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(
+        self,
+        chunk_ids: Sequence[str],
+        doc_ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ):
+        with self._lock:
+            for chunk_id, doc_id, text, metadata in zip(chunk_ids, doc_ids, texts, metadatas):
+                entry = self._next
+                self._next += 1
+                doc_id = str(doc_id)
+                metadata = metadata or {}
+                self._entries[entry] = {
+                    "chunk_id": str(chunk_id), "doc_id": doc_id, "text": text, "metadata": metadata,
+                }
+                self._doc_entries.setdefault(doc_id, []).append(entry)
+                clause_type = metadata.get("clause_type")
+                if clause_type:
+                    self._clause_entries.setdefault(clause_type, set()).add(entry)
+
+                tokens = tokenize(text)
+                self._lengths[entry] = len(tokens)
+                self._total_length += len(tokens)
+                for term in tokens:
+                    postings = self._postings.setdefault(term, {})
+                    postings[entry] = postings.get(entry, 0) + 1
+
+    def remove_document(self, doc_id: str):
+        with self._lock:
+            for entry in self._doc_entries.pop(str(doc_id), []):
+                payload = self._entries.pop(entry)
+                clause_type = payload["metadata"].get("clause_type")
+                if clause_type:
+                    self._clause_entries.get(clause_type, set()).discard(entry)
+                self._total_length -= self._lengths.pop(entry)
+                for term in set(tokenize(payload["text"])):
+                    postings = self._postings.get(term)
+                    if postings is not None:
+                        postings.pop(entry, None)
+                        if not postings:
+                            del self._postings[term]
+
+    def search(
+        self, query: str, top_k: int, clause_type: Optional[str] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Top-k (payload, bm25 score) for the query terms, OR semantics"""
+        with self._lock:
+            n = len(self._entries)
+            if not n:
+                return []
+            allowed = self._clause_entries.get(clause_type, set()) if clause_type else None
+            if allowed is not None and not allowed:
+                return []
+            avg_length = self._total_length / n
+
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                if allowed is not None and len(allowed) < len(postings):
+                    candidates = ((e, postings[e]) for e in allowed if e in postings)
+                else:
+                    candidates = postings.items()
+                for entry, tf in candidates:
+                    if allowed is not None and entry not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[entry] / avg_length)
+                    scores[entry] = scores.get(entry, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [(self._entries[entry], score) for entry, score in best]
+
+
+_indexes: Dict[str, BM25Index] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_user_keyword_index(user_id, vector_index) -> BM25Index:
+    """The user's keyword index, built from their vector index payloads on first use"""
+    key = str(user_id)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = BM25Index()
+            payloads = vector_index.live_payloads()
+            index.add(
+                [p["chunk_id"] for p in payloads],
+                [p["doc_id"] for p in payloads],
+                [p["text"] for p in payloads],
+                [p["metadata"] for p in payloads],
+            )
+            _indexes[key] = index
+        return index
+
+
+def drop_user_keyword_index(user_id):
+    """Forget a user's index so it is rebuilt from the vector index next time"""
+    with _indexes_lock:
+        _indexes.pop(str(user_id), None)
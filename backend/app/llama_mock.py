@@ -1,53 +1,75 @@
 import random
 import json
-from typing import List, Dict, Any
+import hashlib
+import numpy as np
+from typing import List, Dict, Any, BinaryIO, Union
 
-def mock_llama_parse(filename: str, content: bytes) -> Dict[str, Any]:
+from .clauses import classify, classify_one
+
+# Clause templates per contract type; the parser picks a set based on the filename
+CONTRACT_CLAUSES = {
+    "msa": [
+        "Either party may terminate this agreement with ninety (90) days written notice to the other party.",
+        "In no event shall either party be liable for any indirect, incidental, special, or consequential damages.",
+        "Payment shall be made within thirty (30) days of receipt of invoice.",
+        "Each party retains ownership of their respective intellectual property rights."
+    ],
+    "nda": [
+        "Confidential information shall not be disclosed to any third party without prior written consent.",
+        "The obligations of confidentiality shall survive termination of this agreement for a period of five (5) years.",
+        "Receiving party shall use the same degree of care to protect confidential information as with its own confidential information."
+    ],
+    "license": [
+        "Licensor grants licensee a non-exclusive, non-transferable license to use the software.",
+        "License fees are due within thirty (30) days of the invoice date.",
+        "This license shall terminate automatically upon breach of any terms herein."
+    ]
+}
+
+# Boilerplate clauses; the parser appends the first one to three of them
+ADDITIONAL_CLAUSES = [
+    "Force majeure events shall excuse performance delays beyond reasonable control.",
+    "Any amendments to this agreement must be in writing and signed by both parties.",
+    "This agreement shall be governed by the laws of the state of incorporation.",
+    "Disputes shall be resolved through binding arbitration in accordance with commercial rules."
+]
+
+def contract_type_from_filename(filename: str) -> str:
+    """MSA, NDA, License or Generic, guessed from the filename"""
+    filename_lower = filename.lower()
+    if "msa" in filename_lower or "service" in filename_lower:
+        return "MSA"
+    elif "nda" in filename_lower or "confidential" in filename_lower:
+        return "NDA"
+    elif "license" in filename_lower:
+        return "License"
+    return "Generic"
+
+def mock_llama_parse(filename: str, content: Union[bytes, BinaryIO]) -> Dict[str, Any]:
     """
     Mock LlamaCloud parsing response
-    Simulates document parsing and returns chunks with embeddings
+    Simulates document parsing and returns chunks with embeddings.
+    content is the file bytes or an open binary file; the mock ignores it.
     """
     
-    # Simulate different contract types based on filename
-    contract_clauses = {
-        "msa": [
-            "Either party may terminate this agreement with ninety (90) days written notice to the other party.",
-            "In no event shall either party be liable for any indirect, incidental, special, or consequential damages.",
-            "Payment shall be made within thirty (30) days of receipt of invoice.",
-            "Each party retains ownership of their respective intellectual property rights."
-        ],
-        "nda": [
-            "Confidential information shall not be disclosed to any third party without prior written consent.",
-            "The obligations of confidentiality shall survive termination of this agreement for a period of five (5) years.",
-            "Receiving party shall use the same degree of care to protect confidential information as with its own confidential information."
-        ],
-        "license": [
-            "Licensor grants licensee a non-exclusive, non-transferable license to use the software.",
-            "License fees are due within thirty (30) days of the invoice date.",
-            "This license shall terminate automatically upon breach of any terms herein."
-        ]
-    }
-    
     # Determine contract type from filename
-    filename_lower = filename.lower()
-    if "msa" in filename_lower or "service" in filename_lower:
-        clauses = contract_clauses["msa"]
-        contract_type = "MSA"
-    elif "nda" in filename_lower or "confidential" in filename_lower:
-        clauses = contract_clauses["nda"] 
-        contract_type = "NDA"
-    elif "license" in filename_lower:
-        clauses = contract_clauses["license"]
-        contract_type = "License"
+    contract_type = contract_type_from_filename(filename)
+    if contract_type == "Generic":
+        clauses = random.choice(list(CONTRACT_CLAUSES.values()))
     else:
-        clauses = random.choice(list(contract_clauses.values()))
-        contract_type = "Generic"
+        clauses = CONTRACT_CLAUSES[contract_type.lower()]
     
+    # Mock embeddings (1536 dimensions for OpenAI), generated in one batch and
+    # seeded by the filename so re-parsing a file gives the same vectors
+    seed = int(hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16], 16)
+    embeddings = np.random.default_rng(seed).uniform(-1, 1, (len(clauses) + 3, 1536)).tolist()
+
+    clause_types = classify(clauses)
+
     # Generate mock chunks
     chunks = []
     for i, clause in enumerate(clauses):
-        # Generate mock embedding (1536 dimensions for OpenAI)
-        embedding = [random.uniform(-1, 1) for _ in range(1536)]
+        embedding = embeddings[i]
         
         chunk = {
             "chunk_id": f"c{i+1}",
@@ -57,22 +79,17 @@ def mock_llama_parse(filename: str, content: bytes) -> Dict[str, Any]:
                 "page": i + 1,
                 "contract_name": filename,
                 "contract_type": contract_type,
-                "clause_type": get_clause_type(clause),
+                "clause_type": clause_types[i],
                 "confidence": round(random.uniform(85, 98), 1)
             }
         }
         chunks.append(chunk)
     
     # Add some additional mock chunks for variety
-    additional_clauses = [
-        "Force majeure events shall excuse performance delays beyond reasonable control.",
-        "Any amendments to this agreement must be in writing and signed by both parties.",
-        "This agreement shall be governed by the laws of the state of incorporation.",
-        "Disputes shall be resolved through binding arbitration in accordance with commercial rules."
-    ]
-    
-    for i, clause in enumerate(additional_clauses[:random.randint(1, 3)]):
-        embedding = [random.uniform(-1, 1) for _ in range(1536)]
+    extra_clauses = ADDITIONAL_CLAUSES[:random.randint(1, 3)]
+    extra_types = classify(extra_clauses)
+    for i, clause in enumerate(extra_clauses):
+        embedding = embeddings[len(clauses) + i]
         chunk = {
             "chunk_id": f"c{len(chunks)+i+1}",
             "text": clause,
@@ -81,7 +98,7 @@ def mock_llama_parse(filename: str, content: bytes) -> Dict[str, Any]:
                 "page": len(chunks) + i + 2,
                 "contract_name": filename,
                 "contract_type": contract_type,
-                "clause_type": get_clause_type(clause),
+                "clause_type": extra_types[i],
                 "confidence": round(random.uniform(80, 95), 1)
             }
         }
@@ -99,27 +116,4 @@ def mock_llama_parse(filename: str, content: bytes) -> Dict[str, Any]:
 
 def get_clause_type(clause_text: str) -> str:
     """Determine clause type from text content"""
-    clause_lower = clause_text.lower()
-    
-    if "terminate" in clause_lower or "termination" in clause_lower:
-        return "Termination"
-    elif "liable" in clause_lower or "liability" in clause_lower:
-        return "Liability"
-    elif "payment" in clause_lower or "invoice" in clause_lower:
-        return "Payment"
-    elif "intellectual property" in clause_lower or "ip" in clause_lower:
-        return "Intellectual Property"
-    elif "confidential" in clause_lower:
-        return "Confidentiality" 
-    elif "license" in clause_lower:
-        return "Licensing"
-    elif "force majeure" in clause_lower:
-        return "Force Majeure"
-    elif "amendment" in clause_lower:
-        return "Amendment"
-    elif "governing" in clause_lower or "jurisdiction" in clause_lower:
-        return "Governing Law"
-    elif "dispute" in clause_lower or "arbitration" in clause_lower:
-        return "Dispute Resolution"
-    else:
-        return "General"
\ No newline at end of file
+    return classify_one(clause_text)
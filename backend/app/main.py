@@ -1,37 +1,66 @@
 from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+import json
+import time
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 
-from .database import get_db, init_db
-from .models import User, Document, Chunk
+from .database import check_schema, get_async_db
+from .models import User, Document, Chunk, IngestionJob, QueryLog, UserStats
 from .schemas import (
     UserCreate,
     UserLogin,
     TokenResponse,
     ContractResponse,
+    JobResponse,
+    QueryHistoryItem,
+    QueryHistoryPage,
     QueryRequest,
     QueryResponse,
 )
-from .auth import create_access_token, verify_token, get_password_hash, verify_password
-from .llama_mock import mock_llama_parse
+from .auth import (
+    Principal,
+    create_access_token,
+    get_password_hash_async,
+    principal_cache,
+    verify_password_async,
+    verify_token,
+)
+from .retrieval import retriever, ahybrid_search
+from .embeddings import aembed_texts
+from .providers import get_llm
+from . import embedding_cache, metrics
+from .answer_cache import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_SEMANTIC,
+    ANSWER_CACHE_SIMILARITY,
+    answer_cache,
+    normalize_query,
+)
+from . import export, ingestion, query_log
+from . import stats
+from .pagination import page_of, paginate
+from .storage import UploadLimitMiddleware, UploadTooLarge, spool_upload
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 app = FastAPI(
     title="ContractAI API",
     description="AI-Powered Contract Management System",
     version="1.0.0",
 )
 
+# Innermost, so CORS headers and request metrics cover its 413s too
+app.add_middleware(UploadLimitMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -42,63 +71,83 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 security = HTTPBearer()
 
 
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    check_schema()
+    ingestion.fail_stale_jobs()
+    ingestion.resume_queued_jobs()
+
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await run_in_threadpool(ingestion.shutdown)
+    await run_in_threadpool(query_log.shutdown)
 
-def get_current_user(
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
-    """Get current authenticated user"""
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    """Get current authenticated user; verified tokens are served from cache"""
+    token = credentials.credentials
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     try:
-        payload = verify_token(credentials.credentials)
+        payload = verify_token(token)
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = db.query(User).filter(User.user_id == user_id).first()
+        result = await db.execute(select(User).where(User.user_id == user_id))
+        user = result.scalar_one_or_none()
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
+
 
 # -------------------- AUTH --------------------
 
 @app.post("/auth/signup", response_model=TokenResponse)
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(
-        (User.email == user_data.email) | (User.username == user_data.username)
-    ).first()
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(User).where((User.email == user_data.email) | (User.username == user_data.username))
+    )
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user = User(
         username=user_data.username,
         email=user_data.email,
         password_hash=hashed_password,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
 
     token = create_access_token(data={"sub": str(user.user_id)})
     return TokenResponse(access_token=token, token_type="bearer")
 
 
 @app.post("/auth/login", response_model=TokenResponse)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_data.email).first()
-    if not user or not verify_password(user_data.password, user.password_hash):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.email == user_data.email))
+    user = result.scalar_one_or_none()
+    if not user or not await verify_password_async(user_data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = create_access_token(data={"sub": str(user.user_id)})
@@ -110,8 +159,9 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 @app.post("/upload")
 async def upload_contract(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    background: Optional[bool] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     allowed_types = [
         "application/pdf",
@@ -121,206 +171,455 @@ async def upload_contract(
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Invalid file type")
 
-    content = await file.read()
-    parsed_result = mock_llama_parse(file.filename, content)
-
-    # Simple AI risk scoring
-    risk_prompt = f"Classify this contract '{file.filename}' into risk category (Low, Medium, High) based on termination, liability, penalties."
-    risk_completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": risk_prompt}],
-    )
-    risk_score = risk_completion.choices[0].message.content.strip()
-    if risk_score not in ["Low", "Medium", "High"]:
-        risk_score = "Low"
-
-    document = Document(
-        user_id=current_user.user_id,
-        filename=file.filename,
-        file_size=len(content),
-        page_count=parsed_result.get("page_count", 1),
-        status="Active",
-        risk_score=risk_score,
+    try:
+        content_hash, path, size = await spool_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    document, job = await db.run_sync(
+        lambda s: ingestion.create_job(s, current_user.user_id, file.filename, path, size, content_hash)
     )
-    db.add(document)
-    db.commit()
-    db.refresh(document)
-
-    for chunk_data in parsed_result["chunks"]:
-        embedding_response = client.embeddings.create(
-            input=chunk_data["text"], model="text-embedding-3-small"
-        )
-        embedding = embedding_response.data[0].embedding
-
-        chunk = Chunk(
-            doc_id=document.doc_id,
-            user_id=current_user.user_id,
-            text_chunk=chunk_data["text"],
-            embedding=embedding,
-            metadata=chunk_data["metadata"],
+    document_id, job_id = str(document.doc_id), job.job_id
+
+    run_in_background = ingestion.INGEST_MODE == "async" if background is None else background
+    if run_in_background:
+        ingestion.submit(job_id)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"message": "Upload accepted", "document_id": document_id, "job_id": str(job_id)},
         )
-        db.add(chunk)
 
-    db.commit()
-    return {"message": "Uploaded successfully", "document_id": str(document.doc_id)}
+    # The pipeline runs on a worker thread with its own session
+    await run_in_threadpool(ingestion.process_job, job_id)
+    await db.refresh(job)
+    if job.status != "completed":
+        raise HTTPException(status_code=500, detail=f"Processing failed: {job.error}")
+    return {"message": "Uploaded successfully", "document_id": document_id}
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job_status(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await db.execute(
+        select(IngestionJob).where(
+            IngestionJob.job_id == job_id, IngestionJob.user_id == current_user.user_id
+        )
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return JobResponse(
+        job_id=str(job.job_id),
+        document_id=str(job.doc_id),
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
 
 
 # -------------------- CONTRACTS --------------------
 
 @app.get("/contracts", response_model=List[ContractResponse])
 async def get_contracts(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, description="Deprecated offset paging; use the X-Next-Cursor header"),
     limit: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
     status: Optional[str] = None,
     risk: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    include_total: bool = False,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(Document).filter(Document.user_id == current_user.user_id)
+    """
+    The body stays a bare list of contracts. The cursor for the next page is
+    in the X-Next-Cursor header (absent on the last page), and with
+    include_total the match count is in X-Total-Count.
+    """
+    query = _filter_contracts(select(Document).where(Document.user_id == current_user.user_id), search, status, risk)
+
+    if include_total:
+        total = await _count_contracts(db, current_user.user_id, query, search, status, risk)
+        response.headers["X-Total-Count"] = str(total)
+
+    query = paginate(query, Document.uploaded_on, Document.doc_id, cursor, limit)
+    if skip and not cursor:
+        query = query.offset(skip)  # old clients; costs O(skip) like before
+    result = await db.execute(query)
+    contracts, next_cursor = page_of(result.scalars().all(), limit, "uploaded_on", "doc_id")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [ContractResponse.from_orm(c) for c in contracts]
+
+
+def _filter_contracts(query, search: Optional[str], status: Optional[str], risk: Optional[str]):
+    """The /contracts filters, on any select that includes Document"""
     if search:
-        query = query.filter(Document.filename.ilike(f"%{search}%"))
+        # Escape LIKE wildcards; the trigram index serves '%term%' patterns
+        pattern = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(Document.filename.ilike(f"%{pattern}%", escape="\\"))
     if status:
-        query = query.filter(Document.status == status)
+        query = query.where(Document.status == status)
     if risk:
-        query = query.filter(Document.risk_score == risk)
+        query = query.where(Document.risk_score == risk)
+    return query
 
-    contracts = query.offset(skip).limit(limit).all()
-    return [ContractResponse.from_orm(c) for c in contracts]
+
+async def _count_contracts(db: AsyncSession, user_id, query, search, status, risk) -> int:
+    """Unfiltered and single-filter totals come from user_stats; others need a COUNT"""
+    if not search and not (status and risk):
+        row = await db.get(UserStats, user_id)
+        if row is None:
+            return 0
+        if status:
+            return (row.status_counts or {}).get(status, 0)
+        if risk:
+            return (row.risk_counts or {}).get(risk, 0)
+        return row.total_contracts
+    return await db.scalar(select(func.count()).select_from(query.subquery()))
 
 
 @app.get("/contracts/{contract_id}")
 async def get_contract_detail(
     contract_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    contract = (
-        db.query(Document)
-        .filter(Document.doc_id == contract_id, Document.user_id == current_user.user_id)
-        .first()
+    result = await db.execute(
+        select(Document).where(
+            Document.doc_id == contract_id, Document.user_id == current_user.user_id
+        )
     )
+    contract = result.scalar_one_or_none()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
 
-    chunks = (
-        db.query(Chunk)
-        .filter(Chunk.doc_id == contract_id, Chunk.user_id == current_user.user_id)
-        .all()
+    result = await db.execute(
+        select(Chunk.text_chunk, Chunk.chunk_metadata).where(
+            Chunk.doc_id == contract_id, Chunk.user_id == current_user.user_id
+        )
     )
+    chunks = result.all()
     return {
         "contract": ContractResponse.from_orm(contract),
-        "chunks": [{"text": c.text_chunk, "metadata": c.metadata} for c in chunks],
+        "chunks": [{"text": text, "metadata": metadata} for text, metadata in chunks],
     }
 
 
 @app.delete("/contracts/{contract_id}")
 async def delete_contract(
     contract_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    contract = (
-        db.query(Document)
-        .filter(Document.doc_id == contract_id, Document.user_id == current_user.user_id)
-        .first()
+    result = await db.execute(
+        select(Document).where(
+            Document.doc_id == contract_id, Document.user_id == current_user.user_id
+        )
     )
+    contract = result.scalar_one_or_none()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
 
-    db.query(Chunk).filter(Chunk.doc_id == contract_id).delete()
-    db.delete(contract)
-    db.commit()
+    await db.execute(delete(Chunk).where(Chunk.doc_id == contract.doc_id))
+    await db.execute(delete(IngestionJob).where(IngestionJob.doc_id == contract.doc_id))
+    before = stats.snapshot(contract)
+    await db.run_sync(lambda s: stats.record_change(s, current_user.user_id, before, None))
+    await db.delete(contract)
+    await db.commit()
+    retriever.remove_document(current_user.user_id, contract_id)
     return {"message": "Contract deleted"}
 
 
+# -------------------- EXPORT --------------------
+
+def _export_response(fmt: str, name: str, query, clauses: bool) -> StreamingResponse:
+    if fmt == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed")
+    filename = f"{name}-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return StreamingResponse(
+        export.stream(fmt, query, clauses=clauses),
+        media_type=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/export/contracts")
+async def export_contracts(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    risk: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    """One row per contract, streamed; same filters as /contracts"""
+    query = _filter_contracts(export.contracts_query(current_user.user_id), search, status, risk)
+    return _export_response(fmt, "contracts", query, clauses=False)
+
+
+@app.get("/export/clauses")
+async def export_clauses(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    risk: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    """One row per clause of the matching contracts, streamed"""
+    query = _filter_contracts(export.clauses_query(current_user.user_id), search, status, risk)
+    return _export_response(fmt, "clauses", query, clauses=True)
+
+
 # -------------------- AI QUERY --------------------
 
+async def _retrieve(query_data: QueryRequest, user_id, query_embedding, db: AsyncSession):
+    """Fetch the chunks to answer from"""
+    with metrics.stage("retrieval"):
+        results = await ahybrid_search(
+            db,
+            user_id,
+            query_data.query,
+            query_embedding,
+            top_k=query_data.top_k,
+            min_score=query_data.min_score,
+            search_effort=query_data.search_effort,
+            clause_type=query_data.clause_type,
+            mode=query_data.retrieval_mode,
+        )
+
+    # End the read transaction so the pooled connection is not held during generation
+    await db.commit()
+    return results
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+async def _prepare_answer(query_data: QueryRequest, user_id, db: AsyncSession, timings: Dict[str, float]):
+    """
+    Answer-cache lookup, then retrieval on a miss.
+    Returns (cached answer or None, retrieved chunks, cache bucket, query embedding);
+    embed_ms and retrieval_ms go into timings.
+    """
+    bucket = None
+    if ANSWER_CACHE_ENABLED:
+        version = await db.scalar(select(UserStats.corpus_version).where(UserStats.user_id == user_id))
+        scope = (
+            query_data.top_k,
+            query_data.min_score,
+            query_data.search_effort,
+            query_data.clause_type,
+            query_data.retrieval_mode,
+        )
+        bucket = answer_cache.bucket(user_id, version or 0, scope)
+        cached = answer_cache.get(bucket, normalize_query(query_data.query))
+        if cached is not None:
+            await db.commit()
+            return cached, [], bucket, None
+
+    started = time.perf_counter()
+    query_embedding = (await aembed_texts([query_data.query], db=db))[0]
+    timings["embed_ms"] = _elapsed_ms(started)
+    if bucket is not None:
+        if ANSWER_CACHE_SEMANTIC:
+            cached = answer_cache.find_similar(bucket, query_embedding, ANSWER_CACHE_SIMILARITY)
+            if cached is not None:
+                await db.commit()
+                return cached, [], bucket, query_embedding
+        answer_cache.record_miss()
+
+    started = time.perf_counter()
+    results = await _retrieve(query_data, user_id, query_embedding, db)
+    timings["retrieval_ms"] = _elapsed_ms(started)
+    return None, results, bucket, query_embedding
+
+
+def _remember_answer(query_data: QueryRequest, bucket, query_embedding, answer: str, chunks: List[dict]):
+    if bucket is not None:
+        answer_cache.put(
+            bucket,
+            normalize_query(query_data.query),
+            answer,
+            chunks,
+            embedding=query_embedding if ANSWER_CACHE_SEMANTIC else None,
+        )
+
+
+def _answer_prompt(query: str, results) -> str:
+    context = "\n".join(f"- {r.text}" for r in results)
+    return f"Answer the query: {query} based on these contract excerpts:\n{context}"
+
+
+def _chunk_payloads(results) -> List[dict]:
+    return [
+        {
+            "chunk_id": r.chunk_id,
+            "text": r.text,
+            "metadata": r.metadata,
+            "relevance_score": r.score,
+            "vector_score": r.vector_score,
+            "keyword_score": r.keyword_score,
+        }
+        for r in results
+    ]
+
+
 @app.post("/ask", response_model=QueryResponse)
 async def query_contracts(
     query_data: QueryRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query_embedding = client.embeddings.create(
-        input=query_data.query, model="text-embedding-3-small"
-    ).data[0].embedding
+    started, timings = time.perf_counter(), {}
+    cached, results, bucket, query_embedding = await _prepare_answer(query_data, current_user.user_id, db, timings)
+    if cached is not None:
+        timings["total_ms"] = _elapsed_ms(started)
+        query_log.record(current_user.user_id, query_data.query, cached.answer, cached.chunks, timings, cached=True)
+        return QueryResponse(answer=cached.answer, chunks=cached.chunks, query=query_data.query)
 
-    chunks = (
-        db.query(Chunk).filter(Chunk.user_id == current_user.user_id).limit(5).all()
-    )
+    llm_started = time.perf_counter()
+    with metrics.stage("llm"):
+        ai_answer = await get_llm().acomplete(_answer_prompt(query_data.query, results))
+    timings["llm_ms"] = _elapsed_ms(llm_started)
+    chunks = _chunk_payloads(results)
+    _remember_answer(query_data, bucket, query_embedding, ai_answer, chunks)
+
+    timings["total_ms"] = _elapsed_ms(started)
+    query_log.record(current_user.user_id, query_data.query, ai_answer, chunks, timings)
+    return QueryResponse(answer=ai_answer, chunks=chunks, query=query_data.query)
 
-    ai_answer = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "user",
-                "content": f"Answer the query: {query_data.query} based on these contracts.",
-            }
-        ],
-    ).choices[0].message.content
-
-    relevant_chunks = [
-        {"text": c.text_chunk, "metadata": c.metadata, "relevance_score": 85}
-        for c in chunks
-    ]
 
-    # TODO: store query in a queries table (add migration)
-    return QueryResponse(answer=ai_answer, chunks=relevant_chunks, query=query_data.query)
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
-@app.get("/ask/history")
+@app.post("/ask/stream")
+async def stream_query_contracts(
+    query_data: QueryRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    /ask as server-sent events: `chunks` as soon as retrieval finishes, then
+    `token` events while the answer is generated, then `done` with the full
+    answer (or `error`). If the client disconnects, the response task is
+    cancelled and the upstream completion is closed with it.
+    """
+    started, timings = time.perf_counter(), {}
+    cached, results, bucket, query_embedding = await _prepare_answer(query_data, current_user.user_id, db, timings)
+    user_id = current_user.user_id
+
+    async def cached_events():
+        yield _sse("chunks", {"query": query_data.query, "chunks": cached.chunks})
+        yield _sse("token", {"text": cached.answer})
+        yield _sse("done", {"answer": cached.answer})
+        timings["total_ms"] = _elapsed_ms(started)
+        query_log.record(user_id, query_data.query, cached.answer, cached.chunks, timings, cached=True)
+
+    async def events():
+        chunks = _chunk_payloads(results)
+        yield _sse("chunks", {"query": query_data.query, "chunks": chunks})
+        answer = []
+        llm_started = time.perf_counter()
+        try:
+            with metrics.stage("llm"):
+                async for token in get_llm().astream(_answer_prompt(query_data.query, results)):
+                    answer.append(token)
+                    yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        ai_answer = "".join(answer)
+        timings["llm_ms"] = _elapsed_ms(llm_started)
+        _remember_answer(query_data, bucket, query_embedding, ai_answer, chunks)
+        yield _sse("done", {"answer": ai_answer})
+        timings["total_ms"] = _elapsed_ms(started)
+        query_log.record(user_id, query_data.query, ai_answer, chunks, timings)
+
+    return StreamingResponse(
+        cached_events() if cached is not None else events(),
+        media_type="text/event-stream",
+        # No proxy buffering, or tokens arrive in one burst at the end
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/ask/history", response_model=QueryHistoryPage)
 async def get_query_history(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    # placeholder: implement once queries table exists
-    return {"history": []}
+    """Newest first; entries can lag /ask by up to QUERY_LOG_FLUSH_SECONDS"""
+    query = select(QueryLog).where(QueryLog.user_id == current_user.user_id)
+    result = await db.execute(paginate(query, QueryLog.created_at, QueryLog.query_id, cursor, limit))
+    entries, next_cursor = page_of(result.scalars().all(), limit, "created_at", "query_id")
+    return QueryHistoryPage(
+        history=[QueryHistoryItem.from_orm(e) for e in entries],
+        next_cursor=next_cursor,
+    )
 
 
 # -------------------- ANALYTICS --------------------
 
 @app.get("/analytics/summary")
 async def get_analytics_summary(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)
 ):
-    total = db.query(Document).filter(Document.user_id == current_user.user_id).count()
-    active = (
-        db.query(Document)
-        .filter(Document.user_id == current_user.user_id, Document.status == "Active")
-        .count()
-    )
+    row = await db.get(UserStats, current_user.user_id)
+    if row is None:
+        return {"total_contracts": 0, "active_contracts": 0, "high_risk_contracts": 0, "expiring_soon": 0}
     return {
-        "total_contracts": total,
-        "active_contracts": active,
-        "high_risk_contracts": 2,
-        "expiring_soon": 3,
+        "total_contracts": row.total_contracts,
+        "active_contracts": (row.status_counts or {}).get("Active", 0),
+        "high_risk_contracts": (row.risk_counts or {}).get("High", 0),
+        "expiring_soon": stats.expiring_count(row, days=30),
     }
 
 
 @app.get("/analytics/risks")
 async def get_risk_distribution(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)
 ):
-    risks = {"Low": 0, "Medium": 0, "High": 0}
-    docs = db.query(Document).filter(Document.user_id == current_user.user_id).all()
-    for d in docs:
-        if d.risk_score in risks:
-            risks[d.risk_score] += 1
-    return risks
+    row = await db.get(UserStats, current_user.user_id)
+    counts = row.risk_counts if row is not None and row.risk_counts else {}
+    return {level: counts.get(level, 0) for level in ("Low", "Medium", "High")}
 
 
 @app.get("/analytics/expiring")
 async def get_expiring_contracts(
-    days: int = 30,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    days: int = Query(30, ge=0),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    cutoff = datetime.utcnow().date() + timedelta(days=days)
-    expiring = (
-        db.query(Document)
-        .filter(Document.user_id == current_user.user_id, Document.expiry_date <= cutoff)
-        .all()
+    # Window [start, end], by default the next `days` days; a range scan of idx_documents_user_expiry
+    start = start or datetime.utcnow().date()
+    end = end or start + timedelta(days=days)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    result = await db.execute(
+        select(Document)
+        .where(
+            Document.user_id == current_user.user_id,
+            Document.expiry_date >= start,
+            Document.expiry_date <= end,
+        )
+        .order_by(Document.expiry_date, Document.doc_id)
+        .limit(limit)
     )
+    expiring = result.scalars().all()
     return [ContractResponse.from_orm(c) for c in expiring]
 
 
@@ -331,6 +630,25 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
 
+@app.get("/health/embedding-cache")
+async def embedding_cache_stats():
+    return {
+        **embedding_cache.stats.snapshot(),
+        "memory_entries": len(embedding_cache.memory_cache),
+        "memory_bytes": embedding_cache.memory_cache.size_bytes,
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/health/answer-cache")
+async def answer_cache_stats():
+    return answer_cache.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
 
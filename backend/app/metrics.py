@@ -0,0 +1,223 @@
+"""
+Prometheus metrics, exposed at /metrics.
+
+- http_request_duration_seconds{method, route, status}: per route template,
+  measured by a plain ASGI middleware until the last body byte is sent
+- contractai_stage_duration_seconds{stage}: parse, risk, dates, embed, llm,
+  retrieval, db_query, db_commit, ... with contractai_stage_errors_total
+- db_pool_*{engine}: connection pool gauges, read at scrape time
+- openai_requests_total / openai_errors_total / openai_retries_total
+- contractai_extracted_pages_total{format}: with the parse stage histogram,
+  gives pages/sec for DOCUMENT_PARSER=local
+- contractai_query_log_records_total{outcome}: query history written, or
+  dropped because the write-behind buffer was full
+
+Recording is a perf_counter pair and a histogram observe, cheap enough to
+leave on; METRICS_ENABLED=false turns the middleware and SQL hooks off.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+import os
+import time
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+load_dotenv()
+
+# Configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "contractai_stage_duration_seconds",
+    "Time spent per processing stage",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter("contractai_stage_errors_total", "Stage executions that raised", ["stage"])
+OPENAI_REQUESTS = Counter("openai_requests_total", "OpenAI API calls", ["operation", "outcome"])
+OPENAI_ERRORS = Counter("openai_errors_total", "OpenAI API call failures", ["operation", "error"])
+OPENAI_RETRIES = Counter("openai_retries_total", "HTTP attempts beyond the first, per OpenAI call", ["operation"])
+EXTRACTED_PAGES = Counter("contractai_extracted_pages_total", "Pages extracted by the local parser", ["format"])
+QUERY_LOG_RECORDS = Counter(
+    "contractai_query_log_records_total", "Query history records by outcome (written, dropped, failed)", ["outcome"]
+)
+
+
+# -------------------- STAGES --------------------
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one execution of a stage; works around awaits too"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+
+# -------------------- OPENAI --------------------
+
+# HTTP attempts made inside the current openai_call (sync thread or async task)
+_openai_attempts: ContextVar[Optional[list]] = ContextVar("openai_attempts", default=None)
+
+
+def count_openai_attempt(request=None):
+    """httpx request hook: the OpenAI client retries internally, so count each attempt"""
+    attempts = _openai_attempts.get()
+    if attempts is not None:
+        attempts[0] += 1
+
+
+async def acount_openai_attempt(request=None):
+    count_openai_attempt(request)
+
+
+@contextmanager
+def openai_call(operation: str):
+    attempts = [0]
+    token = _openai_attempts.set(attempts)
+    try:
+        yield
+    except Exception as e:
+        OPENAI_REQUESTS.labels(operation, "error").inc()
+        OPENAI_ERRORS.labels(operation, type(e).__name__).inc()
+        raise
+    else:
+        OPENAI_REQUESTS.labels(operation, "ok").inc()
+    finally:
+        _openai_attempts.reset(token)
+        if attempts[0] > 1:
+            OPENAI_RETRIES.labels(operation).inc(attempts[0] - 1)
+
+
+# -------------------- DATABASE --------------------
+
+class PoolCollector:
+    """Connection pool gauges, computed at scrape time so there is no per-checkout cost"""
+
+    def __init__(self):
+        self.engines: Dict[str, object] = {}
+
+    def add(self, name: str, engine):
+        self.engines[name] = engine
+
+    def collect(self):
+        gauges = {
+            "size": GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["engine"]),
+            "checked_out": GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"]),
+            "checked_in": GaugeMetricFamily("db_pool_checked_in", "Idle pooled connections", labels=["engine"]),
+            "overflow": GaugeMetricFamily("db_pool_overflow", "Connections beyond pool_size", labels=["engine"]),
+        }
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue  # NullPool / StaticPool
+            gauges["size"].add_metric([name], pool.size())
+            gauges["checked_out"].add_metric([name], pool.checkedout())
+            gauges["checked_in"].add_metric([name], pool.checkedin())
+            gauges["overflow"].add_metric([name], max(pool.overflow(), 0))
+        return list(gauges.values())
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if starts:
+        STAGE_LATENCY.labels("db_query").observe(time.perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_query_start"):
+        conn.info["metrics_query_start"].pop()
+    STAGE_ERRORS.labels("db_query").inc()
+
+
+def _before_commit(session):
+    session.info["metrics_commit_start"] = time.perf_counter()
+
+
+def _after_commit(session):
+    started = session.info.pop("metrics_commit_start", None)
+    if started is not None:
+        STAGE_LATENCY.labels("db_commit").observe(time.perf_counter() - started)
+
+
+def instrument_engine(name: str, engine):
+    """Pool gauges plus per-statement timing; pass async engines' .sync_engine"""
+    pool_collector.add(name, engine)
+    if METRICS_ENABLED:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+if METRICS_ENABLED:
+    # Session-level, so flush time at commit is included; covers AsyncSession too
+    event.listen(Session, "before_commit", _before_commit)
+    event.listen(Session, "after_commit", _after_commit)
+
+
+# -------------------- HTTP --------------------
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware task/queue per request)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records the matched route in the scope; the template keeps cardinality bounded
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status[0])
+            ).observe(time.perf_counter() - started)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -1,11 +1,86 @@
-from sqlalchemy import Column, String, DateTime, Integer, Text, JSON, Date, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID, VECTOR
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Integer, Text, JSON, Date, ForeignKey, Index, LargeBinary, BigInteger, Boolean, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
+from pgvector.sqlalchemy import Vector
 import uuid
+import os
 from datetime import datetime
 
 from .database import Base
 
+# Vector index configuration
+NATIVE_EMBEDDING_DIMENSIONS = 1536  # OpenAI text-embedding-3-small
+# text-embedding-3 vectors can be shortened (e.g. 512) with little recall loss
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(NATIVE_EMBEDDING_DIMENSIONS)))
+# Precision of the searched vectors: "float32", "float16" (halfvec, pgvector >= 0.7) or "int8" (numpy backend)
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32")
+# Re-rank top_k x factor compact-precision candidates at full precision; 0 disables
+EMBEDDING_RERANK_FACTOR = int(os.getenv("EMBEDDING_RERANK_FACTOR", "4"))
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")  # "hnsw" or "ivfflat"
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+
+# Full-text search configuration for chunk keyword search
+FTS_CONFIG = "english"
+
+
+def _vector_index_options():
+    """Index build parameters for the configured ANN index type"""
+    if VECTOR_INDEX_TYPE == "ivfflat":
+        return {"lists": IVFFLAT_LISTS}
+    return {"m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION}
+
+
+class HalfVector(Vector):
+    """pgvector halfvec: same text input format as vector, 2 bytes per dimension"""
+
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        if self.dim is None:
+            return "HALFVEC"
+        return "HALFVEC(%d)" % self.dim
+
+
+def _embedding_index():
+    """
+    ANN index over chunk embeddings. With float16 storage the column keeps
+    full precision (for re-ranking) and the index is built over a halfvec
+    cast of it, halving the memory the index needs.
+    """
+    if EMBEDDING_STORAGE == "float16":
+        return Index(
+            "idx_chunks_embedding",
+            text(f"(embedding::halfvec({EMBEDDING_DIMENSIONS})) halfvec_cosine_ops"),
+            postgresql_using=VECTOR_INDEX_TYPE,
+            postgresql_with=_vector_index_options(),
+        )
+    return Index(
+        "idx_chunks_embedding",
+        "embedding",
+        postgresql_using=VECTOR_INDEX_TYPE,
+        postgresql_with=_vector_index_options(),
+        postgresql_ops={"embedding": "vector_cosine_ops"},
+    )
+
+
+def _document_indexes():
+    """Composite indexes matching the /contracts filters and keyset order"""
+    return (
+        Index("idx_documents_user_uploaded", "user_id", "uploaded_on", "doc_id"),
+        Index("idx_documents_user_status", "user_id", "status", "uploaded_on", "doc_id"),
+        Index("idx_documents_user_risk", "user_id", "risk_score", "uploaded_on", "doc_id"),
+        Index("idx_documents_user_expiry", "user_id", "expiry_date"),
+        # Filename substring search (pg_trgm)
+        Index(
+            "idx_documents_filename_trgm",
+            "filename",
+            postgresql_using="gin",
+            postgresql_ops={"filename": "gin_trgm_ops"},
+        ),
+    )
+
 class User(Base):
     __tablename__ = "users"
     
@@ -31,10 +106,14 @@ class Document(Base):
     risk_score = Column(String(20), default="Low")
     file_size = Column(Integer)
     page_count = Column(Integer)
+    content_hash = Column(String(64), index=True)  # sha256 of the uploaded file
     
     # Relationships
     user = relationship("User", back_populates="documents")
     chunks = relationship("Chunk", back_populates="document")
+    jobs = relationship("IngestionJob", back_populates="document")
+
+    __table_args__ = _document_indexes()
 
 class Chunk(Base):
     __tablename__ = "chunks"
@@ -43,10 +122,91 @@ class Chunk(Base):
     doc_id = Column(UUID(as_uuid=True), ForeignKey("documents.doc_id"), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
     text_chunk = Column(Text, nullable=False)
-    embedding = Column(VECTOR(1536))  # OpenAI embedding dimensions
-    metadata = Column(JSON)
+    embedding = Column(Vector(EMBEDDING_DIMENSIONS))  # full precision; see EMBEDDING_STORAGE
+    # "metadata" is reserved on declarative classes, so map the column under another name
+    chunk_metadata = Column("metadata", JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Maintained by Postgres; deferred so loading a Chunk never fetches it
+    search_vector = deferred(
+        Column(TSVECTOR, Computed(f"to_tsvector('{FTS_CONFIG}', text_chunk)", persisted=True))
+    )
     
     # Relationships
     document = relationship("Document", back_populates="chunks")
-    user = relationship("User", back_populates="chunks")
\ No newline at end of file
+    user = relationship("User", back_populates="chunks")
+
+    __table_args__ = (
+        Index("idx_chunks_user_id", "user_id"),
+        Index("idx_chunks_doc_id", "doc_id"),
+        Index("idx_chunks_user_doc_created", "user_id", "doc_id", "created_at"),
+        Index("idx_chunks_user_clause_type", "user_id", text("(metadata ->> 'clause_type')")),
+        Index("idx_chunks_search_vector", "search_vector", postgresql_using="gin"),
+        _embedding_index(),
+    )
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    job_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False, index=True)
+    doc_id = Column(UUID(as_uuid=True), ForeignKey("documents.doc_id"), nullable=False)
+    file_path = Column(String(1024), nullable=False)
+    status = Column(String(20), default="queued", index=True)  # queued, running, completed, failed
+    stage = Column(String(20), default="queued")
+    progress = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    document = relationship("Document", back_populates="jobs")
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256(model, normalized text)
+    model = Column(String(100), nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # float32 bytes
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RiskAssessment(Base):
+    __tablename__ = "risk_assessments"
+
+    content_hash = Column(String(64), primary_key=True)
+    rules_version = Column(String(16), primary_key=True)  # hash of rules, weights and thresholds
+    risk_score = Column(String(20), nullable=False)  # Low, Medium, High
+    points = Column(Integer, nullable=False)
+    factors = Column(JSON, default=list)  # [{"rule", "weight", "excerpt"}, ...]
+    source = Column(String(10), nullable=False, default="rules")  # "rules" or "llm"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), primary_key=True)
+    total_contracts = Column(BigInteger, default=0, nullable=False)
+    total_bytes = Column(BigInteger, default=0, nullable=False)
+    total_pages = Column(BigInteger, default=0, nullable=False)
+    status_counts = Column(JSON, default=dict)  # {"Active": n, "Processing": n, ...}
+    risk_counts = Column(JSON, default=dict)  # {"Low": n, "Medium": n, "High": n}
+    expiry_counts = Column(JSON, default=dict)  # {"YYYY-MM-DD": n}, today onwards
+    corpus_version = Column(BigInteger, default=0, nullable=False)  # bumped on every document change
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class QueryLog(Base):
+    __tablename__ = "queries"
+
+    query_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
+    query = Column(Text, nullable=False)
+    answer = Column(Text)
+    chunk_ids = Column(JSON, default=list)
+    scores = Column(JSON, default=list)  # relevance score per returned chunk
+    timings = Column(JSON, default=dict)  # {"embed_ms", "retrieval_ms", "llm_ms", "total_ms"}
+    cached = Column(Boolean, default=False, nullable=False)  # answered from the answer cache
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Keyset order of /ask/history
+        Index("idx_queries_user_created", "user_id", "created_at", "query_id"),
+    )
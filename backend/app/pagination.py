@@ -0,0 +1,45 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on the previous page, encoded as an
+opaque URL-safe token. The next page is `WHERE (ts, id) < (:ts, :id)`, an
+index range scan, so page 1000 costs the same as page 1.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+import base64
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def encode_cursor(timestamp: datetime, row_id) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query, timestamp_column, id_column, cursor: Optional[str], limit: int):
+    """Newest first, resuming after `cursor`; fetches one extra row to detect a next page"""
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(timestamp_column, id_column) < tuple_(timestamp, row_id))
+    return query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def page_of(rows, limit: int, timestamp_attr: str, id_attr: str):
+    """Split a paginate() result into (page rows, next cursor or None)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_attr), getattr(last, id_attr))
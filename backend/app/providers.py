@@ -0,0 +1,347 @@
+"""
+AI provider layer: document parsing, embeddings and chat completions.
+
+AI_PROVIDER=openai uses the OpenAI API (and the LlamaCloud mock for parsing).
+DOCUMENT_PARSER=local parses the uploaded file itself instead of the mock:
+text is extracted and chunked by app.extraction in a process pool.
+AI_PROVIDER=local swaps in deterministic stand-ins that need no network or
+API key, so the backend can be benchmarked and load-tested offline:
+  - LocalEmbedder: hashed bag-of-words projected to EMBEDDING_DIMENSIONS in
+    one NumPy matrix product. The same text always gives the same vector, and
+    texts sharing words land close together, so retrieval behaves sensibly.
+  - LocalLLM: canned answers after a configurable, reproducible delay.
+"""
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Sequence, Union
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from . import extraction, metrics
+from .llama_mock import mock_llama_parse
+from .models import EMBEDDING_DIMENSIONS, NATIVE_EMBEDDING_DIMENSIONS
+
+load_dotenv()
+
+# Configuration
+AI_PROVIDER = os.getenv("AI_PROVIDER", "openai")  # "openai" or "local"
+DOCUMENT_PARSER = os.getenv("DOCUMENT_PARSER", "")  # "llama_mock" or "local"; empty follows AI_PROVIDER
+EMBEDDING_MODEL = "text-embedding-3-small"
+CHAT_MODEL = "gpt-4o-mini"
+LOCAL_LLM_LATENCY_MS = float(os.getenv("LOCAL_LLM_LATENCY_MS", "800"))
+LOCAL_LLM_JITTER_MS = float(os.getenv("LOCAL_LLM_JITTER_MS", "200"))
+LOCAL_EMBED_LATENCY_MS = float(os.getenv("LOCAL_EMBED_LATENCY_MS", "0"))
+
+
+class Parser:
+    def parse(self, filename: str, source: Union[bytes, BinaryIO]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def parse_file(self, filename: str, path: str) -> Dict[str, Any]:
+        # Hand the parser a file handle, never the whole file in memory
+        with open(path, "rb") as f:
+            return self.parse(filename, f)
+
+
+class Embedder:
+    model: str
+
+    @property
+    def cache_id(self) -> str:
+        """Embedding cache namespace: anything that changes the vectors must be in it"""
+        return self.model
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed one request's worth of texts, in input order"""
+        raise NotImplementedError
+
+    async def aembed(self, texts: Sequence[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class LLM:
+    model: str
+
+    def complete(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def acomplete(self, prompt: str) -> str:
+        return await asyncio.to_thread(self.complete, prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Answer text as it is generated; providers without streaming yield it whole"""
+        yield await self.acomplete(prompt)
+
+
+# -------------------- OPENAI --------------------
+
+_openai_client = None
+_async_openai_client = None
+_openai_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Created on first use so local mode never needs an API key"""
+    global _openai_client
+    with _openai_lock:
+        if _openai_client is None:
+            import httpx
+            from openai import OpenAI
+
+            _openai_client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=httpx.Client(event_hooks={"request": [metrics.count_openai_attempt]}),
+            )
+        return _openai_client
+
+
+def get_async_openai_client():
+    global _async_openai_client
+    with _openai_lock:
+        if _async_openai_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            _async_openai_client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=httpx.AsyncClient(event_hooks={"request": [metrics.acount_openai_attempt]}),
+            )
+        return _async_openai_client
+
+
+def _ordered_embeddings(response) -> List[List[float]]:
+    # The API echoes each input's position, which is not guaranteed to match response order
+    embeddings = [None] * len(response.data)
+    for item in response.data:
+        embeddings[item.index] = item.embedding
+    return embeddings
+
+
+class LlamaMockParser(Parser):
+    def parse(self, filename, source):
+        return mock_llama_parse(filename, source)
+
+
+class LocalParser(Parser):
+    """Extracts and chunks the document's own text (PDF, DOCX, TXT)"""
+
+    def parse(self, filename, source):
+        # The worker process reads from disk, so in-memory content is spilled first
+        with tempfile.NamedTemporaryFile() as f:
+            if isinstance(source, bytes):
+                f.write(source)
+            else:
+                for block in iter(lambda: source.read(1024 * 1024), b""):
+                    f.write(block)
+            f.flush()
+            return self.parse_file(filename, f.name)
+
+    def parse_file(self, filename, path):
+        result = extraction.extract(filename, path)
+        metrics.EXTRACTED_PAGES.labels(result["format"]).inc(result["page_count"])
+        return result
+
+
+class OpenAIEmbedder(Embedder):
+    def __init__(self, model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.model = model
+        self.dimensions = dimensions
+
+    @property
+    def cache_id(self):
+        if self.dimensions == NATIVE_EMBEDDING_DIMENSIONS:
+            return self.model
+        return f"{self.model}:{self.dimensions}"
+
+    def _options(self):
+        # text-embedding-3 shortens server-side; passed through extra_body for older SDKs
+        if self.dimensions == NATIVE_EMBEDDING_DIMENSIONS:
+            return {}
+        return {"extra_body": {"dimensions": self.dimensions}}
+
+    def embed(self, texts):
+        with metrics.openai_call("embeddings"):
+            response = get_openai_client().embeddings.create(
+                input=list(texts), model=self.model, **self._options()
+            )
+        return _ordered_embeddings(response)
+
+    async def aembed(self, texts):
+        with metrics.openai_call("embeddings"):
+            response = await get_async_openai_client().embeddings.create(
+                input=list(texts), model=self.model, **self._options()
+            )
+        return _ordered_embeddings(response)
+
+
+class OpenAILLM(LLM):
+    def __init__(self, model: str = CHAT_MODEL):
+        self.model = model
+
+    def complete(self, prompt):
+        with metrics.openai_call("chat"):
+            completion = get_openai_client().chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+            )
+        return completion.choices[0].message.content
+
+    async def acomplete(self, prompt):
+        with metrics.openai_call("chat"):
+            completion = await get_async_openai_client().chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+            )
+        return completion.choices[0].message.content
+
+    async def astream(self, prompt):
+        with metrics.openai_call("chat_stream"):
+            stream = await get_async_openai_client().chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+            )
+        try:
+            async for event in stream:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            # Runs on client disconnect too: stop paying for tokens nobody reads
+            await stream.response.aclose()
+
+
+# -------------------- LOCAL --------------------
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _text_seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class LocalEmbedder(Embedder):
+    """Deterministic feature-hashing embedder; no network, vectorised per batch"""
+
+    def __init__(self, dim: int = EMBEDDING_DIMENSIONS, buckets: int = 4096, seed: int = 1536):
+        self.model = f"local-hash-{dim}"
+        self.dim = dim
+        self.buckets = buckets
+        rng = np.random.default_rng(seed)
+        self._projection = rng.standard_normal((buckets, dim), dtype=np.float32) / np.sqrt(dim)
+
+    def embed(self, texts):
+        if LOCAL_EMBED_LATENCY_MS:
+            time.sleep(LOCAL_EMBED_LATENCY_MS / 1000)
+
+        rows, cols, signs = [], [], []
+        for i, text in enumerate(texts):
+            for token in _TOKEN_RE.findall(text.lower()):
+                h = _text_seed(token)
+                rows.append(i)
+                cols.append(h % self.buckets)
+                signs.append(1.0 if (h >> 32) & 1 else -1.0)
+
+        counts = np.zeros((len(texts), self.buckets), dtype=np.float32)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), signs)
+        vectors = counts @ self._projection
+
+        # Texts without tokens still get a stable, unique vector
+        empty = ~counts.any(axis=1)
+        for i in np.flatnonzero(empty):
+            vectors[i] = np.random.default_rng(_text_seed(texts[i])).standard_normal(self.dim)
+
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.tolist()
+
+
+class LocalLLM(LLM):
+    """Stand-in chat model with injected, reproducible latency"""
+
+    model = "local-llm"
+
+    def __init__(self, latency_ms: float = LOCAL_LLM_LATENCY_MS, jitter_ms: float = LOCAL_LLM_JITTER_MS):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    def delay(self, prompt: str) -> float:
+        """Seconds to wait for this prompt; jitter is seeded by the prompt"""
+        jitter = np.random.default_rng(_text_seed(prompt)).uniform(-1, 1) * self.jitter_ms
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def complete(self, prompt):
+        time.sleep(self.delay(prompt))
+        return self._answer(prompt)
+
+    async def acomplete(self, prompt):
+        await asyncio.sleep(self.delay(prompt))
+        return self._answer(prompt)
+
+    async def astream(self, prompt):
+        # Same total latency as acomplete, spread evenly over the tokens
+        tokens = re.findall(r"\S+\s*", self._answer(prompt))
+        per_token = self.delay(prompt) / max(len(tokens), 1)
+        for token in tokens:
+            await asyncio.sleep(per_token)
+            yield token
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        excerpts = [line[2:] for line in prompt.splitlines() if line.startswith("- ")]
+        if excerpts:
+            return f"Based on {len(excerpts)} contract excerpt(s): {excerpts[0]}"
+        return "No relevant contract excerpts were found."
+
+
+# -------------------- REGISTRY --------------------
+
+_PARSERS = {"llama_mock": LlamaMockParser, "local": LocalParser}
+
+_PROVIDERS = {
+    "openai": (LlamaMockParser, OpenAIEmbedder, OpenAILLM),
+    "local": (LlamaMockParser, LocalEmbedder, LocalLLM),
+}
+
+_parser: Optional[Parser] = None
+_embedder: Optional[Embedder] = None
+_llm: Optional[LLM] = None
+
+
+def parser_name() -> str:
+    """The parser uploads go through, as DOCUMENT_PARSER names it"""
+    parser_class = _PARSERS[DOCUMENT_PARSER] if DOCUMENT_PARSER else _PROVIDERS[AI_PROVIDER][0]
+    return next(name for name, cls in _PARSERS.items() if cls is parser_class)
+
+
+def get_parser() -> Parser:
+    global _parser
+    if _parser is None:
+        _parser = _PARSERS[DOCUMENT_PARSER]() if DOCUMENT_PARSER else _PROVIDERS[AI_PROVIDER][0]()
+    return _parser
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    if _embedder is None:
+        _embedder = _PROVIDERS[AI_PROVIDER][1]()
+    return _embedder
+
+
+def get_llm() -> LLM:
+    global _llm
+    if _llm is None:
+        _llm = _PROVIDERS[AI_PROVIDER][2]()
+    return _llm
+
+
+def configure(parser: Parser = None, embedder: Embedder = None, llm: LLM = None):
+    """Override providers (benchmarks, load tests)"""
+    global _parser, _embedder, _llm
+    _parser = parser or _parser
+    _embedder = embedder or _embedder
+    _llm = llm or _llm
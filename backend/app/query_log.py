@@ -0,0 +1,154 @@
+"""
+Write-behind query history.
+
+/ask and /ask/stream hand each record to record(), which only appends to an
+in-process queue, so answering a query never waits on an INSERT. A daemon
+thread drains the queue and writes one multi-row INSERT per batch, as soon
+as QUERY_LOG_BATCH_SIZE records are waiting or the oldest has waited
+QUERY_LOG_FLUSH_SECONDS.
+
+The queue holds at most QUERY_LOG_MAX_PENDING records. If the database
+falls that far behind, new records are dropped and counted rather than
+growing memory or slowing requests down; a batch that fails to insert is
+dropped the same way. shutdown() writes whatever is still queued.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from . import metrics
+from .models import QueryLog
+
+load_dotenv()
+
+# Configuration
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+QUERY_LOG_BATCH_SIZE = int(os.getenv("QUERY_LOG_BATCH_SIZE", "200"))
+QUERY_LOG_FLUSH_SECONDS = float(os.getenv("QUERY_LOG_FLUSH_SECONDS", "2"))
+QUERY_LOG_MAX_PENDING = int(os.getenv("QUERY_LOG_MAX_PENDING", "10000"))
+
+_STOP = object()
+
+
+class QueryLogWriter:
+    """Bounded queue plus one flushing thread, started on the first record"""
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def record(self, row: Dict[str, Any]) -> bool:
+        """Queue one row for insertion; False if it was dropped"""
+        if self._closed:
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            metrics.QUERY_LOG_RECORDS.labels("dropped").inc()
+            return False
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """Block for the first row, then collect until the batch is full or old enough"""
+        batch: List[Dict[str, Any]] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_seconds
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        from .database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(QueryLog), batch)
+            db.commit()
+            metrics.QUERY_LOG_RECORDS.labels("written").inc(len(batch))
+        except Exception:
+            db.rollback()
+            traceback.print_exc()
+            metrics.QUERY_LOG_RECORDS.labels("failed").inc(len(batch))
+        finally:
+            db.close()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop accepting records and wait for the queue to be written"""
+        self._closed = True
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)  # after every queued row, so those are flushed first
+        thread.join(timeout)
+
+
+_writer = QueryLogWriter(QUERY_LOG_BATCH_SIZE, QUERY_LOG_FLUSH_SECONDS, QUERY_LOG_MAX_PENDING)
+
+
+def record(
+    user_id,
+    query: str,
+    answer: Optional[str],
+    chunks: List[dict],
+    timings: Dict[str, float],
+    cached: bool = False,
+) -> bool:
+    """Queue a history entry for an answered query; never blocks on the database"""
+    if not QUERY_LOG_ENABLED:
+        return False
+    # chunk_ids[i] and scores[i] describe the same chunk
+    logged = [c for c in chunks if c.get("chunk_id")]
+    return _writer.record({
+        "query_id": uuid.uuid4(),
+        "user_id": user_id,
+        "query": query,
+        "answer": answer,
+        "chunk_ids": [c["chunk_id"] for c in logged],
+        "scores": [c.get("relevance_score") for c in logged],
+        "timings": {name: round(ms, 1) for name, ms in timings.items()},
+        "cached": cached,
+        "created_at": datetime.utcnow(),
+    })
+
+
+def shutdown():
+    _writer.shutdown()
@@ -0,0 +1,418 @@
+"""
+Retrieval over contract chunks: vector nearest neighbours, keyword search,
+and hybrid retrieval that runs both concurrently and merges the two rankings
+with reciprocal rank fusion (RRF).
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+import asyncio
+import os
+import re
+
+import numpy as np
+from sqlalchemy import Float, cast, func, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from .database import AsyncSessionLocal
+from .keyword_index import get_user_keyword_index
+from .models import (
+    Chunk,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_RERANK_FACTOR,
+    EMBEDDING_STORAGE,
+    FTS_CONFIG,
+    HalfVector,
+    VECTOR_INDEX_TYPE,
+)
+from .vector_index import get_user_index, write_lock
+
+load_dotenv()
+
+# Configuration
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "pgvector")  # "pgvector" or "numpy"
+DEFAULT_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+MAX_TOP_K = 50
+DEFAULT_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0"))  # percent, 0-100
+# Recall/latency knob: candidates visited per HNSW scan, or IVFFLAT lists probed
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+# Users with at most this many chunks are scored exactly over idx_chunks_user_id;
+# an ANN scan of the whole table would mostly visit other tenants' rows
+EXACT_SEARCH_MAX_CHUNKS = int(os.getenv("EXACT_SEARCH_MAX_CHUNKS", "20000"))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "hybrid", "vector" or "keyword"
+RRF_K = int(os.getenv("RRF_K", "60"))  # rank damping constant in 1 / (k + rank)
+RRF_CANDIDATES = int(os.getenv("RRF_CANDIDATES", "4"))  # per-source candidates, as a multiple of top_k
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class ScoredChunk:
+    chunk_id: str
+    doc_id: str
+    text: str
+    metadata: Dict[str, Any]
+    score: float  # cosine similarity, or fused RRF score, as a percentage
+    vector_score: Optional[float] = None  # cosine similarity percentage
+    keyword_score: Optional[float] = None  # ts_rank_cd / BM25 score
+
+
+def similarity_to_score(similarity: float) -> float:
+    """Convert cosine similarity into the percentage shown as relevance_score"""
+    return round(float(similarity) * 100, 1)
+
+
+_iterative_scan: Optional[bool] = None
+
+
+def _supports_iterative_scan(db: Session) -> bool:
+    """pgvector >= 0.8 can keep scanning the ANN index until filtered rows fill the LIMIT"""
+    global _iterative_scan
+    if _iterative_scan is None:
+        version = db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+        parts = tuple(int(p) for p in re.findall(r"\d+", version or "")[:2])
+        _iterative_scan = parts >= (0, 8)
+    return _iterative_scan
+
+
+def set_search_effort(db: Session, search_effort: Optional[int] = None):
+    """Set ef_search / probes (and iterative scans, where available) for the current transaction only"""
+    index_type = "ivfflat" if VECTOR_INDEX_TYPE == "ivfflat" else "hnsw"
+    if index_type == "ivfflat":
+        setting, value = "ivfflat.probes", search_effort or IVFFLAT_PROBES
+    else:
+        setting, value = "hnsw.ef_search", search_effort or HNSW_EF_SEARCH
+    db.execute(func.set_config(setting, str(int(value)), True).select())
+    if _supports_iterative_scan(db):
+        # Without it the user_id filter runs on at most ef_search / probes candidates
+        db.execute(func.set_config(f"{index_type}.iterative_scan", "relaxed_order", True).select())
+
+
+def _user_chunk_count(db: Session, user_id, limit: int) -> int:
+    """The user's chunk count, capped at limit + 1 (an index-only scan of idx_chunks_user_id)"""
+    rows = select(literal(1)).where(Chunk.user_id == user_id).limit(limit + 1).subquery()
+    return db.execute(select(func.count()).select_from(rows)).scalar()
+
+
+def _clause_type_filter(clause_type: Optional[str]):
+    return Chunk.chunk_metadata["clause_type"].as_string() == clause_type
+
+
+def _keyword_tsquery(query_text: str):
+    """Quoted queries use web-search syntax (phrases, AND); plain questions match any term"""
+    if '"' in query_text:
+        return func.websearch_to_tsquery(FTS_CONFIG, query_text)
+    words = _WORD_RE.findall(query_text)
+    return func.to_tsquery(FTS_CONFIG, " | ".join(words) if words else "")
+
+
+def _row_to_scored(chunk: Chunk, **scores) -> ScoredChunk:
+    return ScoredChunk(
+        chunk_id=str(chunk.chunk_id),
+        doc_id=str(chunk.doc_id),
+        text=chunk.text_chunk,
+        metadata=chunk.chunk_metadata or {},
+        **scores,
+    )
+
+
+def _embedding_distance(query_embedding: Sequence[float]):
+    """Cosine distance in the precision the ANN index was built with"""
+    if EMBEDDING_STORAGE == "float16":
+        # Must match the indexed expression, embedding::halfvec(d)
+        half = HalfVector(EMBEDDING_DIMENSIONS)
+        query = cast(literal(list(map(float, query_embedding)), half), half)
+        return cast(Chunk.embedding, half).op("<=>", return_type=Float)(query)
+    return Chunk.embedding.cosine_distance(query_embedding)
+
+
+def _rerank_exact(rows, query_embedding: Sequence[float], top_k: int):
+    """Re-score (chunk, distance) candidates against the full-precision column"""
+    q = np.asarray(query_embedding, dtype=np.float32)
+    q /= max(float(np.linalg.norm(q)), 1e-12)
+    rescored = []
+    for chunk, _ in rows:
+        v = np.asarray(chunk.embedding, dtype=np.float32)
+        rescored.append((chunk, 1 - float(v @ q) / max(float(np.linalg.norm(v)), 1e-12)))
+    rescored.sort(key=lambda row: row[1])
+    return rescored[:top_k]
+
+
+class PgVectorRetriever:
+    """ANN search inside Postgres; the chunks table is the index"""
+
+    def __init__(self):
+        if EMBEDDING_STORAGE not in ("float32", "float16"):
+            raise ValueError(f"EMBEDDING_STORAGE={EMBEDDING_STORAGE} needs RETRIEVAL_BACKEND=numpy")
+
+    def search(
+        self,
+        db: Session,
+        user_id,
+        query_embedding: Sequence[float],
+        top_k: int,
+        min_score: float,
+        search_effort: Optional[int] = None,
+        clause_type: Optional[str] = None,
+    ) -> List[ScoredChunk]:
+        set_search_effort(db, search_effort)
+
+        distance = _embedding_distance(query_embedding)
+        query = db.query(Chunk, distance.label("distance")).filter(
+            Chunk.user_id == user_id, Chunk.embedding.isnot(None)
+        )
+        if clause_type:
+            query = query.filter(_clause_type_filter(clause_type))
+        # Small result sets are scored exactly over the user_id / (user_id, clause_type)
+        # index range; post-filtering an ANN scan would silently drop matches
+        exact = bool(clause_type) or (
+            _user_chunk_count(db, user_id, EXACT_SEARCH_MAX_CHUNKS) <= EXACT_SEARCH_MAX_CHUNKS
+        )
+        rows = self._nearest(query, distance, query_embedding, top_k, exact)
+        if not exact and len(rows) < top_k:
+            # The ANN scan ran out of candidates before it found top_k of this user's rows
+            rows = self._nearest(query, distance, query_embedding, top_k, exact=True)
+
+        results = []
+        for chunk, dist in rows:
+            score = similarity_to_score(1 - dist)
+            if score < min_score:
+                break  # rows are sorted, nothing further can qualify
+            results.append(_row_to_scored(chunk, score=score, vector_score=score))
+        return results
+
+    @staticmethod
+    def _nearest(query, distance, query_embedding: Sequence[float], top_k: int, exact: bool):
+        """(chunk, distance) rows, nearest first"""
+        # ORDER BY must be the bare distance expression for the ANN index to be used;
+        # "+ 0" keeps the planner off it
+        query = query.order_by(distance + 0 if exact else distance)
+        if EMBEDDING_STORAGE != "float32" and EMBEDDING_RERANK_FACTOR > 0:
+            return _rerank_exact(query.limit(top_k * EMBEDDING_RERANK_FACTOR).all(), query_embedding, top_k)
+        # Iterative scans return rows in relaxed order
+        return sorted(query.limit(top_k).all(), key=lambda row: row[1])
+
+    def keyword_search(
+        self, db: Session, user_id, query_text: str, top_k: int, clause_type: Optional[str] = None
+    ) -> List[ScoredChunk]:
+        """Full-text search over the generated tsvector column (GIN index)"""
+        tsquery = _keyword_tsquery(query_text)
+        rank = func.ts_rank_cd(Chunk.search_vector, tsquery)
+        query = db.query(Chunk, rank.label("rank")).filter(
+            Chunk.user_id == user_id, Chunk.search_vector.op("@@")(tsquery)
+        )
+        if clause_type:
+            query = query.filter(_clause_type_filter(clause_type))
+        rows = query.order_by(rank.desc()).limit(top_k).all()
+        return [
+            _row_to_scored(chunk, score=round(float(r), 4), keyword_score=round(float(r), 4))
+            for chunk, r in rows
+        ]
+
+    async def asearch(
+        self, db: AsyncSession, user_id, query_embedding, top_k, min_score, search_effort=None, clause_type=None
+    ):
+        return await db.run_sync(
+            lambda s: self.search(s, user_id, query_embedding, top_k, min_score, search_effort, clause_type)
+        )
+
+    async def akeyword_search(self, db: AsyncSession, user_id, query_text, top_k, clause_type=None):
+        # Own session, so it can run concurrently with a vector search on `db`
+        async with AsyncSessionLocal() as keyword_db:
+            return await keyword_db.run_sync(
+                lambda s: self.keyword_search(s, user_id, query_text, top_k, clause_type)
+            )
+
+    def add_chunks(self, user_id, rows: Sequence[Dict[str, Any]]):
+        pass  # rows are indexed by Postgres on insert
+
+    def index_document(self, db: Session, user_id, doc_id):
+        pass
+
+    def remove_document(self, user_id, doc_id):
+        pass  # rows are removed from the index on delete
+
+
+class NumpyRetriever:
+    """Exact cosine search and BM25 over the in-process per-user indexes"""
+
+    def search(
+        self,
+        db: Session,
+        user_id,
+        query_embedding: Sequence[float],
+        top_k: int,
+        min_score: float,
+        search_effort: Optional[int] = None,
+        clause_type: Optional[str] = None,
+    ) -> List[ScoredChunk]:
+        index = get_user_index(user_id, EMBEDDING_DIMENSIONS)
+        rows = index.rows_with_clause_type(clause_type) if clause_type else None
+        if rows is not None and not len(rows):
+            return []
+        results = []
+        for row, similarity in index.search(query_embedding, top_k, min_similarity=min_score / 100, rows=rows):
+            payload = index.payload(row)
+            score = similarity_to_score(similarity)
+            results.append(
+                ScoredChunk(
+                    chunk_id=payload["chunk_id"],
+                    doc_id=payload["doc_id"],
+                    text=payload["text"],
+                    metadata=payload["metadata"] or {},
+                    score=score,
+                    vector_score=score,
+                )
+            )
+        return results
+
+    def keyword_search(
+        self, db: Session, user_id, query_text: str, top_k: int, clause_type: Optional[str] = None
+    ) -> List[ScoredChunk]:
+        index = get_user_keyword_index(user_id, get_user_index(user_id, EMBEDDING_DIMENSIONS))
+        return [
+            ScoredChunk(
+                chunk_id=payload["chunk_id"],
+                doc_id=payload["doc_id"],
+                text=payload["text"],
+                metadata=payload["metadata"] or {},
+                score=round(score, 4),
+                keyword_score=round(score, 4),
+            )
+            for payload, score in index.search(query_text, top_k, clause_type)
+        ]
+
+    async def asearch(
+        self, db: AsyncSession, user_id, query_embedding, top_k, min_score, search_effort=None, clause_type=None
+    ):
+        # CPU-bound matrix product: keep it off the event loop
+        return await asyncio.to_thread(
+            self.search, None, user_id, query_embedding, top_k, min_score, search_effort, clause_type
+        )
+
+    async def akeyword_search(self, db: AsyncSession, user_id, query_text, top_k, clause_type=None):
+        return await asyncio.to_thread(self.keyword_search, None, user_id, query_text, top_k, clause_type)
+
+    def add_chunks(self, user_id, rows: Sequence[Dict[str, Any]]):
+        """rows are Chunk column dicts, as inserted by the upload path"""
+        columns = (
+            [r["chunk_id"] for r in rows],
+            [r["doc_id"] for r in rows],
+            [r["text_chunk"] for r in rows],
+            [r["chunk_metadata"] or {} for r in rows],
+        )
+        # Under the write lock, so the write lands in the generation a rebuild swaps in
+        with write_lock(user_id):
+            index = get_user_index(user_id, EMBEDDING_DIMENSIONS)
+            keyword_index = get_user_keyword_index(user_id, index)
+            index.add(columns[0], columns[1], [r["embedding"] for r in rows], columns[2], columns[3])
+            keyword_index.add(*columns)
+
+    def index_document(self, db: Session, user_id, doc_id, batch_size: int = 1000):
+        """Add a committed document's chunks, read back from the table a batch at a time"""
+        query = select(
+            Chunk.chunk_id, Chunk.doc_id, Chunk.text_chunk, Chunk.embedding, Chunk.chunk_metadata
+        ).where(Chunk.doc_id == doc_id, Chunk.embedding.isnot(None))
+        for rows in db.execute(query.execution_options(yield_per=batch_size)).partitions():
+            self.add_chunks(user_id, [row._asdict() for row in rows])
+
+    def remove_document(self, user_id, doc_id):
+        with write_lock(user_id):
+            index = get_user_index(user_id, EMBEDDING_DIMENSIONS)
+            get_user_keyword_index(user_id, index).remove_document(doc_id)
+            index.remove_document(doc_id)
+
+
+_retrievers = {"pgvector": PgVectorRetriever, "numpy": NumpyRetriever}
+retriever = _retrievers[RETRIEVAL_BACKEND]()
+
+
+def rrf_fuse(rankings: Sequence[List[ScoredChunk]], top_k: int, k: int = RRF_K) -> List[ScoredChunk]:
+    """
+    Merge ranked lists by reciprocal rank fusion: sum of 1 / (k + rank).
+    The fused score is reported as a percentage of the best possible (rank 1
+    in every list); per-source scores are carried over from each list.
+    """
+    fused: Dict[str, ScoredChunk] = {}
+    totals: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            merged = fused.get(item.chunk_id)
+            if merged is None:
+                merged = fused[item.chunk_id] = ScoredChunk(
+                    chunk_id=item.chunk_id, doc_id=item.doc_id, text=item.text, metadata=item.metadata, score=0.0
+                )
+            if item.vector_score is not None:
+                merged.vector_score = item.vector_score
+            if item.keyword_score is not None:
+                merged.keyword_score = item.keyword_score
+            totals[item.chunk_id] = totals.get(item.chunk_id, 0.0) + 1.0 / (k + rank)
+
+    best_possible = len(rankings) / (k + 1)
+    ordered = sorted(fused.values(), key=lambda c: totals[c.chunk_id], reverse=True)[:top_k]
+    for item in ordered:
+        item.score = round(totals[item.chunk_id] / best_possible * 100, 1)
+    return ordered
+
+
+def search_chunks(
+    db: Session,
+    user_id,
+    query_embedding: Sequence[float],
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+    search_effort: Optional[int] = None,
+    clause_type: Optional[str] = None,
+) -> List[ScoredChunk]:
+    """Return the user's top-k chunks by cosine similarity to the query"""
+    top_k = min(top_k or DEFAULT_TOP_K, MAX_TOP_K)
+    min_score = DEFAULT_MIN_SCORE if min_score is None else min_score
+    return retriever.search(db, user_id, query_embedding, top_k, min_score, search_effort, clause_type)
+
+
+async def asearch_chunks(
+    db: AsyncSession,
+    user_id,
+    query_embedding: Sequence[float],
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+    search_effort: Optional[int] = None,
+    clause_type: Optional[str] = None,
+) -> List[ScoredChunk]:
+    """search_chunks for request handlers"""
+    top_k = min(top_k or DEFAULT_TOP_K, MAX_TOP_K)
+    min_score = DEFAULT_MIN_SCORE if min_score is None else min_score
+    return await retriever.asearch(db, user_id, query_embedding, top_k, min_score, search_effort, clause_type)
+
+
+async def ahybrid_search(
+    db: AsyncSession,
+    user_id,
+    query_text: str,
+    query_embedding: Sequence[float],
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+    search_effort: Optional[int] = None,
+    clause_type: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> List[ScoredChunk]:
+    """
+    Keyword and vector search run concurrently, fused with RRF. min_score
+    applies to vector candidates; mode "vector" or "keyword" uses one source.
+    """
+    mode = mode or RETRIEVAL_MODE
+    top_k = min(top_k or DEFAULT_TOP_K, MAX_TOP_K)
+    min_score = DEFAULT_MIN_SCORE if min_score is None else min_score
+    if mode == "vector":
+        return await retriever.asearch(db, user_id, query_embedding, top_k, min_score, search_effort, clause_type)
+    if mode == "keyword":
+        return await retriever.akeyword_search(db, user_id, query_text, top_k, clause_type)
+
+    candidates = top_k * RRF_CANDIDATES
+    vector_results, keyword_results = await asyncio.gather(
+        retriever.asearch(db, user_id, query_embedding, candidates, min_score, search_effort, clause_type),
+        retriever.akeyword_search(db, user_id, query_text, candidates, clause_type),
+    )
+    return rrf_fuse([vector_results, keyword_results], top_k)
@@ -0,0 +1,322 @@
+"""
+Deterministic contract risk scoring from parsed, classified clauses.
+
+Each rule is a compiled pattern, optionally limited to chunks of some clause
+types, with a weight (negative for mitigating terms). A document's points
+are the summed weights of the rules that fire, each counted once, plus two
+structural rules: termination notice shorter than RISK_SHORT_NOTICE_DAYS,
+and no liability clause at all. Points map to Low / Medium / High at
+RISK_MEDIUM_AT and RISK_HIGH_AT. RISK_WEIGHTS (JSON, rule -> weight)
+overrides the defaults.
+
+Results are cached per content hash in risk_assessments, keyed together
+with a hash of the rules, weights and thresholds, of the clause classifier
+and document parser that produced the clauses, and of whether escalation
+was used for that result, so changing any of them misses the cache rather
+than serving stale scores, and a rules-only rescore never stands in for an
+escalated score (or the reverse). `python -m app.clauses reclassify` also
+drops the cached results of every document whose labels it changes.
+
+With RISK_LLM_ESCALATION=true, scores within RISK_AMBIGUITY_MARGIN of a
+threshold are sent to the chat model with the factors that fired. A reply
+that is not a risk level keeps the rule result.
+
+    python -m app.risk rescore [--user USER_ID] [--batch-size 500] [--escalate]
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import clauses, extraction, providers
+from .models import RiskAssessment
+
+load_dotenv()
+
+RISK_LEVELS = ["Low", "Medium", "High"]
+
+# Configuration
+RISK_MEDIUM_AT = int(os.getenv("RISK_MEDIUM_AT", "2"))
+RISK_HIGH_AT = int(os.getenv("RISK_HIGH_AT", "4"))
+RISK_SHORT_NOTICE_DAYS = int(os.getenv("RISK_SHORT_NOTICE_DAYS", "30"))
+RISK_LLM_ESCALATION = os.getenv("RISK_LLM_ESCALATION", "false").lower() == "true"
+RISK_AMBIGUITY_MARGIN = int(os.getenv("RISK_AMBIGUITY_MARGIN", "1"))
+
+
+@dataclass(frozen=True)
+class RiskRule:
+    name: str
+    weight: int
+    pattern: str
+    clause_types: Tuple[str, ...] = ()  # empty: any chunk
+
+
+RULES = [
+    RiskRule("unlimited_liability", 4, r"\bunlimited\b|without\s+limit(?:ation)?", ("Liability",)),
+    # A cap is liability limited to, or not exceeding, an amount; "including but not
+    # limited to" is list boilerplate, not a limit
+    RiskRule(
+        "liability_cap", -2,
+        r"liabilit(?:y|ies)\b[^.;]{0,80}?(?:(?<!not\s)limited\s+to|(?:shall|will)\s+not\s+exceed|capped\s+at)"
+        r"|(?:shall|will)\s+not\s+exceed\s+[^.;]{0,60}?(?:fees|amount|sum|[$£€]|\d)"
+        r"|liability\s+cap\b",
+        ("Liability",),
+    ),
+    RiskRule("consequential_damages_excluded", -1, r"\bconsequential\b|\bindirect\b", ("Liability",)),
+    RiskRule("penalties", 2, r"\bpenalt(?:y|ies)\b|liquidated\s+damages|late\s+(?:fee|charge)s?"),
+    RiskRule("auto_renewal", 2, r"automatic(?:ally)?\s+renew\w*|auto-?renew\w*|renew\w*\s+automatically"),
+    RiskRule(
+        "termination_without_cause", 2,
+        # Not "immediately": terminating immediately on breach is termination for cause
+        r"at\s+any\s+time|for\s+(?:any|no)\s+reason|without\s+cause|for\s+convenience",
+        ("Termination",),
+    ),
+    RiskRule("automatic_termination", 1, r"terminate\w*\s+automatically|automatically\s+terminat\w*", ("Termination",)),
+    RiskRule("indemnification", 1, r"\bindemnif\w*|hold\s+harmless"),
+    RiskRule("exclusivity", 1, r"(?<![-\w])exclusiv\w*|\bnon-?compet\w*"),
+    RiskRule("unilateral_amendment", 2, r"sole\s+discretion|without\s+(?:prior\s+)?notice", ("Amendment",)),
+]
+SHORT_NOTICE_WEIGHT = 2
+NO_LIABILITY_CLAUSE_WEIGHT = 1
+
+_NOTICE_RE = re.compile(
+    r"\(?(\d{1,3})\)?\s*(?:calendar\s+|business\s+)?days?['’]?\s+(?:prior\s+)?(?:written\s+)?notice",
+    re.IGNORECASE,
+)
+
+
+def _weights() -> Dict[str, int]:
+    weights = {rule.name: rule.weight for rule in RULES}
+    weights["short_termination_notice"] = SHORT_NOTICE_WEIGHT
+    weights["no_liability_clause"] = NO_LIABILITY_CLAUSE_WEIGHT
+    weights.update(json.loads(os.getenv("RISK_WEIGHTS", "{}")))
+    return weights
+
+
+WEIGHTS = _weights()
+_COMPILED = [(rule, re.compile(rule.pattern, re.IGNORECASE)) for rule in RULES]
+
+
+def rules_version(escalation: bool) -> str:
+    """Cache key for results scored with the current rules, with or without escalation"""
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "rules": [(r.name, r.pattern, r.clause_types) for r in RULES],
+                "weights": WEIGHTS,
+                "thresholds": [RISK_MEDIUM_AT, RISK_HIGH_AT, RISK_SHORT_NOTICE_DAYS],
+                # The clause types scored come from these
+                "classifier": clauses.CLAUSE_RULES,
+                "parser": [providers.parser_name(), extraction.CHUNK_SIZE, extraction.CHUNK_OVERLAP],
+                "escalation": [True, RISK_AMBIGUITY_MARGIN] if escalation else False,
+            },
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()[:16]
+
+
+RULES_VERSION = rules_version(RISK_LLM_ESCALATION)  # what uploads are scored under
+
+
+@dataclass
+class RiskResult:
+    level: str
+    points: int
+    factors: List[Dict[str, Any]] = field(default_factory=list)
+    source: str = "rules"
+
+
+def level_for(points: int) -> str:
+    if points >= RISK_HIGH_AT:
+        return "High"
+    if points >= RISK_MEDIUM_AT:
+        return "Medium"
+    return "Low"
+
+
+def is_ambiguous(points: int, margin: int = RISK_AMBIGUITY_MARGIN) -> bool:
+    """Within `margin` points of a level boundary"""
+    return any(t - margin <= points < t + margin for t in (RISK_MEDIUM_AT, RISK_HIGH_AT))
+
+
+def _excerpt(text: str) -> str:
+    return text if len(text) <= 160 else text[:157] + "..."
+
+
+def score_clauses(clauses: Iterable[Tuple[str, Optional[str]]]) -> RiskResult:
+    """Score (text, clause_type) pairs; every rule fires at most once"""
+    factors: Dict[str, Dict[str, Any]] = {}
+
+    def fire(name: str, text: str):
+        if name not in factors and WEIGHTS.get(name):
+            factors[name] = {"rule": name, "weight": WEIGHTS[name], "excerpt": _excerpt(text)}
+
+    has_liability = False
+    for text, clause_type in clauses:
+        has_liability = has_liability or clause_type == "Liability"
+        for rule, pattern in _COMPILED:
+            if rule.name in factors or (rule.clause_types and clause_type not in rule.clause_types):
+                continue
+            if pattern.search(text):
+                fire(rule.name, text)
+        if clause_type == "Termination":
+            for days in _NOTICE_RE.findall(text):
+                if int(days) < RISK_SHORT_NOTICE_DAYS:
+                    fire("short_termination_notice", text)
+
+    if not has_liability:
+        fire("no_liability_clause", "")
+    points = sum(f["weight"] for f in factors.values())
+    return RiskResult(level_for(points), points, list(factors.values()))
+
+
+def escalate(result: RiskResult, filename: str = "") -> RiskResult:
+    """Ask the chat model to settle a borderline score; keeps the rule result on any other reply"""
+    from .providers import get_llm
+
+    lines = [f"- {f['rule']} ({f['weight']:+d}): {f['excerpt']}" for f in result.factors] or ["- no risk factors"]
+    prompt = (
+        f"Contract '{filename}' scored {result.points} risk points ({result.level}) on these factors:\n"
+        + "\n".join(lines)
+        + "\nAnswer with exactly one word, Low, Medium or High: the contract's overall risk."
+    )
+    reply = get_llm().complete(prompt).strip().strip(".").capitalize()
+    if reply in RISK_LEVELS:
+        return RiskResult(reply, result.points, result.factors, source="llm")
+    return result
+
+
+# -------------------- CACHE --------------------
+
+def cached(db: Session, content_hash: Optional[str], version: str = RULES_VERSION) -> Optional[RiskResult]:
+    if not content_hash:
+        return None
+    row = db.get(RiskAssessment, (content_hash, version))
+    if row is None:
+        return None
+    return RiskResult(row.risk_score, row.points, row.factors or [], row.source)
+
+
+def store(db: Session, content_hash: Optional[str], result: RiskResult, version: str = RULES_VERSION):
+    """Upsert the assessment for this content and rules version. Does not commit."""
+    if not content_hash:
+        return
+    values = {
+        "content_hash": content_hash,
+        "rules_version": version,
+        "risk_score": result.level,
+        "points": result.points,
+        "factors": result.factors,
+        "source": result.source,
+    }
+    db.execute(
+        insert(RiskAssessment)
+        .values(**values)
+        .on_conflict_do_update(index_elements=["content_hash", "rules_version"], set_=values)
+    )
+
+
+def assess(
+    db: Session,
+    content_hash: Optional[str],
+    clauses: Iterable[Tuple[str, Optional[str]]],
+    filename: str = "",
+    allow_escalation: bool = RISK_LLM_ESCALATION,
+) -> RiskResult:
+    """Cached score for a document's clauses, escalating borderline scores if enabled"""
+    version = rules_version(allow_escalation)
+    result = cached(db, content_hash, version)
+    if result is not None:
+        return result
+    result = score_clauses(clauses)
+    if allow_escalation and is_ambiguous(result.points):
+        result = escalate(result, filename)
+    store(db, content_hash, result, version)
+    return result
+
+
+def forget(db: Session, content_hashes: Iterable[str]):
+    """Drop every cached result for these contents, under any rules version. Does not commit."""
+    content_hashes = [h for h in set(content_hashes) if h]
+    if content_hashes:
+        db.query(RiskAssessment).filter(RiskAssessment.content_hash.in_(content_hashes)).delete(
+            synchronize_session=False
+        )
+
+
+# -------------------- RESCORE --------------------
+
+def rescore(db: Session, user_id=None, batch_size: int = 500, allow_escalation: bool = False) -> Dict[str, int]:
+    """
+    Re-apply the current rules to every Active document, in keyset batches.
+    Each distinct content hash is scored once, from one query for the batch's chunks,
+    and each user's stats row is locked once per batch for all of their changes.
+    """
+    from . import stats
+    from .models import Chunk, Document
+
+    scanned = changed = 0
+    last_id = None
+    by_hash: Dict[str, RiskResult] = {}
+    while True:
+        query = db.query(Document).filter(Document.status == "Active")
+        if user_id:
+            query = query.filter(Document.user_id == user_id)
+        if last_id is not None:
+            query = query.filter(Document.doc_id > last_id)
+        documents = query.order_by(Document.doc_id).limit(batch_size).all()
+        if not documents:
+            break
+        last_id = documents[-1].doc_id
+        scanned += len(documents)
+
+        clauses: Dict[Any, List[Tuple[str, Optional[str]]]] = {d.doc_id: [] for d in documents}
+        chunk_rows = db.query(Chunk.doc_id, Chunk.text_chunk, Chunk.chunk_metadata).filter(
+            Chunk.doc_id.in_(list(clauses))
+        )
+        for doc_id, text, metadata in chunk_rows:
+            clauses[doc_id].append((text, (metadata or {}).get("clause_type")))
+
+        transitions: Dict[Any, List[Tuple[stats.Snapshot, stats.Snapshot]]] = {}
+        for document in documents:
+            result = by_hash.get(document.content_hash) if document.content_hash else None
+            if result is None:
+                result = assess(db, document.content_hash, clauses[document.doc_id], document.filename, allow_escalation)
+                if document.content_hash:
+                    by_hash[document.content_hash] = result
+            if document.risk_score != result.level:
+                before = stats.snapshot(document)
+                document.risk_score = result.level
+                transitions.setdefault(document.user_id, []).append((before, stats.snapshot(document)))
+                changed += 1
+        for uid, changes in transitions.items():
+            stats.record_changes(db, uid, changes)
+        db.commit()
+        db.expunge_all()
+    return {"scanned": scanned, "changed": changed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-apply the risk rules to stored contracts")
+    parser.add_argument("command", choices=["rescore"])
+    parser.add_argument("--user", default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--escalate", action="store_true", help="send borderline scores to the chat model")
+    args = parser.parse_args()
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result = rescore(db, args.user, args.batch_size, args.escalate)
+        version = rules_version(args.escalate)
+        print(f"rules {version}: scanned {result['scanned']} documents, changed {result['changed']}")
+    finally:
+        db.close()
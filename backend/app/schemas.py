@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import List, Optional, Any, Dict
 from datetime import datetime, date
 import uuid
@@ -29,19 +29,65 @@ class ContractResponse(BaseModel):
     class Config:
         from_attributes = True
 
+    @field_validator("doc_id", mode="before")
+    @classmethod
+    def _uuid_to_str(cls, value):
+        return str(value)
+
+class JobResponse(BaseModel):
+    job_id: str
+    document_id: str
+    status: str
+    stage: str
+    progress: int
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
 class ChunkResponse(BaseModel):
+    chunk_id: Optional[str] = None
     text: str
     metadata: Dict[str, Any]
-    relevance_score: float
+    relevance_score: float  # fused RRF score in hybrid mode, as a percentage
+    vector_score: Optional[float] = None  # cosine similarity percentage
+    keyword_score: Optional[float] = None  # full-text rank
 
 class QueryRequest(BaseModel):
     query: str
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+    min_score: Optional[float] = Field(None, ge=-100, le=100)
+    # ef_search (HNSW) or probes (IVFFLAT); higher = better recall, slower
+    search_effort: Optional[int] = Field(None, ge=1, le=1000)
+    clause_type: Optional[str] = None  # only search chunks of this clause type
+    retrieval_mode: Optional[str] = Field(None, pattern="^(hybrid|vector|keyword)$")
 
 class QueryResponse(BaseModel):
     answer: str
     chunks: List[ChunkResponse]
     query: str
 
+class QueryHistoryItem(BaseModel):
+    query_id: str
+    query: str
+    answer: Optional[str]
+    chunk_ids: List[str]
+    scores: List[Optional[float]]
+    timings: Dict[str, float]
+    cached: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+    @field_validator("query_id", mode="before")
+    @classmethod
+    def _uuid_to_str(cls, value):
+        return str(value)
+
+class QueryHistoryPage(BaseModel):
+    history: List[QueryHistoryItem]
+    next_cursor: Optional[str]
+
 class AnalyticsSummary(BaseModel):
     total_contracts: int
     active_contracts: int
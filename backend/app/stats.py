@@ -0,0 +1,176 @@
+"""
+Per-user contract statistics, maintained incrementally.
+
+Every write that creates, deletes or changes a Document calls record_change
+inside the same transaction, so user_stats always matches the documents
+table and the analytics endpoints read one row instead of scanning.
+
+    python -m app.stats rebuild   # recompute every user's row with one GROUP BY
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .models import Document, UserStats
+
+Snapshot = Dict[str, Any]
+
+
+def snapshot(document: Document) -> Snapshot:
+    """The fields of a document that the stats depend on"""
+    return {
+        "status": document.status or "Active",
+        "risk_score": document.risk_score or "Low",
+        "expiry_date": document.expiry_date,
+        "file_size": document.file_size or 0,
+        "page_count": document.page_count or 0,
+    }
+
+
+def _bump(counts: Optional[Dict[str, int]], key: Optional[str], delta: int) -> Dict[str, int]:
+    counts = dict(counts or {})
+    if key is None:
+        return counts
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+    return counts
+
+
+def _prune_expired(expiry_counts: Dict[str, int]) -> Dict[str, int]:
+    """Past expiry dates never feed an 'upcoming' window again"""
+    today = datetime.utcnow().date().isoformat()
+    return {day: n for day, n in expiry_counts.items() if day >= today}
+
+
+def _locked_row(db: Session, user_id) -> UserStats:
+    db.execute(insert(UserStats).values(user_id=user_id).on_conflict_do_nothing())
+    return db.query(UserStats).filter(UserStats.user_id == user_id).with_for_update().one()
+
+
+def record_change(db: Session, user_id, before: Optional[Snapshot], after: Optional[Snapshot]):
+    """
+    Apply one document transition: before=None for a new document,
+    after=None for a deleted one. Does not commit.
+    """
+    record_changes(db, user_id, [(before, after)])
+
+
+def record_changes(db: Session, user_id, transitions: List[Tuple[Optional[Snapshot], Optional[Snapshot]]]):
+    """Apply several of one user's transitions under a single row lock. Does not commit."""
+    transitions = [(before, after) for before, after in transitions if before != after]
+    if not transitions:
+        return
+    row = _locked_row(db, user_id)
+    status_counts, risk_counts = row.status_counts, row.risk_counts
+    expiry_counts = row.expiry_counts
+
+    for before, after in transitions:
+        for snap, sign in ((before, -1), (after, 1)):
+            if snap is None:
+                continue
+            row.total_contracts = (row.total_contracts or 0) + sign
+            row.total_bytes = (row.total_bytes or 0) + sign * snap["file_size"]
+            row.total_pages = (row.total_pages or 0) + sign * snap["page_count"]
+            status_counts = _bump(status_counts, snap["status"], sign)
+            risk_counts = _bump(risk_counts, snap["risk_score"], sign)
+            expiry = snap["expiry_date"]
+            expiry_counts = _bump(expiry_counts, expiry.isoformat() if expiry else None, sign)
+
+    # Reassign so SQLAlchemy sees the JSON columns as changed
+    row.status_counts = status_counts
+    row.risk_counts = risk_counts
+    row.expiry_counts = _prune_expired(expiry_counts)
+    row.corpus_version = (row.corpus_version or 0) + 1
+    row.updated_at = datetime.utcnow()
+
+
+def bump_corpus_version(db: Session, user_id):
+    """Mark a change that alters answers without changing any counts. Does not commit."""
+    row = _locked_row(db, user_id)
+    row.corpus_version = (row.corpus_version or 0) + 1
+    row.updated_at = datetime.utcnow()
+
+
+def corpus_version(db: Session, user_id) -> int:
+    """Changes whenever any of the user's documents is added, changed or removed"""
+    version = db.query(UserStats.corpus_version).filter(UserStats.user_id == user_id).scalar()
+    return version or 0
+
+
+def get_stats(db: Session, user_id) -> Optional[UserStats]:
+    return db.query(UserStats).filter(UserStats.user_id == user_id).first()
+
+
+def expiring_count(row: Optional[UserStats], days: int, start: Optional[date] = None) -> int:
+    """Documents expiring within [start, start + days], from the day buckets"""
+    if row is None or not row.expiry_counts:
+        return 0
+    start = start or datetime.utcnow().date()
+    counts = row.expiry_counts
+    if days + 1 < len(counts):
+        return sum(counts.get((start + timedelta(days=i)).isoformat(), 0) for i in range(days + 1))
+    end = (start + timedelta(days=days)).isoformat()
+    return sum(n for day, n in counts.items() if start.isoformat() <= day <= end)
+
+
+def rebuild(db: Session, user_id=None) -> int:
+    """Recompute stats rows from the documents table with a single GROUP BY"""
+    query = db.query(
+        Document.user_id,
+        Document.status,
+        Document.risk_score,
+        Document.expiry_date,
+        func.count(),
+        func.coalesce(func.sum(Document.file_size), 0),
+        func.coalesce(func.sum(Document.page_count), 0),
+    ).group_by(Document.user_id, Document.status, Document.risk_score, Document.expiry_date)
+    if user_id is not None:
+        query = query.filter(Document.user_id == user_id)
+
+    rows: Dict[Any, Dict[str, Any]] = {}
+    for uid, status, risk, expiry, count, size, pages in query:
+        row = rows.setdefault(
+            uid,
+            {"total_contracts": 0, "total_bytes": 0, "total_pages": 0,
+             "status_counts": {}, "risk_counts": {}, "expiry_counts": {}},
+        )
+        row["total_contracts"] += count
+        row["total_bytes"] += int(size)
+        row["total_pages"] += int(pages)
+        row["status_counts"] = _bump(row["status_counts"], status or "Active", count)
+        row["risk_counts"] = _bump(row["risk_counts"], risk or "Low", count)
+        if expiry is not None:
+            row["expiry_counts"] = _bump(row["expiry_counts"], expiry.isoformat(), count)
+
+    stale = db.query(UserStats)
+    if user_id is not None:
+        stale = stale.filter(UserStats.user_id == user_id)
+    # Keep versions moving forward so cached answers from before the rebuild never match
+    versions = dict(stale.with_entities(UserStats.user_id, UserStats.corpus_version).all())
+    stale.delete(synchronize_session=False)
+    for uid, values in rows.items():
+        values["expiry_counts"] = _prune_expired(values["expiry_counts"])
+        db.add(UserStats(user_id=uid, corpus_version=(versions.get(uid) or 0) + 1, **values))
+    db.commit()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    if sys.argv[1:2] != ["rebuild"]:
+        print("usage: python -m app.stats rebuild [user_id]")
+        sys.exit(2)
+    db = SessionLocal()
+    try:
+        n = rebuild(db, sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"rebuilt stats for {n} users")
+    finally:
+        db.close()
@@ -0,0 +1,129 @@
+"""
+Content-addressed upload store.
+
+Uploads are streamed in fixed-size blocks to a spool file while a running
+SHA-256 is computed, then moved to UPLOAD_DIR/<aa>/<bb>/<sha256>.
+UploadLimitMiddleware enforces MAX_UPLOAD_BYTES on the raw request body, so
+an oversized upload is refused before Starlette spools it, with or without
+a Content-Length. Identical
+files land on the same path, and the digest is what ingestion uses to find
+an already-processed copy.
+"""
+from typing import Tuple
+import hashlib
+import json
+import os
+import tempfile
+
+from fastapi import UploadFile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./data/uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_BLOCK_BYTES = 1024 * 1024
+# Allowance for multipart boundaries and part headers around the file
+MULTIPART_SLACK_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """
+    Plain ASGI middleware capping the request body of the upload route.
+
+    A Content-Length over the cap is refused before anything is read. Chunked
+    bodies have no length up front, so the body is counted as the app reads it
+    and the request is cut off with 413 as soon as it passes the cap; nothing
+    beyond the cap is ever spooled by the multipart parser.
+    """
+
+    def __init__(self, app, path: str = "/upload", limit: int = MAX_UPLOAD_BYTES + MULTIPART_SLACK_BYTES):
+        self.app = app
+        self.path = path
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.limit:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    exceeded = True
+                    raise UploadTooLarge(f"File exceeds {MAX_UPLOAD_BYTES} bytes")
+            return message
+
+        async def guarded_send(message):
+            # Whatever the app makes of the aborted body (FastAPI answers 400) is replaced by the 413
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if not exceeded:
+                raise
+        if exceeded:
+            await self._reject(send)
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({"detail": f"File exceeds {MAX_UPLOAD_BYTES} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def content_path(digest: str) -> str:
+    return os.path.join(UPLOAD_DIR, digest[:2], digest[2:4], digest)
+
+
+async def spool_upload(file: UploadFile) -> Tuple[str, str, int]:
+    """Stream an upload to the store; returns (sha256, path, size)"""
+    spool_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=spool_dir)
+
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await file.read(UPLOAD_BLOCK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"File exceeds {MAX_UPLOAD_BYTES} bytes")
+                sha.update(block)
+                out.write(block)
+
+        digest = sha.hexdigest()
+        path = content_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return digest, path, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
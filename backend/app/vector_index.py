@@ -0,0 +1,555 @@
+"""
+In-process vector index for deployments without pgvector.
+
+Each user gets a contiguous matrix of L2-normalised chunk embeddings, kept in
+a memory-mapped file so the OS page cache, not the Python heap, holds the
+corpus. Chunk ids, text and metadata live in an append-only JSONL log next to
+it so search results never need a database round trip.
+
+The searched matrix is stored as float32, float16 or int8 (EMBEDDING_STORAGE;
+int8 is v * 127, exact for unit vectors up to rounding). With a compact
+storage a float32 copy is kept in a second file that is only read for the
+top_k x EMBEDDING_RERANK_FACTOR candidates, to re-rank them at full precision.
+
+The index is owned by a single API process; run one worker when using it.
+Offline rebuilds (`python -m app.vector_index`, clause reclassification,
+embedding backfills) never touch the files the API has mapped: they build a
+new generation directory next to the live one and then atomically replace
+the user's CURRENT pointer. The API notices the new pointer on its next
+lookup and reopens. Writers take the user's write.lock, and the rebuild
+holds it while it catches up with chunks added or removed during the build
+and swaps the pointer, so no write falls between the two generations.
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import fcntl
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .models import EMBEDDING_RERANK_FACTOR, EMBEDDING_STORAGE
+
+load_dotenv()
+
+# Configuration
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./data/vector_index")
+INITIAL_CAPACITY = 1024
+SEARCH_BLOCK_ROWS = 65536  # rows scored per matrix product, bounds temporary memory
+
+_STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+_VECTORS_FILES = {"float32": "vectors.f32", "float16": "vectors.f16", "int8": "vectors.i8"}
+_FULL_VECTORS_FILE = "vectors_full.f32"
+_META_FILE = "meta.json"
+_LOG_FILE = "chunks.jsonl"
+_CURRENT_FILE = "CURRENT"  # name of the live generation directory
+_LOCK_FILE = "write.lock"
+_GENERATION_PREFIX = "g-"
+_INT8_SCALE = 127.0
+
+
+def encode_vectors(matrix: np.ndarray, storage: str) -> np.ndarray:
+    """Unit vectors in the given storage precision"""
+    if storage == "int8":
+        return np.clip(np.rint(matrix * _INT8_SCALE), -127, 127).astype(np.int8)
+    return matrix.astype(_STORAGE_DTYPES[storage])
+
+
+def decode_vectors(stored: np.ndarray, storage: str) -> np.ndarray:
+    matrix = np.asarray(stored, dtype=np.float32)
+    return matrix / _INT8_SCALE if storage == "int8" else matrix
+
+
+class UserVectorIndex:
+    """Embedding matrix and payloads for one user"""
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        storage: str = EMBEDDING_STORAGE,
+        rerank_factor: int = EMBEDDING_RERANK_FACTOR,
+    ):
+        if storage not in _STORAGE_DTYPES:
+            raise ValueError(f"Unknown embedding storage {storage!r}")
+        self.path = path
+        self.dim = dim
+        self.storage = storage
+        self.dtype = _STORAGE_DTYPES[storage]
+        # Full precision copy only when there is something to re-rank
+        self.rerank_factor = rerank_factor if storage != "float32" else 0
+        self._lock = threading.RLock()
+        self._size = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._full: Optional[np.memmap] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._chunk_ids: List[str] = []
+        self._doc_ids: List[str] = []
+        self._payloads: List[Optional[Tuple[str, Dict[str, Any]]]] = []
+        self._doc_rows: Dict[str, List[int]] = {}
+        self._clause_rows: Dict[str, List[int]] = {}  # clause_type -> rows, dead rows included
+        self._dead = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # ---- persistence ----
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        meta_path = self._file(_META_FILE)
+        if not os.path.exists(meta_path):
+            self._resize(INITIAL_CAPACITY)
+            self._write_meta()
+            return
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        layout = (meta["dim"], meta.get("storage", "float32"), meta.get("full", False))
+        if layout != (self.dim, self.storage, self._keeps_full):
+            raise ValueError(
+                f"Index at {self.path} has (dim, storage, full copy) {layout}, expected "
+                f"{(self.dim, self.storage, self._keeps_full)}; rebuild with python -m app.vector_index"
+            )
+        self._capacity = meta["capacity"]
+        self._vectors, self._full = self._map(self._capacity)
+        self._live = np.zeros(self._capacity, dtype=bool)
+
+        # Replay the log; rows past the last logged add are uncommitted and get overwritten
+        if os.path.exists(self._file(_LOG_FILE)):
+            with open(self._file(_LOG_FILE)) as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["op"] == "add":
+                        self._register(record["chunk_id"], record["doc_id"], record["text"], record["metadata"])
+                    elif record["op"] == "remove":
+                        self._unregister(record["doc_id"])
+
+    def _write_meta(self):
+        tmp = self._file(_META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {"dim": self.dim, "capacity": self._capacity, "storage": self.storage, "full": self._keeps_full}, f
+            )
+        os.replace(tmp, self._file(_META_FILE))
+
+    def _append_log(self, records: List[Dict[str, Any]]):
+        with open(self._file(_LOG_FILE), "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    @property
+    def _vectors_file(self) -> str:
+        return _VECTORS_FILES[self.storage]
+
+    @property
+    def _keeps_full(self) -> bool:
+        return self.rerank_factor > 0
+
+    def _map(self, capacity: int):
+        vectors = np.memmap(self._file(self._vectors_file), dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        full = None
+        if self._keeps_full:
+            full = np.memmap(
+                self._file(_FULL_VECTORS_FILE), dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+        return vectors, full
+
+    def _resize(self, capacity: int):
+        """Grow the backing files and remap them"""
+        for mapped in (self._vectors, self._full):
+            if mapped is not None:
+                mapped.flush()
+        self._vectors = self._full = None
+        files = [(self._vectors_file, np.dtype(self.dtype).itemsize)]
+        if self._keeps_full:
+            files.append((_FULL_VECTORS_FILE, 4))
+        for name, itemsize in files:
+            with open(self._file(name), "ab") as f:
+                f.truncate(capacity * self.dim * itemsize)
+        self._vectors, self._full = self._map(capacity)
+        live = np.zeros(capacity, dtype=bool)
+        live[: len(self._live)] = self._live
+        self._live = live
+        self._capacity = capacity
+
+    # ---- bookkeeping ----
+
+    def _register(self, chunk_id: str, doc_id: str, text: str, metadata: Dict[str, Any]) -> int:
+        row = self._size
+        self._size += 1
+        self._chunk_ids.append(chunk_id)
+        self._doc_ids.append(doc_id)
+        self._payloads.append((text, metadata))
+        self._doc_rows.setdefault(doc_id, []).append(row)
+        clause_type = (metadata or {}).get("clause_type")
+        if clause_type:
+            self._clause_rows.setdefault(clause_type, []).append(row)
+        self._live[row] = True
+        return row
+
+    def _unregister(self, doc_id: str) -> List[int]:
+        rows = self._doc_rows.pop(doc_id, [])
+        for row in rows:
+            self._live[row] = False
+            self._payloads[row] = None
+        self._dead += len(rows)
+        return rows
+
+    # ---- public API ----
+
+    def __len__(self):
+        return self._size - self._dead
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """Bytes scanned per row at search time (the full copy is only touched for candidates)"""
+        return self.dim * np.dtype(self.dtype).itemsize
+
+    def add(
+        self,
+        chunk_ids: Sequence[str],
+        doc_ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ):
+        """Append chunks; embeddings are normalised so search is a dot product"""
+        if not chunk_ids:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+
+        with self._lock:
+            needed = self._size + len(chunk_ids)
+            if needed > self._capacity:
+                capacity = self._capacity
+                while capacity < needed:
+                    capacity *= 2
+                self._resize(capacity)
+                self._write_meta()
+
+            start = self._size
+            self._vectors[start:needed] = encode_vectors(matrix, self.storage)
+            self._vectors.flush()
+            if self._full is not None:
+                self._full[start:needed] = matrix
+                self._full.flush()
+
+            records = []
+            for chunk_id, doc_id, text, metadata in zip(chunk_ids, doc_ids, texts, metadatas):
+                chunk_id, doc_id = str(chunk_id), str(doc_id)
+                self._register(chunk_id, doc_id, text, metadata)
+                records.append(
+                    {"op": "add", "chunk_id": chunk_id, "doc_id": doc_id, "text": text, "metadata": metadata}
+                )
+            self._append_log(records)
+
+    def remove_document(self, doc_id: str):
+        """Drop all chunks of a document; compacts once half the rows are dead"""
+        doc_id = str(doc_id)
+        with self._lock:
+            rows = self._unregister(doc_id)
+            if not rows:
+                return
+            self._vectors[rows] = 0
+            if self._full is not None:
+                self._full[rows] = 0
+            self._append_log([{"op": "remove", "doc_id": doc_id}])
+            if self._dead > INITIAL_CAPACITY and self._dead * 2 > self._size:
+                self.compact()
+
+    def compact(self):
+        """Rewrite the matrix and log without dead rows"""
+        with self._lock:
+            keep = np.flatnonzero(self._live[: self._size])
+            if self._full is not None:
+                vectors = np.array(self._full[keep])
+            else:
+                vectors = decode_vectors(self._vectors[keep], self.storage)
+            entries = [
+                (self._chunk_ids[i], self._doc_ids[i]) + self._payloads[i] for i in keep
+            ]
+
+            # Only this index's files: the directory may also hold the user's lock and pointer
+            self._vectors = self._full = None
+            for name in (self._vectors_file, _FULL_VECTORS_FILE, _META_FILE, _LOG_FILE):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._size = self._dead = 0
+            self._live = np.zeros(0, dtype=bool)
+            self._chunk_ids, self._doc_ids, self._payloads, self._doc_rows = [], [], [], {}
+            self._clause_rows = {}
+            self._resize(max(INITIAL_CAPACITY, 1 << int(np.ceil(np.log2(max(len(keep), 1))))))
+            self._write_meta()
+            if entries:
+                chunk_ids, doc_ids, texts, metadatas = zip(*entries)
+                self.add(chunk_ids, doc_ids, vectors, texts, metadatas)
+
+    def rows_with_clause_type(self, clause_type: str) -> np.ndarray:
+        """Live rows whose metadata has this clause_type"""
+        with self._lock:
+            rows = np.asarray(self._clause_rows.get(clause_type, []), dtype=np.int64)
+            return rows[self._live[rows]] if len(rows) else rows
+
+    @staticmethod
+    def _block(stored: np.ndarray) -> np.ndarray:
+        # Mixed-dtype matmul skips BLAS; upcasting one block at a time is far faster
+        return stored if stored.dtype == np.float32 else stored.astype(np.float32)
+
+    def search_many(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int,
+        min_similarity: float = -1.0,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Cosine top-k for a batch of queries: [(row, similarity), ...] per query.
+        With `rows`, only those rows are scored (a pre-filtered candidate set).
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        q /= np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        n_queries = q.shape[0]
+        final_k = top_k
+        if self._full is not None:
+            top_k = top_k * self.rerank_factor
+        # int8 rows are v * 127; scaling the query keeps scores in cosine units
+        q_stored = q / _INT8_SCALE if self.storage == "int8" else q
+
+        with self._lock:
+            size = self._size if rows is None else len(rows)
+            best_scores = np.full((n_queries, 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+
+            for start in range(0, size, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, size)
+                if rows is None:
+                    block_rows = np.arange(start, stop)
+                    scores = q_stored @ self._block(self._vectors[start:stop]).T
+                    scores[:, ~self._live[start:stop]] = -np.inf
+                else:
+                    block_rows = rows[start:stop]
+                    scores = q_stored @ self._block(self._vectors[block_rows]).T
+
+                k = min(top_k, stop - start)
+                part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                part_scores = np.take_along_axis(scores, part, axis=1)
+
+                best_scores = np.concatenate([best_scores, part_scores], axis=1)
+                best_rows = np.concatenate([best_rows, block_rows[part]], axis=1)
+                if best_scores.shape[1] > top_k:
+                    keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            if self._full is not None and best_rows.shape[1]:
+                # Re-score the candidates at full precision, reading only their rows
+                exact = np.einsum("qkd,qd->qk", self._full[best_rows.ravel()].reshape(*best_rows.shape, -1), q)
+                best_scores = np.where(np.isfinite(best_scores), exact, -np.inf)
+                if best_scores.shape[1] > final_k:
+                    keep = np.argpartition(-best_scores, final_k - 1, axis=1)[:, :final_k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        results = []
+        for found_rows, scores in zip(best_rows, best_scores):
+            results.append(
+                [(int(r), float(s)) for r, s in zip(found_rows, scores) if np.isfinite(s) and s >= min_similarity]
+            )
+        return results
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int,
+        min_similarity: float = -1.0,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        return self.search_many([query], top_k, min_similarity, rows)[0]
+
+    def live_payloads(self):
+        """Payload of every live row, for building secondary indexes"""
+        with self._lock:
+            live = np.flatnonzero(self._live[: self._size])
+            return [self.payload(int(row)) for row in live]
+
+    def payload(self, row: int) -> Dict[str, Any]:
+        """chunk_id, doc_id, text and metadata stored for a row"""
+        text, metadata = self._payloads[row]
+        return {
+            "chunk_id": self._chunk_ids[row],
+            "doc_id": self._doc_ids[row],
+            "text": text,
+            "metadata": metadata,
+        }
+
+
+# user id -> (open index, inode of the CURRENT pointer it was opened from)
+_indexes: Dict[str, Tuple[UserVectorIndex, Optional[int]]] = {}
+_indexes_lock = threading.Lock()
+
+
+def _user_dir(user_id) -> str:
+    return os.path.join(VECTOR_INDEX_DIR, str(user_id))
+
+
+def _pointer_inode(user_dir: str) -> Optional[int]:
+    try:
+        return os.stat(os.path.join(user_dir, _CURRENT_FILE)).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _generation_path(user_dir: str) -> str:
+    """Directory of the live generation; the user directory itself before any rebuild"""
+    try:
+        with open(os.path.join(user_dir, _CURRENT_FILE)) as f:
+            return os.path.join(user_dir, f.read().strip())
+    except FileNotFoundError:
+        return user_dir
+
+
+@contextmanager
+def write_lock(user_id):
+    """Exclusive, cross-process lock on a user's index; held by every writer"""
+    user_dir = _user_dir(user_id)
+    os.makedirs(user_dir, exist_ok=True)
+    with open(os.path.join(user_dir, _LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def get_user_index(user_id, dim: int) -> UserVectorIndex:
+    """Open (or create) the index for a user; reopened when a rebuild swaps generations"""
+    from .keyword_index import drop_user_keyword_index
+
+    key = str(user_id)
+    user_dir = _user_dir(key)
+    inode = _pointer_inode(user_dir)  # one stat per lookup
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[1] == inode:
+            return cached[0]
+        index = UserVectorIndex(_generation_path(user_dir), dim)
+        _indexes[key] = (index, inode)
+    if cached is not None:
+        drop_user_keyword_index(user_id)  # it was built from the previous generation
+    return index
+
+
+def rebuild_user_index(db, user_id, dim: int, batch_size: int = 5000) -> UserVectorIndex:
+    """Recreate a user's index from the chunks table in a new generation, then swap it in"""
+    from .keyword_index import drop_user_keyword_index
+    from .models import Chunk
+
+    user_dir = _user_dir(user_id)
+    os.makedirs(user_dir, exist_ok=True)
+    generation = f"{_GENERATION_PREFIX}{uuid.uuid4().hex[:12]}"
+    index = UserVectorIndex(os.path.join(user_dir, generation), dim)
+
+    batch = []
+    query = (
+        db.query(Chunk)
+        .filter(Chunk.user_id == user_id, Chunk.embedding.isnot(None))
+        .yield_per(batch_size)
+    )
+    for chunk in query:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            _add_chunk_rows(index, batch)
+            batch = []
+    _add_chunk_rows(index, batch)
+
+    with write_lock(user_id):
+        _catch_up(index, user_id)
+        tmp = os.path.join(user_dir, _CURRENT_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(generation)
+        os.replace(tmp, os.path.join(user_dir, _CURRENT_FILE))
+    _remove_old_generations(user_dir, generation)
+
+    with _indexes_lock:
+        _indexes[str(user_id)] = (index, _pointer_inode(user_dir))
+    drop_user_keyword_index(user_id)
+    return index
+
+
+def _catch_up(index: UserVectorIndex, user_id):
+    """Apply chunks inserted or deleted while the generation was being built"""
+    from .database import SessionLocal
+    from .models import Chunk
+
+    # A session of its own: the build's may still be in a transaction that predates those writes
+    db = SessionLocal()
+    try:
+        stored = {
+            str(chunk_id)
+            for (chunk_id,) in db.query(Chunk.chunk_id).filter(
+                Chunk.user_id == user_id, Chunk.embedding.isnot(None)
+            )
+        }
+        indexed = {p["chunk_id"]: p["doc_id"] for p in index.live_payloads()}
+        for doc_id in {doc_id for chunk_id, doc_id in indexed.items() if chunk_id not in stored}:
+            index.remove_document(doc_id)
+        missing = stored.difference(indexed)
+        if missing:
+            rows = db.query(Chunk).filter(Chunk.chunk_id.in_([uuid.UUID(c) for c in missing])).all()
+            _add_chunk_rows(index, rows)
+    finally:
+        db.close()
+
+
+def _remove_old_generations(user_dir: str, keep: str):
+    """
+    Delete superseded generations, and index files from before generations.
+    Files the API still has mapped stay readable until it reopens.
+    """
+    legacy = {_META_FILE, _LOG_FILE, _FULL_VECTORS_FILE, *_VECTORS_FILES.values()}
+    for name in os.listdir(user_dir):
+        path = os.path.join(user_dir, name)
+        if name.startswith(_GENERATION_PREFIX) and name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif name in legacy:
+            os.remove(path)
+
+
+def _add_chunk_rows(index: UserVectorIndex, chunks):
+    if not chunks:
+        return
+    index.add(
+        [c.chunk_id for c in chunks],
+        [c.doc_id for c in chunks],
+        [c.embedding for c in chunks],
+        [c.text_chunk for c in chunks],
+        [c.chunk_metadata or {} for c in chunks],
+    )
+
+
+if __name__ == "__main__":
+    # python -m app.vector_index  -- rebuild every user's local index from the database
+    from .database import SessionLocal
+    from .models import EMBEDDING_DIMENSIONS, User
+
+    db = SessionLocal()
+    try:
+        for (user_id,) in db.query(User.user_id).all():
+            index = rebuild_user_index(db, user_id, EMBEDDING_DIMENSIONS)
+            print(f"{user_id}: {len(index)} chunks")
+    finally:
+        db.close()
@@ -0,0 +1,78 @@
+"""
+Chunk insert throughput: per-row ORM adds vs multi-row INSERT vs COPY.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.chunk_insert --rows 5000
+
+Each method writes into a throwaway user/document inside a transaction that
+is rolled back, so the database is left unchanged.
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from app.bulk import insert_chunks
+from app.database import SessionLocal, init_db
+from app.models import Chunk, Document, EMBEDDING_DIMENSIONS, User
+
+
+def make_rows(n: int, doc_id, user_id):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    return [
+        {
+            "chunk_id": uuid.uuid4(),
+            "doc_id": doc_id,
+            "user_id": user_id,
+            "text_chunk": f"Payment shall be made within thirty (30) days of receipt of invoice #{i}.",
+            "embedding": vectors[i].tolist(),
+            "chunk_metadata": {"page": i // 20 + 1, "clause_type": "Payment"},
+        }
+        for i in range(n)
+    ]
+
+
+def orm_insert(db, rows):
+    for row in rows:
+        db.add(Chunk(**row))
+    db.flush()
+
+
+def run(method: str, n: int) -> float:
+    db = SessionLocal()
+    try:
+        user = User(username=f"bench-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        document = Document(user_id=user.user_id, filename="bench.pdf")
+        db.add(document)
+        db.flush()
+        rows = make_rows(n, document.doc_id, user.user_id)
+
+        started = time.perf_counter()
+        if method == "orm":
+            orm_insert(db, rows)
+        else:
+            insert_chunks(db, rows, method=method)
+        db.flush()
+        elapsed = time.perf_counter() - started
+    finally:
+        db.rollback()
+        db.close()
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--methods", default="orm,values,copy")
+    args = parser.parse_args()
+
+    init_db()
+    for method in args.methods.split(","):
+        print(f"{method:>8}: {run(method, args.rows):10.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
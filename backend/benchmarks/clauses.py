@@ -0,0 +1,44 @@
+"""
+Clause classifier throughput, in clauses per minute on one core.
+
+    python -m benchmarks.clauses --clauses 500000 --batch-size 5000
+
+Texts are one to three clause templates from app.llama_mock joined, roughly
+chunk-sized. Reports classify() over batches and classify_one() per text.
+"""
+import argparse
+import random
+import time
+
+from app.clauses import classify, classify_one
+from app.llama_mock import ADDITIONAL_CLAUSES, CONTRACT_CLAUSES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clauses", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    templates = [c for group in CONTRACT_CLAUSES.values() for c in group] + list(ADDITIONAL_CLAUSES)
+    texts = [" ".join(rng.sample(templates, rng.randint(1, 3))) for _ in range(args.clauses)]
+
+    started = time.perf_counter()
+    for i in range(0, len(texts), args.batch_size):
+        classify(texts[i:i + args.batch_size])
+    batch_seconds = time.perf_counter() - started
+
+    sample = texts[: max(len(texts) // 10, 1)]
+    started = time.perf_counter()
+    for text in sample:
+        classify_one(text)
+    single_seconds = time.perf_counter() - started
+
+    print(f"batch ({args.batch_size}): {len(texts) / batch_seconds * 60 / 1e6:.2f}M clauses/min")
+    print(f"one at a time:    {len(sample) / single_seconds * 60 / 1e6:.2f}M clauses/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Show that concurrent /ask calls overlap on one event loop.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.concurrent_ask --clients 20
+
+Runs the app in-process with the local AI providers, so every answer costs
+LOCAL_LLM_LATENCY_MS of simulated model time. If requests serialised, N
+concurrent calls would take ~N x that; on the async path they take ~1x.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("AI_PROVIDER", "local")
+os.environ.setdefault("LOCAL_LLM_LATENCY_MS", "500")
+os.environ.setdefault("LOCAL_LLM_JITTER_MS", "0")
+
+import httpx
+
+from app.database import init_db
+from app.main import app
+
+
+async def main(clients: int):
+    init_db()
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=60) as client:
+        name = f"bench-{uuid.uuid4().hex[:8]}"
+        response = await client.post(
+            "/auth/signup", json={"username": name, "email": f"{name}@example.com", "password": "bench"}
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await client.post(
+            "/upload",
+            files={"file": ("msa_bench.txt", b"bench contract", "text/plain")},
+            headers=headers,
+        )
+
+        async def ask(i: int):
+            started = time.perf_counter()
+            response = await client.post(
+                "/ask", json={"query": f"What is the termination notice period? ({i})"}, headers=headers
+            )
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        single = await ask(-1)
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(ask(i) for i in range(clients)))
+        wall = time.perf_counter() - started
+
+    print(f"single /ask:              {single * 1000:8.1f} ms")
+    print(f"{clients} concurrent /ask wall: {wall * 1000:8.1f} ms")
+    print(f"serialised would be ~:    {single * clients * 1000:8.1f} ms")
+    print(f"max per-request latency:  {max(latencies) * 1000:8.1f} ms")
+    print(f"overlap factor:           {single * clients / wall:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients))
@@ -0,0 +1,132 @@
+"""
+Recall@k vs memory for reduced-dimension and quantized embeddings.
+
+    python -m benchmarks.embedding_storage --chunks 50000 --queries 200 \
+        --dims 1536,768,512,256 --output results/embedding_storage.json
+
+Offline: a synthetic corpus is built from the clause templates in
+app.llama_mock plus random filler words and embedded with the local
+embedder at 1536 dimensions. Ground truth is exact float32 search at full
+dimensions; every (dims, storage, rerank) combination is then loaded into a
+UserVectorIndex in a temporary directory (the numpy backend's code path)
+and measured for recall@k, bytes scanned per vector, bytes on disk and
+query latency. Shortened vectors are prefixes re-normalised, as with
+text-embedding-3's `dimensions` parameter; the local embedder is not trained
+for that, so its recall at reduced dimensions understates what OpenAI
+embeddings keep. Precision and re-rank effects are representative.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.embedding_storage import truncate_embeddings
+from app.llama_mock import ADDITIONAL_CLAUSES, CONTRACT_CLAUSES
+from app.providers import LocalEmbedder
+from app.vector_index import UserVectorIndex
+
+FILLER = (
+    "party parties agreement notice days months fees invoice services customer vendor licensor licensee "
+    "term renewal breach cure remedy damages indemnify warranty data security audit records insurance "
+    "assignment subcontract delivery acceptance milestone deposit refund tax jurisdiction venue"
+).split()
+
+
+def synthetic_chunks(n: int, seed: int):
+    rng = random.Random(seed)
+    clauses = [c for group in CONTRACT_CLAUSES.values() for c in group] + list(ADDITIONAL_CLAUSES)
+    return [
+        f"{rng.choice(clauses)} {' '.join(rng.choices(FILLER, k=rng.randint(5, 25)))} (ref {i})"
+        for i in range(n)
+    ]
+
+
+def embed_all(embedder, texts, batch_size: int = 2048) -> np.ndarray:
+    parts = [embedder.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    return np.asarray([v for part in parts for v in part], dtype=np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def measure(corpus, queries, truth, dims: int, storage: str, rerank_factor: int, k: int):
+    vectors = np.asarray(truncate_embeddings(corpus, dims), dtype=np.float32) if dims < corpus.shape[1] else corpus
+    query_vectors = np.asarray(truncate_embeddings(queries, dims), dtype=np.float32)
+    with tempfile.TemporaryDirectory() as path:
+        index = UserVectorIndex(path, dims, storage=storage, rerank_factor=rerank_factor)
+        ids = [str(i) for i in range(len(vectors))]
+        index.add(ids, ids, vectors, [""] * len(ids), [{}] * len(ids))
+
+        hits, latencies = 0, []
+        for q, expected in zip(query_vectors, truth):
+            started = time.perf_counter()
+            found = index.search(q, k)
+            latencies.append(time.perf_counter() - started)
+            hits += len({row for row, _ in found} & set(expected.tolist()))
+
+        return {
+            "dims": dims,
+            "storage": storage,
+            "rerank_factor": index.rerank_factor,
+            f"recall@{k}": round(hits / truth.size, 4),
+            "bytes_per_vector": index.bytes_per_vector,
+            "index_mb": round(directory_bytes(path) / 2 ** 20, 2),
+            "query_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "query_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", default="1536,768,512,256")
+    parser.add_argument("--storage", default="float32,float16,int8")
+    parser.add_argument("--rerank-factors", default="0,4")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="embedding-storage-results.json")
+    args = parser.parse_args()
+
+    embedder = LocalEmbedder(dim=1536)
+    texts = synthetic_chunks(args.chunks, args.seed)
+    print(f"embedding {len(texts)} chunks")
+    corpus = embed_all(embedder, texts)
+    # Queries are corpus chunks with most of the filler swapped out, so neighbours are not trivial
+    rng = random.Random(args.seed + 1)
+    query_texts = [
+        " ".join(t.split()[: len(t.split()) // 2] + rng.choices(FILLER, k=8)) for t in rng.sample(texts, args.queries)
+    ]
+    queries = embed_all(embedder, query_texts)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    results = []
+    for dims in map(int, args.dims.split(",")):
+        for storage in args.storage.split(","):
+            for factor in map(int, args.rerank_factors.split(",")):
+                if storage == "float32" and factor:
+                    continue  # nothing to re-rank
+                row = measure(corpus, queries, truth, dims, storage, factor, args.k)
+                print(json.dumps(row))
+                results.append(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "results": results}, f, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
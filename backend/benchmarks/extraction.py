@@ -0,0 +1,164 @@
+"""
+Local extraction throughput and memory: pages/sec and peak RSS by format and length.
+
+    python -m benchmarks.extraction --pages 10,100,400,1000 --output results/extraction.json
+
+Synthetic TXT, DOCX and PDF contracts are generated from the clause
+templates in app.llama_mock (a form feed, page break or PDF page per page),
+then each is extracted and chunked by app.extraction.extract_document in a
+fresh worker process, which reports its own peak RSS. Flat memory means peak
+RSS should barely move between 10 and 1000 pages.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import textwrap
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from app.extraction import CHUNK_OVERLAP, CHUNK_SIZE, extract_document
+from app.llama_mock import ADDITIONAL_CLAUSES, CONTRACT_CLAUSES
+
+LINES_PER_PAGE = 40
+
+
+def page_paragraphs(pages: int, seed: int):
+    """Per page, a list of paragraphs (each a list of wrapped lines)"""
+    rng = random.Random(seed)
+    clauses = [c for group in CONTRACT_CLAUSES.values() for c in group] + list(ADDITIONAL_CLAUSES)
+    for number in range(1, pages + 1):
+        paragraphs, lines = [], 0
+        while lines < LINES_PER_PAGE:
+            text = f"{number}.{len(paragraphs) + 1} " + " ".join(rng.sample(clauses, 3))
+            wrapped = textwrap.wrap(text, 90)
+            paragraphs.append(wrapped)
+            lines += len(wrapped) + 1
+        yield paragraphs
+
+
+def write_txt(path: str, pages: int, seed: int):
+    with open(path, "w") as f:
+        for number, paragraphs in enumerate(page_paragraphs(pages, seed)):
+            if number:
+                f.write("\f")
+            f.write("\n\n".join("\n".join(p) for p in paragraphs) + "\n")
+
+
+def write_docx(path: str, pages: int, seed: int):
+    w = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'content-types"><Default Extension="rels" ContentType="application/vnd.openxmlformats-package.'
+            'relationships+xml"/><Override PartName="/word/document.xml" ContentType="application/vnd.'
+            'openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>',
+        )
+        archive.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/'
+            'package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+            'officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/></Relationships>',
+        )
+        with archive.open("word/document.xml", "w") as xml:
+            xml.write(f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{w}"><w:body>'.encode())
+            for number, paragraphs in enumerate(page_paragraphs(pages, seed)):
+                for i, paragraph in enumerate(paragraphs):
+                    page_break = '<w:r><w:br w:type="page"/></w:r>' if number and not i else ""
+                    text = escape(" ".join(paragraph))
+                    xml.write(f"<w:p>{page_break}<w:r><w:t>{text}</w:t></w:r></w:p>".encode())
+            xml.write(b"</w:body></w:document>")
+
+
+def write_pdf(path: str, pages: int, seed: int):
+    """Minimal PDF: one Helvetica text stream per page, written incrementally"""
+    offsets = []
+    with open(path, "wb") as f:
+        def obj(number: int, body: bytes):
+            offsets.append((number, f.tell()))
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        kids = []
+        for number, paragraphs in enumerate(page_paragraphs(pages, seed)):
+            page_obj, content_obj = 4 + 2 * number, 5 + 2 * number
+            lines = [line for p in paragraphs for line in p + [""]]
+            text = " T* ".join(
+                "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj" for line in lines
+            )
+            stream = f"BT /F1 9 Tf 12 TL 40 780 Td {text} ET".encode("latin-1", "replace")
+            obj(content_obj, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+            obj(page_obj, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_obj} 0 R "
+                f"/Resources << /Font << /F1 3 0 R >> >> >>"
+            ).encode())
+            kids.append(f"{page_obj} 0 R")
+        obj(2, f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode())
+
+        xref = f.tell()
+        by_number = dict(offsets)
+        size = max(by_number) + 1
+        f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for number in range(1, size):
+            f.write(f"{by_number[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+WRITERS = {"txt": write_txt, "docx": write_docx, "pdf": write_pdf}
+
+
+def _extract_and_measure(filename: str, path: str, chunk_size: int, overlap: int):
+    result = extract_document(filename, path, chunk_size, overlap)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kilobytes on Linux
+    result["chunks"].close()
+    return {
+        "format": result["format"],
+        "pages": result["page_count"],
+        "chunks": len(result["chunks"]),
+        "seconds": result["processing_time"],
+        "pages_per_second": result["pages_per_second"],
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,100,400,1000")
+    parser.add_argument("--formats", default="txt,docx,pdf")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="extraction-results.json")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in args.formats.split(","):
+            for pages in map(int, args.pages.split(",")):
+                path = os.path.join(directory, f"contract_{pages}.{file_format}")
+                WRITERS[file_format](path, pages, args.seed)
+                # A fresh process per document, so peak RSS belongs to this extraction alone
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    row = pool.submit(
+                        _extract_and_measure, os.path.basename(path), path, args.chunk_size, args.overlap
+                    ).result()
+                row["file_mb"] = round(os.path.getsize(path) / 2 ** 20, 2)
+                print(json.dumps(row))
+                results.append(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "results": results}, f, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+End-to-end benchmark suite: upload, /ask, /contracts and analytics.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.suite --docs 200 --clients 20 \
+        --output results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite compare results/base.json results/head.json
+
+Runs fully offline: the app is served in-process with the local AI providers
+(LOCAL_LLM_LATENCY_MS defaults to 50 here so backend time is not drowned by
+simulated model time). Each run creates its own user and a synthetic corpus
+built from the clause templates in app.llama_mock, seeded by --seed, so runs
+on different commits measure the same workload. Results are written as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+os.environ.setdefault("AI_PROVIDER", "local")
+os.environ.setdefault("LOCAL_LLM_LATENCY_MS", "50")
+os.environ.setdefault("LOCAL_LLM_JITTER_MS", "10")
+
+import httpx
+import numpy as np
+
+from app.database import init_db
+from app.llama_mock import ADDITIONAL_CLAUSES, CONTRACT_CLAUSES
+from app.main import app
+
+PARTIES = ["Acme Corp", "Globex", "Initech", "Umbrella", "Stark Industries", "Wayne Enterprises", "Hooli"]
+QUESTIONS = [
+    "What is the termination notice period?",
+    "Which contracts limit liability for consequential damages?",
+    "When are payments due?",
+    "Who owns the intellectual property?",
+    "How long does confidentiality survive termination?",
+    "Are disputes resolved through arbitration?",
+    "Which law governs the agreement?",
+    "Can the license be transferred?",
+]
+SEARCH_TERMS = ["msa", "nda", "license", "acme", "0042"]
+
+
+# -------------------- CORPUS --------------------
+
+def synthetic_corpus(n: int, seed: int):
+    """(filename, bytes) pairs; the filename picks the clause set the mock parser returns"""
+    rng = random.Random(seed)
+    kinds = list(CONTRACT_CLAUSES)
+    documents = []
+    for i in range(n):
+        kind = kinds[i % len(kinds)]
+        party = rng.choice(PARTIES)
+        clauses = CONTRACT_CLAUSES[kind] + rng.sample(ADDITIONAL_CLAUSES, rng.randint(1, 3))
+        rng.shuffle(clauses)
+        body = f"{kind.upper()} between {party} and Customer {i:04d}\n\n" + "\n\n".join(clauses)
+        filename = f"{kind}_{party.split()[0].lower()}_{i:04d}.txt"
+        documents.append((filename, body.encode("utf-8")))
+    return documents
+
+
+# -------------------- MEASUREMENT --------------------
+
+def summarize(latencies):
+    """Latency percentiles in milliseconds"""
+    if not latencies:
+        return {"count": 0}
+    ms = np.asarray(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+async def timed(call):
+    started = time.perf_counter()
+    response = await call
+    response.raise_for_status()
+    return time.perf_counter() - started, response
+
+
+async def run_clients(clients: int, requests_per_client: int, make_call):
+    """N concurrent clients, each issuing its requests back to back; returns (latencies, wall seconds)"""
+    latencies = []
+
+    async def client(c: int):
+        for r in range(requests_per_client):
+            elapsed, _ = await timed(make_call(c, r))
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return latencies, time.perf_counter() - started
+
+
+# -------------------- SCENARIOS --------------------
+
+async def bench_upload(client, headers, corpus, concurrency: int):
+    queue = list(corpus)
+    latencies = []
+
+    async def worker():
+        while queue:
+            filename, body = queue.pop()
+            elapsed, _ = await timed(
+                client.post("/upload", files={"file": (filename, body, "text/plain")}, headers=headers)
+            )
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {**summarize(latencies), "docs_per_sec": round(len(latencies) / wall, 2), "concurrency": concurrency}
+
+
+async def bench_ask(client, headers, clients: int, requests_per_client: int, seed: int):
+    rng = random.Random(seed)
+    # A per-request suffix keeps the answer cache from serving repeats
+    queries = [
+        f"{rng.choice(QUESTIONS)} [{rng.randrange(16 ** 6):06x}]" for _ in range(clients * requests_per_client)
+    ]
+
+    def ask(c, r):
+        return client.post("/ask", json={"query": queries[c * requests_per_client + r]}, headers=headers)
+
+    latencies, wall = await run_clients(clients, requests_per_client, ask)
+    return {**summarize(latencies), "requests_per_sec": round(len(latencies) / wall, 2), "clients": clients}
+
+
+async def bench_contracts(client, headers, page_size: int):
+    page_latencies, first_page, last_page = [], None, None
+    cursor, pages = None, 0
+    while True:
+        params = {"limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        elapsed, response = await timed(client.get("/contracts", params=params, headers=headers))
+        page_latencies.append(elapsed)
+        pages += 1
+        first_page = first_page if first_page is not None else elapsed
+        last_page = elapsed
+        cursor = response.json().get("next_cursor")
+        if not cursor:
+            break
+
+    search_latencies = []
+    for term in SEARCH_TERMS * 5:
+        elapsed, _ = await timed(client.get("/contracts", params={"search": term, "limit": page_size}, headers=headers))
+        search_latencies.append(elapsed)
+
+    total_latencies = []
+    for _ in range(20):
+        elapsed, _ = await timed(client.get("/contracts", params={"include_total": True}, headers=headers))
+        total_latencies.append(elapsed)
+
+    return {
+        "pages": pages,
+        "page_size": page_size,
+        "pagination": summarize(page_latencies),
+        "first_page_ms": round(first_page * 1000, 2),
+        "last_page_ms": round(last_page * 1000, 2),
+        "search": summarize(search_latencies),
+        "include_total": summarize(total_latencies),
+    }
+
+
+async def bench_analytics(client, headers, repeats: int = 50):
+    results = {}
+    for path in ("/analytics/summary", "/analytics/risks", "/analytics/expiring"):
+        latencies = []
+        for _ in range(repeats):
+            elapsed, _ = await timed(client.get(path, headers=headers))
+            latencies.append(elapsed)
+        results[path] = summarize(latencies)
+    return results
+
+
+# -------------------- RUN / COMPARE --------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def run(args):
+    init_db()
+    corpus = synthetic_corpus(args.docs, args.seed)
+    random.seed(args.seed)  # the mock parser draws from the global RNG
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=120) as client:
+        name = f"bench-{uuid.uuid4().hex[:8]}"
+        response = await client.post(
+            "/auth/signup", json={"username": name, "email": f"{name}@example.com", "password": "bench"}
+        )
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        results = {}
+        print(f"upload: {args.docs} documents, {args.upload_concurrency} concurrent")
+        results["upload"] = await bench_upload(client, headers, corpus, args.upload_concurrency)
+        print(f"ask: {args.clients} clients x {args.requests} requests")
+        results["ask"] = await bench_ask(client, headers, args.clients, args.requests, args.seed)
+        print("contracts: pagination, search, totals")
+        results["contracts"] = await bench_contracts(client, headers, args.page_size)
+        print("analytics")
+        results["analytics"] = await bench_analytics(client, headers)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "docs": args.docs,
+            "clients": args.clients,
+            "requests_per_client": args.requests,
+            "upload_concurrency": args.upload_concurrency,
+            "page_size": args.page_size,
+            "seed": args.seed,
+            "env": {
+                k: os.environ.get(k)
+                for k in ("AI_PROVIDER", "LOCAL_LLM_LATENCY_MS", "RETRIEVAL_BACKEND", "RETRIEVAL_MODE",
+                          "VECTOR_INDEX_TYPE", "CHUNK_INSERT_METHOD", "DB_POOL_SIZE")
+            },
+        },
+        "results": results,
+    }
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, inner, out)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+    return out
+
+
+def compare(base_path: str, head_path: str):
+    """Print every numeric result side by side with the relative change"""
+    with open(base_path) as f:
+        base = _flatten("", json.load(f)["results"], {})
+    with open(head_path) as f:
+        head = _flatten("", json.load(f)["results"], {})
+    print(f"{'metric':<48} {'base':>12} {'head':>12} {'change':>9}")
+    for key in sorted(base.keys() & head.keys()):
+        old, new = base[key], head[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ""
+        print(f"{key:<48} {old:>12} {new:>12} {change:>9}")
+
+
+def main():
+    if sys.argv[1:2] == ["compare"]:
+        compare(*sys.argv[2:4])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=10, help="/ask requests per client")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-results.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Initial schema: extensions and tables
+
+A database created by the old create_all() at startup can be brought under
+Alembic with `alembic upgrade head` as it is: tables that already exist are
+kept, provided their columns match the ones below. A table from an older
+layout (a missing or retyped column) stops the upgrade with the differences
+listed, rather than being stamped as current and failing at query time.
+Secondary indexes are built in 0002.
+
+Every value here is fixed. Changing embedding dimensions, the full-text
+configuration or an index later takes a new revision, never an edit here.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Declared type name -> information_schema udt_name
+_UDT_NAMES = {"integer": "int4", "bigint": "int8", "boolean": "bool", "jsonb": "json"}
+
+
+def _declared_type(column):
+    name = column.type.compile(dialect=postgresql.dialect()).split("(")[0].split()[0].lower()
+    return _UDT_NAMES.get(name, name), getattr(column.type, "length", None)
+
+
+def _shape_differences(name, columns):
+    """
+    Columns missing, retyped or unknown compared with the layout below.
+    The embedding width is not compared: chunks.embedding may have been
+    created at any EMBEDDING_DIMENSIONS, and app.embedding_storage reads the
+    live width when it writes a resize revision.
+    """
+    rows = op.get_bind().execute(
+        sa.text(
+            "SELECT column_name, udt_name, character_maximum_length FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :name"
+        ),
+        {"name": name},
+    ).all()
+    existing = {
+        row.column_name: (_UDT_NAMES.get(row.udt_name, row.udt_name), row.character_maximum_length)
+        for row in rows
+    }
+    differences = []
+    for column in columns:
+        found = existing.pop(column.name, None)
+        expected = _declared_type(column)
+        if found is None:
+            differences.append(f"missing column {column.name}")
+        elif found != expected:
+            differences.append(f"{column.name} is {found[0]}({found[1]}), expected {expected[0]}({expected[1]})")
+    differences.extend(f"unexpected column {extra}" for extra in existing)
+    return differences
+
+
+def _create_table(name, *columns):
+    if op.get_context().as_sql or not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns)
+        return
+    differences = _shape_differences(name, columns)
+    if differences:
+        raise RuntimeError(
+            f"table {name} already exists with a different layout ({'; '.join(differences)}). "
+            "Migrate it to this revision's layout by hand, then run `alembic upgrade head` again."
+        )
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    _create_table(
+        "users",
+        sa.Column("user_id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("username", sa.String(255), nullable=False, unique=True),
+        sa.Column("email", sa.String(255), nullable=False, unique=True),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    )
+    _create_table(
+        "documents",
+        sa.Column("doc_id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("uploaded_on", sa.DateTime),
+        sa.Column("expiry_date", sa.Date),
+        sa.Column("status", sa.String(50)),
+        sa.Column("risk_score", sa.String(20)),
+        sa.Column("file_size", sa.Integer),
+        sa.Column("page_count", sa.Integer),
+        sa.Column("content_hash", sa.String(64)),
+    )
+    _create_table(
+        "chunks",
+        sa.Column("chunk_id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("doc_id", UUID(as_uuid=True), sa.ForeignKey("documents.doc_id"), nullable=False),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("text_chunk", sa.Text, nullable=False),
+        sa.Column("embedding", Vector(1536)),
+        sa.Column("metadata", sa.JSON),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column(
+            "search_vector",
+            TSVECTOR,
+            sa.Computed("to_tsvector('english', text_chunk)", persisted=True),
+        ),
+    )
+    _create_table(
+        "ingestion_jobs",
+        sa.Column("job_id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("doc_id", UUID(as_uuid=True), sa.ForeignKey("documents.doc_id"), nullable=False),
+        sa.Column("file_path", sa.String(1024), nullable=False),
+        sa.Column("status", sa.String(20)),
+        sa.Column("stage", sa.String(20)),
+        sa.Column("progress", sa.Integer),
+        sa.Column("error", sa.Text),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    _create_table(
+        "embedding_cache",
+        sa.Column("cache_key", sa.String(64), primary_key=True),
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("embedding", sa.LargeBinary, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    )
+    _create_table(
+        "risk_assessments",
+        sa.Column("content_hash", sa.String(64), primary_key=True),
+        sa.Column("rules_version", sa.String(16), primary_key=True),
+        sa.Column("risk_score", sa.String(20), nullable=False),
+        sa.Column("points", sa.Integer, nullable=False),
+        sa.Column("factors", sa.JSON),
+        sa.Column("source", sa.String(10), nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    )
+    _create_table(
+        "user_stats",
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("total_contracts", sa.BigInteger, nullable=False),
+        sa.Column("total_bytes", sa.BigInteger, nullable=False),
+        sa.Column("total_pages", sa.BigInteger, nullable=False),
+        sa.Column("status_counts", sa.JSON),
+        sa.Column("risk_counts", sa.JSON),
+        sa.Column("expiry_counts", sa.JSON),
+        sa.Column("corpus_version", sa.BigInteger, nullable=False),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    _create_table(
+        "queries",
+        sa.Column("query_id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("query", sa.Text, nullable=False),
+        sa.Column("answer", sa.Text),
+        sa.Column("chunk_ids", sa.JSON),
+        sa.Column("scores", sa.JSON),
+        sa.Column("timings", sa.JSON),
+        sa.Column("cached", sa.Boolean, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade():
+    for table in (
+        "queries", "user_stats", "risk_assessments", "embedding_cache",
+        "ingestion_jobs", "chunks", "documents", "users",
+    ):
+        op.drop_table(table)
@@ -0,0 +1,72 @@
+"""Secondary indexes, built concurrently
+
+Every index the models declare: per-user composites for /contracts,
+expiry and history, the full-text GIN, the filename trigram GIN and the ANN
+index over chunk embeddings. Built with CREATE INDEX CONCURRENTLY outside
+the migration transaction, so a live database keeps taking writes while
+they build. An invalid index left by an interrupted build is dropped and
+built again; valid ones that already exist are kept.
+
+The ANN index is HNSW over float32 vectors with the default build
+parameters; other EMBEDDING_STORAGE / VECTOR_INDEX_TYPE settings are applied
+by revisions that `python -m app.embedding_storage revision` writes.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("idx_documents_user_uploaded", "documents (user_id, uploaded_on, doc_id)"),
+    ("idx_documents_user_status", "documents (user_id, status, uploaded_on, doc_id)"),
+    ("idx_documents_user_risk", "documents (user_id, risk_score, uploaded_on, doc_id)"),
+    ("idx_documents_user_expiry", "documents (user_id, expiry_date)"),
+    ("idx_documents_filename_trgm", "documents USING gin (filename gin_trgm_ops)"),
+    ("ix_documents_content_hash", "documents (content_hash)"),
+    ("idx_chunks_user_id", "chunks (user_id)"),
+    ("idx_chunks_doc_id", "chunks (doc_id)"),
+    ("idx_chunks_user_clause_type", "chunks (user_id, (metadata ->> 'clause_type'))"),
+    ("idx_chunks_search_vector", "chunks USING gin (search_vector)"),
+    (
+        "idx_chunks_embedding",
+        "chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
+    ),
+    ("ix_ingestion_jobs_user_id", "ingestion_jobs (user_id)"),
+    ("ix_ingestion_jobs_status", "ingestion_jobs (status)"),
+    ("idx_queries_user_created", "queries (user_id, created_at, query_id)"),
+]
+
+
+def _drop_if_invalid(name: str):
+    if context.is_offline_mode():
+        return
+    valid = op.get_bind().execute(
+        sa.text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name"
+        ),
+        {"name": name},
+    ).scalar()
+    if valid is False:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES:
+            _drop_if_invalid(name)
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,40 @@
+"""Index for the clause export order
+
+The clause export reads a user's chunks ordered by (doc_id, created_at);
+without an index on that order Postgres sorts every chunk the user has
+before the first row goes out. Built concurrently, like 0002.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+NAME = "idx_chunks_user_doc_created"
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        if not context.is_offline_mode():
+            valid = op.get_bind().execute(
+                sa.text(
+                    "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name"
+                ),
+                {"name": NAME},
+            ).scalar()
+            if valid is False:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {NAME}")
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {NAME} ON chunks (user_id, doc_id, created_at)")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {NAME}")
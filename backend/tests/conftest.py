@@ -0,0 +1,8 @@
+"""
+Unit tests: pure functions and in-process indexes only, no database.
+Importing app modules creates SQLAlchemy engines but never connects.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,38 @@
+import pytest
+
+from app.clauses import DEFAULT_CLAUSE_TYPE, classify, classify_one
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Either party may terminate this Agreement.", "Termination"),
+        ("Neither party shall be liable for indirect damages.", "Liability"),
+        ("Invoices are payable within 30 days.", "Payment"),
+        ("All Intellectual  Property remains with the Licensor.", "Intellectual Property"),
+        ("Recipient shall keep the information confidential.", "Confidentiality"),
+        ("The Software is licensed, not sold.", "Licensing"),
+        ("Neither party is responsible for force majeure events.", "Force Majeure"),
+        ("Any amendment must be in writing.", "Amendment"),
+        ("The governing law is that of Delaware.", "Governing Law"),
+        ("Disputes go to binding arbitration.", "Dispute Resolution"),
+        ("The parties agree to cooperate.", DEFAULT_CLAUSE_TYPE),
+    ],
+)
+def test_clause_types(text, expected):
+    assert classify_one(text) == expected
+
+
+def test_earliest_rule_wins():
+    assert classify_one("Payment obligations survive if either party may terminate.") == "Termination"
+    assert classify_one("Liability for late payment.") == "Liability"
+
+
+def test_keywords_match_whole_words():
+    # "ip" inside "recipient" or "shipping" is not intellectual property
+    assert classify_one("The recipient pays for shipping.") == DEFAULT_CLAUSE_TYPE
+
+
+def test_batch_keeps_input_order():
+    texts = ["Any amendment in writing.", "Nothing here.", "Termination for cause."]
+    assert classify(texts) == ["Amendment", DEFAULT_CLAUSE_TYPE, "Termination"]
@@ -0,0 +1,140 @@
+from datetime import date
+
+import pytest
+
+from app.expiry import add_term, extract_expiry, parse_date
+
+UPLOADED = date(2026, 1, 15)
+
+
+def _expiry(*texts, clause_type="General"):
+    return extract_expiry([(text, clause_type) for text in texts], UPLOADED)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("This Agreement expires on March 31, 2027.", date(2027, 3, 31)),
+        ("This License Agreement shall terminate on 2027-03-31.", date(2027, 3, 31)),
+        ("This Agreement remains in force until 31 March 2027.", date(2027, 3, 31)),
+        ("Expiration Date: 03/31/2027", date(2027, 3, 31)),
+        ("The term ends at the close of business on 1st day of June, 2028.", date(2028, 6, 1)),
+    ],
+)
+def test_explicit_end_dates(text, expected):
+    assert _expiry(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Effective as of January 1, 2025. The term of this Agreement is two years.", date(2027, 1, 1)),
+        ("Commencing on 2025-02-01, for an initial term of 24 months.", date(2027, 2, 1)),
+        ("This Agreement is effective from March 1, 2025 and shall remain in effect for three years.",
+         date(2028, 3, 1)),
+        ("Dated as of June 30, 2025. This is a 12-month term agreement.", date(2026, 6, 30)),
+    ],
+)
+def test_term_added_to_effective_date(text, expected):
+    assert _expiry(text) == expected
+
+
+def test_bracketed_figure_wins_over_words():
+    text = "Effective as of January 1, 2025. The term shall be for a period of five (3) years."
+    assert _expiry(text) == date(2028, 1, 1)
+
+
+def test_term_without_effective_date_counts_from_upload():
+    assert _expiry("The term of this Agreement is one year.") == date(2027, 1, 15)
+
+
+def test_dates_and_terms_are_found_across_chunks():
+    chunks = ["Effective as of January 1, 2025.", "Boilerplate.", "The term is 18 months."]
+    assert _expiry(*chunks) == date(2026, 7, 1)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Confidentiality obligations shall survive termination for a period of five years.",
+        "The obligations in this section survive until December 31, 2030.",
+        "Either party may terminate with a notice period of 30 days.",
+        "Payment is due within a period of 45 days of invoice.",
+    ],
+)
+def test_survival_notice_and_payment_periods_are_not_terms(text):
+    assert _expiry(text) is None
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "The breaching party shall have a cure period of thirty (30) days.",
+        "The warranty period shall be ninety (90) days from delivery.",
+        "Supplier shall retain records for a period of seven (7) years.",
+        "Fees are fixed until December 31, 2026.",
+        "Each renewal term shall be one year.",
+    ],
+)
+def test_periods_of_other_obligations_are_not_terms(text):
+    assert _expiry(text) is None
+
+
+def test_price_lock_does_not_preempt_the_term():
+    text = "Fees are fixed until December 31, 2026. This Agreement expires on March 31, 2028."
+    assert _expiry(text) == date(2028, 3, 31)
+
+
+def test_termination_clause_outranks_earlier_matches():
+    clauses = [
+        ("Effective as of January 1, 2025. The term of this Agreement is five years.", "General"),
+        ("Licensee may use the software during the term.", "Licensing"),
+        ("This Agreement shall terminate on June 30, 2027.", "Termination"),
+    ]
+    assert extract_expiry(clauses, UPLOADED) == date(2027, 6, 30)
+
+
+def test_explicit_end_outranks_a_term_in_the_same_clause_type():
+    text = "The initial term is three years. This Agreement expires on March 31, 2027."
+    assert _expiry(text) == date(2027, 3, 31)
+
+
+def test_skipped_sentence_does_not_hide_the_real_term():
+    text = (
+        "Obligations shall survive for five years after termination. "
+        "Effective as of January 1, 2025. The term of this Agreement is two years."
+    )
+    assert _expiry(text) == date(2027, 1, 1)
+
+
+def test_no_dates():
+    assert _expiry("The parties agree to cooperate in good faith.") is None
+
+
+@pytest.mark.parametrize(
+    "start, count, unit, expected",
+    [
+        (date(2025, 1, 31), 1, "month", date(2025, 2, 28)),
+        (date(2024, 1, 31), 1, "month", date(2024, 2, 29)),
+        (date(2024, 2, 29), 1, "year", date(2025, 2, 28)),
+        (date(2025, 11, 15), 3, "month", date(2026, 2, 15)),
+        (date(2025, 1, 1), 2, "week", date(2025, 1, 15)),
+        (date(2025, 12, 25), 10, "day", date(2026, 1, 4)),
+        (date(2025, 1, 1), 5, "Year", date(2030, 1, 1)),
+    ],
+)
+def test_add_term(start, count, unit, expected):
+    assert add_term(start, count, unit) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("March 31, 2027", date(2027, 3, 31)),
+        ("Sept. 1 2026", date(2026, 9, 1)),
+        ("31st day of March, 2027", date(2027, 3, 31)),
+        ("02/30/2027", None),
+    ],
+)
+def test_parse_date(text, expected):
+    assert parse_date(text) == expected
@@ -0,0 +1,86 @@
+import os
+import pickle
+
+import pytest
+
+from app.extraction import chunk_pages, extract_document, paginate_lines
+
+
+def _pages(*texts):
+    return list(enumerate(texts, start=1))
+
+
+def test_short_document_is_one_chunk():
+    chunks = list(chunk_pages(_pages("First clause.\n\nSecond clause."), chunk_size=200, overlap=20))
+    assert chunks == [{"text": "First clause.\n\nSecond clause.", "page": 1, "page_end": 1}]
+
+
+def test_chunks_respect_size_and_repeat_overlap():
+    paragraphs = "\n\n".join(f"Clause {i} says the parties agree to term number {i}." for i in range(40))
+    chunks = list(chunk_pages(_pages(paragraphs), chunk_size=200, overlap=40))
+
+    assert len(chunks) > 1
+    assert all(len(c["text"]) <= 200 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        # The overlap is the tail of the previous chunk, cut at a word boundary
+        head = current["text"].split("\n\n")[0]
+        assert previous["text"].endswith(head)
+        assert 0 < len(head) <= 40
+
+
+def test_no_overlap():
+    paragraphs = "\n\n".join(f"Paragraph {i} of the agreement." for i in range(20))
+    chunks = list(chunk_pages(_pages(paragraphs), chunk_size=100, overlap=0))
+    assert "".join(c["text"].replace("\n\n", "") for c in chunks) == paragraphs.replace("\n\n", "")
+
+
+def test_page_spans():
+    chunks = list(
+        chunk_pages(_pages("a" * 10 + " alpha clause.", "beta clause.", "gamma " * 30), chunk_size=60, overlap=0)
+    )
+    assert chunks[0]["page"] == 1
+    assert chunks[0]["page_end"] == 2  # packed across the page break
+    assert chunks[-1]["page_end"] == 3
+    for chunk in chunks:
+        assert chunk["page"] <= chunk["page_end"]
+
+
+def test_overlap_chunk_starts_on_the_previous_chunks_last_page():
+    chunks = list(chunk_pages(_pages("one two three four five six", "seven eight nine ten"), chunk_size=30, overlap=10))
+    second = chunks[1]
+    assert second["page"] == chunks[0]["page_end"]
+
+
+def test_long_paragraph_is_split_at_sentences_then_words():
+    text = "This sentence is long enough. " * 10 + "x" * 250
+    chunks = list(chunk_pages(_pages(text), chunk_size=100, overlap=10))
+    assert all(len(c["text"]) <= 100 for c in chunks)
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        list(chunk_pages(_pages("text"), chunk_size=100, overlap=100))
+
+
+def test_paginate_lines_on_form_feeds_and_line_count():
+    pages = list(paginate_lines(["a\n", "b\fc\n", "\f\fd\n", "e\n", "f\n"], page_lines=2))
+    assert pages == [(1, "a\nb"), (2, "c\n"), (3, "d\ne\n"), (4, "f\n")]
+
+
+def test_extract_document_spools_chunks_to_disk(tmp_path):
+    path = tmp_path / "upload"
+    path.write_text("\f".join(f"Page {n}: either party may terminate on notice.\n" * 30 for n in range(1, 4)))
+    result = extract_document("msa.txt", str(path), chunk_size=300, overlap=30)
+    # What the worker process sends back is just the spool's path and count
+    spool = pickle.loads(pickle.dumps(result["chunks"]))
+    try:
+        chunks = list(spool)
+        assert result["page_count"] == 3
+        assert len(spool) == len(chunks) > 3
+        assert chunks[0]["chunk_id"] == "c1" and chunks[0]["metadata"]["page"] == 1
+        assert chunks[-1]["metadata"]["page_end"] == 3
+        assert {c["metadata"]["clause_type"] for c in chunks} == {"Termination"}
+        assert list(spool) == chunks  # every pass reads the file again
+    finally:
+        spool.close()
+    assert not os.path.exists(spool.path)
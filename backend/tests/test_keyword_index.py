@@ -0,0 +1,35 @@
+from app.keyword_index import BM25Index
+
+
+def _bm25():
+    index = BM25Index()
+    index.add(
+        ["c1", "c2", "c3"],
+        ["d1", "d1", "d2"],
+        [
+            "The supplier shall indemnify the customer against all claims.",
+            "Payment is due within thirty days of invoice.",
+            "Indemnification obligations survive termination of this agreement.",
+        ],
+        [{"clause_type": "Liability"}, {"clause_type": "Payment"}, {"clause_type": "Termination"}],
+    )
+    return index
+
+
+def test_bm25_ranks_matching_chunks():
+    hits = _bm25().search("indemnify customer claims", top_k=3)
+    assert hits[0][0]["chunk_id"] == "c1"
+    assert all(score > 0 for _, score in hits)
+
+
+def test_bm25_clause_type_filter_and_removal():
+    index = _bm25()
+    assert [p["chunk_id"] for p, _ in index.search("payment invoice", 5, clause_type="Payment")] == ["c2"]
+    assert index.search("payment invoice", 5, clause_type="Liability") == []
+    index.remove_document("d1")
+    assert len(index) == 1
+    assert index.search("payment invoice", 5) == []
+
+
+def test_bm25_empty_index():
+    assert BM25Index().search("anything", 5) == []
@@ -0,0 +1,42 @@
+from datetime import datetime
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, page_of
+
+
+def test_cursor_round_trip():
+    timestamp, row_id = datetime(2026, 10, 17, 9, 30, 15, 123456), uuid.uuid4()
+    cursor = encode_cursor(timestamp, row_id)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == (timestamp, row_id)
+
+
+def test_cursor_round_trip_without_microseconds():
+    timestamp, row_id = datetime(2026, 1, 1), uuid.uuid4()
+    assert decode_cursor(encode_cursor(timestamp, row_id)) == (timestamp, row_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2026, 1, 1), "x")[:-2] + "!!"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+class _Row:
+    def __init__(self, n):
+        self.created_at = datetime(2026, 1, n)
+        self.row_id = uuid.UUID(int=n)
+
+
+def test_page_of_returns_cursor_of_last_row_only_when_more_exist():
+    rows = [_Row(n) for n in (5, 4, 3)]
+    page, cursor = page_of(rows, 2, "created_at", "row_id")
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == (rows[1].created_at, rows[1].row_id)
+
+    page, cursor = page_of(rows[:2], 2, "created_at", "row_id")
+    assert page == rows[:2] and cursor is None
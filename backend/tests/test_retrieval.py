@@ -0,0 +1,32 @@
+from app.retrieval import ScoredChunk, rrf_fuse
+
+
+def _chunk(chunk_id, vector_score=None, keyword_score=None):
+    return ScoredChunk(
+        chunk_id=chunk_id, doc_id="d", text=chunk_id, metadata={}, score=0.0,
+        vector_score=vector_score, keyword_score=keyword_score,
+    )
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    vector = [_chunk("a", vector_score=90.0), _chunk("b", vector_score=80.0), _chunk("c", vector_score=70.0)]
+    keyword = [_chunk("c", keyword_score=5.0), _chunk("b", keyword_score=4.0)]
+    fused = rrf_fuse([vector, keyword], top_k=3, k=60)
+
+    # c (ranks 3 and 1) edges out b (2 and 2); a, found by one retriever only, comes last
+    assert [c.chunk_id for c in fused] == ["c", "b", "a"]
+    b = fused[1]
+    assert (b.vector_score, b.keyword_score) == (80.0, 4.0)
+    assert fused[2].keyword_score is None
+
+
+def test_rrf_score_is_percentage_of_best_possible():
+    fused = rrf_fuse([[_chunk("a")], [_chunk("a")]], top_k=5, k=60)
+    assert fused[0].score == 100.0
+    single = rrf_fuse([[_chunk("a")], []], top_k=5, k=60)
+    assert single[0].score == 50.0
+
+
+def test_rrf_truncates_to_top_k():
+    ranking = [_chunk(str(i)) for i in range(10)]
+    assert [c.chunk_id for c in rrf_fuse([ranking], top_k=3)] == ["0", "1", "2"]
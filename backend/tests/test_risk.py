@@ -0,0 +1,99 @@
+from app import risk
+from app.risk import RISK_HIGH_AT, RISK_MEDIUM_AT, WEIGHTS, level_for, rules_version, score_clauses
+
+
+def _rules(result):
+    return {factor["rule"] for factor in result.factors}
+
+
+def test_uncapped_liability_and_auto_renewal():
+    result = score_clauses([
+        ("The Supplier's liability under this Agreement is unlimited.", "Liability"),
+        ("This Agreement renews automatically for successive one-year terms.", "General"),
+    ])
+    assert _rules(result) == {"unlimited_liability", "auto_renewal"}
+    assert result.points == WEIGHTS["unlimited_liability"] + WEIGHTS["auto_renewal"]
+    assert result.level == level_for(result.points)
+    assert result.source == "rules"
+
+
+def test_liability_cap_mitigates():
+    result = score_clauses([
+        ("Aggregate liability shall not exceed the fees paid in the prior twelve months.", "Liability"),
+    ])
+    assert _rules(result) == {"liability_cap"}
+    assert result.points == WEIGHTS["liability_cap"]
+
+
+def test_not_limited_to_boilerplate_is_not_a_cap():
+    unlimited = score_clauses([
+        ("Each party's liability for breach, including but not limited to data loss, is unlimited.", "Liability"),
+    ])
+    assert _rules(unlimited) == {"unlimited_liability"}
+    listed = score_clauses([
+        ("Supplier is liable for all losses, including but not limited to lost profits.", "Liability"),
+    ])
+    assert "liability_cap" not in _rules(listed)
+
+
+def test_rules_limited_to_clause_types():
+    # "at any time" only counts as termination without cause inside a termination clause
+    text = "The Customer may terminate this Agreement at any time."
+    assert "termination_without_cause" in _rules(score_clauses([(text, "Termination")]))
+    assert "termination_without_cause" not in _rules(score_clauses([(text, "General")]))
+
+
+def test_immediate_termination_for_breach_is_for_cause():
+    breach = "Either party may terminate immediately upon the other party's material breach."
+    assert "termination_without_cause" not in _rules(score_clauses([(breach, "Termination")]))
+    convenience = "Either party may terminate immediately, for convenience, by written notice."
+    assert "termination_without_cause" in _rules(score_clauses([(convenience, "Termination")]))
+
+
+def test_each_rule_fires_once():
+    clauses = [("A late fee applies.", "Payment"), ("Liquidated damages apply.", "General")]
+    result = score_clauses(clauses + [("Liability is limited to fees paid.", "Liability")])
+    assert [f["rule"] for f in result.factors].count("penalties") == 1
+
+
+def test_short_termination_notice():
+    short = score_clauses([
+        ("Either party may terminate on fifteen (15) days' prior written notice.", "Termination"),
+        ("Liability is limited to fees paid.", "Liability"),
+    ])
+    long = score_clauses([
+        ("Either party may terminate on ninety (90) days' prior written notice.", "Termination"),
+        ("Liability is limited to fees paid.", "Liability"),
+    ])
+    assert "short_termination_notice" in _rules(short)
+    assert "short_termination_notice" not in _rules(long)
+
+
+def test_missing_liability_clause():
+    result = score_clauses([("The parties agree to cooperate.", "General")])
+    assert _rules(result) == {"no_liability_clause"}
+    assert result.factors[0]["excerpt"] == ""
+
+
+def test_levels():
+    assert level_for(RISK_MEDIUM_AT - 1) == "Low"
+    assert level_for(RISK_MEDIUM_AT) == "Medium"
+    assert level_for(RISK_HIGH_AT - 1) == "Medium"
+    assert level_for(RISK_HIGH_AT) == "High"
+
+
+def test_excerpts_are_truncated():
+    text = "Liability is unlimited. " + "x" * 300
+    factor = score_clauses([(text, "Liability")]).factors[0]
+    assert len(factor["excerpt"]) == 160 and factor["excerpt"].endswith("...")
+
+
+def test_rules_version_depends_on_escalation():
+    assert rules_version(True) != rules_version(False)
+    assert risk.RULES_VERSION == rules_version(risk.RISK_LLM_ESCALATION)
+
+
+def test_rules_version_depends_on_the_clause_classifier(monkeypatch):
+    before = rules_version(False)
+    monkeypatch.setattr(risk.clauses, "CLAUSE_RULES", risk.clauses.CLAUSE_RULES + [("Warranty", ["warrant*"])])
+    assert rules_version(False) != before
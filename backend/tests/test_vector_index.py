@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from app.vector_index import UserVectorIndex, decode_vectors, encode_vectors
+
+
+def _unit(rng, n, dim):
+    matrix = rng.standard_normal((n, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def _fill(index, vectors, docs=None):
+    n = len(vectors)
+    docs = docs or ["d%d" % (i % 3) for i in range(n)]
+    index.add(
+        ["c%d" % i for i in range(n)], docs, vectors, ["text %d" % i for i in range(n)],
+        [{"clause_type": "Liability" if i % 2 else "Payment"} for i in range(n)],
+    )
+
+
+@pytest.mark.parametrize("storage", ["float32", "float16", "int8"])
+def test_vector_search_finds_exact_match(tmp_path, storage):
+    rng = np.random.default_rng(0)
+    vectors = _unit(rng, 50, 16)
+    index = UserVectorIndex(str(tmp_path), 16, storage=storage, rerank_factor=4)
+    _fill(index, vectors)
+
+    hits = index.search(vectors[7], top_k=3)
+    assert hits[0][0] == 7
+    assert hits[0][1] == pytest.approx(1.0, abs=0.02)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    assert index.payload(7)["chunk_id"] == "c7"
+
+
+def test_vector_index_reloads_from_disk_and_forgets_removed_documents(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = _unit(rng, 30, 8)
+    index = UserVectorIndex(str(tmp_path), 8, storage="float32")
+    _fill(index, vectors)
+    index.remove_document("d0")
+    assert len(index) == 20
+
+    reopened = UserVectorIndex(str(tmp_path), 8, storage="float32")
+    assert len(reopened) == 20
+    found = {reopened.payload(row)["doc_id"] for row, _ in reopened.search(vectors[0], top_k=30)}
+    assert "d0" not in found
+
+
+def test_vector_search_within_clause_rows(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = _unit(rng, 20, 8)
+    index = UserVectorIndex(str(tmp_path), 8, storage="float32")
+    _fill(index, vectors)
+    rows = index.rows_with_clause_type("Liability")
+    assert all(index.payload(int(r))["metadata"]["clause_type"] == "Liability" for r in rows)
+    hits = index.search(vectors[3], top_k=2, rows=rows)
+    assert hits[0][0] == 3
+
+
+def test_vector_index_rejects_a_different_layout(tmp_path):
+    UserVectorIndex(str(tmp_path), 8, storage="float32")
+    with pytest.raises(ValueError):
+        UserVectorIndex(str(tmp_path), 16, storage="float32")
+
+
+def test_compact_keeps_live_rows(tmp_path):
+    rng = np.random.default_rng(3)
+    vectors = _unit(rng, 12, 8)
+    index = UserVectorIndex(str(tmp_path), 8, storage="float32")
+    _fill(index, vectors)
+    index.remove_document("d1")
+    index.compact()
+    assert len(index) == 8
+    assert index.payload(index.search(vectors[0], top_k=1)[0][0])["chunk_id"] == "c0"
+
+
+def test_int8_round_trip_is_close():
+    rng = np.random.default_rng(4)
+    vectors = _unit(rng, 5, 32)
+    assert np.allclose(decode_vectors(encode_vectors(vectors, "int8"), "int8"), vectors, atol=1 / 127)